@@ -131,6 +131,8 @@ class OSchema(BaseVertex, SystemType):
     def __init__(self):
         super().__init__()
         self.globalProperties = None
+        # class name -> dict with superClass and properties, filled by OClient.readschema
+        self.classes = None
 
     @classmethod
     def getcustomclassname(cls):
@@ -0,0 +1,212 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import logging
+import re
+
+from opy.client.o_db_base import BaseEntity
+from opy.client.o_db_resultcache import QUOTED
+from opy.client.o_db_set import QueryType, Create, Vertex, Edge, Update, Delete, Move, BoundQuery, Param
+from opy.common.o_db_exceptions import OPyClientException, SQLCommandException, SerializationException
+
+
+__author__ = 'daill'
+
+
+class OBatch(object):
+    """
+    Collects create, update, delete and move queries and sends them as one SQL script, so all of them need a single
+    round trip. Use it as context manager, the script will be sent when the with block is left without an exception.
+
+    Each query is assigned to a script variable ($r0, $r1, ...) and the script returns the first result of every
+    variable, so the n-th returned entry belongs to the n-th query. Edges between vertices which are created by the
+    same batch refer to the variables of their vertices. The server binds positional parameters per statement, so the
+    values are sent as named parameters (see nameparams) unless the client writes them into the queries.
+    """
+    def __init__(self, client, transactional:bool=False, retry:int=None):
+        self.__client = client
+        self.__transactional = transactional
+        self.__retry = retry
+        self.__statements = list()
+        self.__queries = list()
+        # values of the named parameters of all statements, None if they are written into the script
+        self.__params = list() if client is not None and client.newparams() is not None else None
+        # id of created object -> variable
+        self.__variables = dict()
+
+        self.results = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.send()
+        return False
+
+    def __len__(self):
+        return len(self.__queries)
+
+    def add(self, query):
+        """
+        Queues a query
+
+        :param query: Create, Update, Delete or Move query or a plain SQL statement
+        :return: index of the query within the results
+        """
+        if isinstance(query, BoundQuery):
+            raise SQLCommandException("bound queries can't be part of a batch")
+
+        variable = "$r{}".format(len(self.__queries))
+
+        if isinstance(query, Create) and isinstance(query.type, Edge):
+            query.type.references = self.__variables
+            statement = query.parse()
+        elif isinstance(query, Move):
+            statement = query.parse()
+        elif isinstance(query, (Create, Update, Delete)) and self.__params is not None:
+            values = list()
+            statement = nameparams(query.parse(values), values, self.__params)
+        elif isinstance(query, (Create, Update, Delete)):
+            statement = query.parse()
+        elif isinstance(query, str):
+            statement = query
+        else:
+            raise OPyClientException("can't add query of type '{}' to a batch".format(type(query)))
+
+        if not statement:
+            raise SQLCommandException("could not parse query '{}'".format(query))
+
+        if isinstance(query, Create) and isinstance(query.type, (Vertex, Edge)):
+            self.__variables[id(query.type.getobject())] = variable
+
+        self.__statements.append("let {} = {}".format(variable, statement.strip()))
+        self.__queries.append(query)
+
+        return len(self.__queries) - 1
+
+    def parse(self):
+        """
+        :return: the script text
+        """
+        try:
+            script = io.StringIO()
+            if self.__transactional:
+                script.write("begin\n")
+
+            for statement in self.__statements:
+                script.write(statement)
+                script.write("\n")
+
+            if self.__transactional:
+                if self.__retry:
+                    script.write("commit retry {}\n".format(self.__retry))
+                else:
+                    script.write("commit\n")
+
+            # a statement might return no or several records, first keeps one entry per statement
+            script.write("return [{}]".format(", ".join("first($r{})".format(i) for i in range(len(self.__statements)))))
+
+            return script.getvalue()
+        finally:
+            script.close()
+
+    def send(self):
+        """
+        Sends the script and maps the returned entries to the queued queries by their position, objects of created
+        vertices and edges get their rid and version.
+
+        :return: list of results in the order of the queries, None for statements which haven't returned a record
+        :raises: OPyClientException if the number of entries doesn't match the number of queries
+        """
+        if not self.__queries:
+            self.results = list()
+            return self.results
+
+        response = self.__client.script(self.parse(), params=self.__params)
+
+        entries = returnedentries(response)
+        if len(entries) != len(self.__queries):
+            raise OPyClientException("batch of {} queries returned {} results".format(len(self.__queries), len(entries)))
+
+        self.results = list()
+        for query, record in zip(self.__queries, entries):
+            self.results.append(self.__map(query, record))
+
+        return self.results
+
+    def __map(self, query, record:dict):
+        if "cluster-id" not in record:
+            # null record
+            return None
+
+        clusterid = record.get("cluster-id")
+        clusterposition = record.get("cluster-position")
+
+        if isinstance(query, Create) and isinstance(query.type, (Vertex, Edge)):
+            persistent_object = query.type.getobject()
+            if isinstance(persistent_object, BaseEntity):
+                persistent_object.setRID(clusterid, clusterposition)
+                persistent_object.version = record.get("record-version")
+            return persistent_object
+
+        if "record-content" not in record:
+            # the server has only sent the rid
+            return clusterid, clusterposition
+
+        try:
+            parsedobject, _ = self.__client.hydrate(record, clusterid, clusterposition)
+            return parsedobject
+        except SerializationException as err:
+            logging.error(err)
+            return record
+
+
+def nameparams(statement:str, values:list, params:list):
+    """
+    Replaces the positional placeholders of a statement by named ones, the server binds positional parameters per
+    statement but named ones for the whole script
+
+    :param statement: statement parsed with parameters
+    :param values: values collected while parsing the statement
+    :param params: named parameters of the script, the values are appended
+    :return: the statement with named placeholders only
+    """
+    positional = iter(value for value in values if not isinstance(value, Param))
+    named = list()
+
+    def name(match):
+        named.append(Param("p{}".format(len(params) + len(named)), next(positional)))
+        return str(named[-1])
+
+    # placeholders within string literals aren't replaced
+    parts = QUOTED.split(statement)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\?", name, parts[i])
+
+    params.extend(value for value in values if isinstance(value, Param))
+    params.extend(named)
+    return "".join(parts)
+
+
+def returnedentries(response:dict):
+    """
+    :param response: decoded response of a script
+    :return: list of all returned entries including null records, which are empty dicts
+    """
+    if not response or response.get("success_status") != 0:
+        return list()
+
+    return [record for records_data in response.get("result", ()) for record in records_data.get("records", ())]
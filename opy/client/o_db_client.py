@@ -12,18 +12,39 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
 import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
 from opy.client.o_db_base import BaseVertex, BaseEdge, BaseEntity, SystemType, OSchema
+from opy.client.o_db_batch import OBatch
+from opy.client.o_db_session import OSession
+from opy.client.o_db_materializer import OGraphMaterializer
+from opy.client.o_db_planner import OGraphPlanner, isnew
+from opy.client.o_db_retry import ORetryPolicy
+from opy.client.o_db_scan import OClusterScanner, iterrecords
+from opy.client.o_db_slowlog import OSlowQuery
+from opy.client.o_db_resultcache import writetargets
+from opy.client.o_db_recordcache import ORecordCache
+from opy.client.o_db_live import OLiveQuery
+from opy.client.o_db_utils import torid
 from opy.client.o_db_set import Select, Class, QueryType, Vertex, Edge, Update, Create, Drop, GraphType, Vertices, \
-    Edges, Property, Delete, Move, Traverse, Truncate
-from opy.common.o_db_exceptions import OPyClientException, SerializationException
+    Edges, Property, Delete, Move, Traverse, Truncate, Set, toparams, BoundQuery
+from opy.common.o_db_exceptions import OPyClientException, SerializationException, ConcurrentModificationException, \
+    RecordNotFoundException
 from opy.database.o_db_connection import OConnection
-from opy.common.o_db_constants import ODBType, OModeChar, OCommandClass, OSerialization
+from opy.common.o_db_constants import ODBType, OModeChar, OCommandClass, OSerialization, ORecordType, OOperationType
 from opy.database.o_db_driverconfig import ODriverConfig
-from opy.database.o_db_serializer import OCSVSerializer, OBinarySerializer
-from opy.common.o_db_model import OSQLCommand, ORidBagBinary
+from opy.database.o_db_metrics import OMetrics
+from opy.common.o_db_hooks import OHooks
+from opy.common.o_db_logging import OLogging, debug
+from opy.database.o_db_serializer import OCSVSerializer, OBinarySerializer, OSerializer
+from opy.common.o_db_model import OSQLCommand, OSQLScriptCommand, ORidBagBinary
 from opy.database.o_db_ops import ODB
+from opy.database.o_db_pool import OConnectionPool
+from opy.database.o_db_push import OPushConnection
 
 
 __author__ = 'daill'
@@ -33,19 +54,48 @@ class OClient(object):
     baseclass = BaseEntity
     entities = dict()
     schema = None
+    # up to this amount of records load uses pipelined record load requests instead of a select command
+    pipelinelimit = 50
+    # send query values as serialized parameters instead of writing them into the query string
+    parameterized = True
+    # retries writes which failed because of a concurrent modification, None disables retrying
+    retrypolicy = ORetryPolicy()
+    # maximum number of create queries sent within one script when saving an object graph
+    batchsize = 500
+    # OSlowQueryLog to record the commands exceeding its threshold, None disables it
+    slowlog = None
+    # OResultCache to cache the responses of selects and traverses, None disables it
+    resultcache = None
+    # maximum number of objects in the RID cache of a client, None for an unbounded cache
+    cachesize = 10000
 
     """
     This object has to be implemented by all object which should be auto saved and unfolded.
     It can be used to create custom class derivations of vertex class V and edge class E. It should be used
     to save vertices and edges as well as deleting them.
     """
-    def __init__(self, database:str, user_name:str, user_password:str, host:str=None, port:int=None):
+    def __init__(self, database:str, user_name:str, user_password:str, host:str=None, port:int=None, recorder=None,
+                 connection:OConnection=None):
+        """
+        :param database:
+        :param user_name:
+        :param user_password:
+        :param host:
+        :param port:
+        :param recorder: ORecorder to record the traffic of the connection
+        :param connection: use this connection instead of opening one, i.e. an OReplayConnection
+        """
+        # the logging configuration is usually done after importing the driver
+        OLogging.refresh()
+
         try:
             # create the db object
             self.__odb = ODB()
 
             # create a connection object
-            self.__connection = OConnection(host, port)
+            if connection is None:
+                connection = OConnection(host, port, recorder)
+            self.__connection = connection
 
             # connect to db
             self.__odb.connect(self.__connection, user_name=user_name, user_password=user_password)
@@ -53,13 +103,20 @@ class OClient(object):
             # open the given database
             self.__odb.dbopen(self.__connection, database_name=database, database_type=ODBType.GRAPH.value, user_name="root", user_password="root")
 
+            # needed to open further connections
+            self.__credentials = {"database": database, "user_name": user_name, "user_password": user_password,
+                                  "host": host, "port": port}
+            self.__pool = None
+
+            # ids of the transactions started by this client
+            self.__txids = itertools.count(1)
 
         except Exception as err:
             logging.error(err)
             raise OPyClientException(err)
 
-        # object cache rid -> object
-        self.cache = dict()
+        # object cache (cluster-id, cluster-position) -> object, see ORecordCache
+        self.cache = ORecordCache(self.cachesize)
 
         # trigger dict creation process
         self.createentitydict(OClient.baseclass)
@@ -99,7 +156,8 @@ class OClient(object):
                         else:
                             raise SerializationException("instance of class '{}' has no attribute with the name '{}'".format(class_name, field_name))
 
-                    logging.debug("parse field {} with value {}".format(field_name, field_value))
+                    if OLogging.enabled:
+                        debug("parse field %s with value %s", field_name, field_value, field=field_name)
 
                 instance.in_edges = in_edges
                 instance.out_edges = out_edges
@@ -117,9 +175,9 @@ class OClient(object):
                 query_string = query.parse()
                 # fetchplan is only needed on select query
                 command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query.fetchplan, serialized_params="")
-                result_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+                result_data = self.__command(self.__connection, OCommandClass.IDEMPOTENT, command)
 
-                logging.debug("select received {}".format(result_data))
+                debug("select received %s", result_data)
 
                 return result_data
         except Exception as err:
@@ -127,15 +185,18 @@ class OClient(object):
 
     def update(self, query:GraphType):
         try:
-            if isinstance(query, Update):
-                query_string = query.parse()
+            if isinstance(query, Update) or isinstance(query, BoundQuery):
+                params = self.newparams()
+                query_string = query.parse(params)
                 # fetchplan is only needed on select query
-                command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query.fetchplan, serialized_params="")
-                result_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+                command = OSQLCommand(query_string, non_text_limit=-1, fetchplan='', serialized_params=self.serializeparams(params))
+                result_data = self.__command(self.__connection, OCommandClass.IDEMPOTENT, command, params)
 
-                logging.debug("select received {}".format(result_data))
+                debug("select received %s", result_data)
 
                 return result_data
+        except ConcurrentModificationException:
+            raise
         except Exception as err:
             logging.error(err)
 
@@ -144,46 +205,151 @@ class OClient(object):
         Wrapper method to iterate through the whole object tree and add it to the database
         """
         try:
-            # add object to database to get a rid
-            object = self.create(object)
+            self.save(object.getobject())
 
-            # get all outgoing edges
-            edges = object.getoutedges()
+            return object.getobject()
+        except ConcurrentModificationException:
+            raise
+        except Exception as err:
+            logging.error(err)
 
-            # check if there are edges and iterate through them
-            if edges:
-                for key in edges:
-                    edge_list = edges[key]
-                    for edge in edge_list:
+    def creategraph(self, *objects):
+        """
+        Creates the given vertices and edges and all new vertices and edges reachable from them. The graph is planned
+        first (see OGraphPlanner) and sent in transactional batches of up to batchsize queries, so saving a graph needs
+        only one round trip per batch.
 
-                        out_vertex = edge.out_vertex
+        :param objects: vertices or edges
+        :return: OGraphPlanner containing the created vertices and edges
+        """
+        planner = OGraphPlanner()
+        planner.add(*objects)
 
-                        # recursive call
-                        self.createvertex(Vertex(out_vertex))
+        retry = self.retrypolicy.attempts if self.retrypolicy is not None else None
+        for queries in planner.batches(OClient.batchsize):
+            with self.batch(transactional=True, retry=retry) as batch:
+                for query in queries:
+                    batch.add(query)
 
-                        # outvertex should now own a rid, so we can persist an edge
-                        edge = self.create(Edge(edge))
+        return planner
 
-            return object
-        except Exception as err:
-            logging.error(err)
+    def save(self, *objects):
+        """
+        Persists the given vertices and edges together with all new ones reachable from them. New vertices are created
+        and already persisted ones are updated by pipelined record requests containing the binary serialized record,
+        so the server doesn't have to parse any SQL.
+
+        SQL is only used where the graph requires it: edges, because the server has to add them to the ridbags of both
+        vertices, and vertices whose edges haven't been loaded, because a content update would drop their ridbags.
+        The versions of the vertices touched this way are re-read afterwards. If the records aren't binary serialized
+        everything is done by SQL.
+
+        :param objects: vertices or edges
+        :return: OGraphPlanner containing the created vertices and edges
+        """
+        stored = [obj for obj in objects if isinstance(obj, BaseVertex) and not isnew(obj)]
+
+        if ODriverConfig.SERIALIZATION != OSerialization.SERIALIZATION_BINARY:
+            for vertex in stored:
+                self.retry(self.update, Update(vertex, Set(attributes(vertex))))
+            return self.creategraph(*objects)
+
+        serializer = OBinarySerializer()
+        planner = OGraphPlanner()
+        planner.add(*objects)
+
+        # the ridbags of a vertex are only complete if its edges have been loaded
+        binary = [vertex for vertex in stored
+                  if getattr(vertex, 'out_edges', None) is not None and getattr(vertex, 'in_edges', None) is not None]
+        binaryids = {id(vertex) for vertex in binary}
+        touched = [vertex for vertex in stored if id(vertex) not in binaryids]
+
+        for vertex in touched:
+            self.retry(self.update, Update(vertex, Set(attributes(vertex))))
+
+        self.invalidate({self.retrieveclassname(type(vertex)) for vertex in binary + planner.vertices})
+
+        for chunk in chunks(binary, OClient.batchsize):
+            self.retry(self.__updaterecords, serializer, chunk, refresh=lambda err, chunk=chunk: self.__refreshversions(chunk))
+
+        for chunk in chunks(planner.vertices, OClient.batchsize):
+            self.retry(self.__createrecords, serializer, chunk)
+
+        retry = self.retrypolicy.attempts if self.retrypolicy is not None else None
+        for queries in planner.batches(OClient.batchsize, vertices=False):
+            with self.batch(transactional=True, retry=retry) as batch:
+                for query in queries:
+                    batch.add(query)
+
+        # creating edges and updating by SQL has changed the versions
+        touched += planner.endpoints()
+        if touched:
+            loaded = self.__loadpipelined([(vertex.clusterid, vertex.clusterposition) for vertex in touched], "", True)
+            for vertex in touched:
+                current = loaded.get((vertex.clusterid, vertex.clusterposition))
+                if current is not None:
+                    vertex.version = current.version
+
+        return planner
+
+    def __updaterecords(self, serializer:OBinarySerializer, vertices:list):
+        records = [(vertex.clusterid, vertex.clusterposition, vertex.version, serializer.encode(vertex)) for vertex in vertices]
+        responses = self.__odb.recordupdatemany(self.__connection, records, ORecordType.DOCUMENT)
+        for vertex, response in zip(vertices, responses or ()):
+            vertex.version = response.get("record-version")
+
+    def __createrecords(self, serializer:OBinarySerializer, vertices:list):
+        records = [(-1, serializer.encode(vertex)) for vertex in vertices]
+        responses = self.__odb.recordcreatemany(self.__connection, records, ORecordType.DOCUMENT)
+        for vertex, response in zip(vertices, responses or ()):
+            vertex.setRID(response.get("cluster-id"), response.get("cluster-position"))
+            vertex.version = response.get("record-version")
+            self.cache[(vertex.clusterid, vertex.clusterposition)] = vertex
+
+    def __refreshversions(self, vertices:list):
+        """
+        Takes the stored versions of the given records after a concurrent modification. The whole pipeline is sent
+        again, so the records which have been updated before the conflicting one need their new versions as well.
+
+        :param vertices:
+        :return:
+        """
+        responses = self.__odb.recordmetadatamany(self.__connection, [(vertex.clusterid, vertex.clusterposition) for vertex in vertices])
+        for vertex, response in zip(vertices, responses or ()):
+            vertex.version = response.get("record-version")
 
     def createedge(self, object:Edge):
         """
-        Creates a simple edge between two vertices.
+        Creates a simple edge between two vertices. Creating an edge modifies both vertices, so it will be retried in
+        case of a concurrent modification.
         """
         try:
-            self.create(object)
+            self.retry(self.create, object)
 
             return object
+        except ConcurrentModificationException:
+            raise
         except Exception as err:
             logging.error(err)
 
-    def exec(self, query:str, fetchplan:str, raw:bool=True):
+    def retry(self, operation, *args, refresh=None):
+        """
+        Executes a write operation using the retry policy of the client
+
+        :param operation: callable
+        :param args: arguments of the operation
+        :param refresh: callable to re-read stale records between the attempts (see ORetryPolicy.run)
+        :return: result of the operation
+        """
+        if self.retrypolicy is None:
+            return operation(*args)
+        return self.retrypolicy.run(lambda: operation(*args), refresh)
+
+    def exec(self, query:str, fetchplan:str, raw:bool=True, params:list=None):
         try:
             # fetchplan is only needed on select query
-            command = OSQLCommand(query, non_text_limit=-1, fetchplan=fetchplan, serialized_params="")
-            response_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+            command = OSQLCommand(query, non_text_limit=-1, fetchplan=fetchplan, serialized_params=self.serializeparams(params))
+            response_data = self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command, params)
 
             if raw:
                 return response_data
@@ -217,11 +383,14 @@ class OClient(object):
 
     def delete(self, query_type:QueryType):
         try:
-            query_string = query_type.parse()
+            params = self.newparams()
+            query_string = query_type.parse(params)
 
             # fetchplan is only needed on select query
-            command = OSQLCommand(query_string, non_text_limit=-1, fetchplan='', serialized_params="")
-            return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+            command = OSQLCommand(query_string, non_text_limit=-1, fetchplan='', serialized_params=self.serializeparams(params))
+            return self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command, params)
+        except ConcurrentModificationException:
+            raise
         except Exception as err:
             logging.error(err)
 
@@ -231,7 +400,7 @@ class OClient(object):
 
             # fetchplan is only needed on select query
             command = OSQLCommand(query_string, non_text_limit=-1, fetchplan='', serialized_params="")
-            return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+            return self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
         except Exception as err:
             logging.error(err)
 
@@ -241,7 +410,7 @@ class OClient(object):
 
             # fetchplan is only needed on select query
             command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-            return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+            return self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
         except Exception as err:
             logging.error(err)
 
@@ -251,7 +420,7 @@ class OClient(object):
 
             # fetchplan is only needed on select query
             command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-            return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+            return self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
         except Exception as err:
             logging.error(err)
 
@@ -259,14 +428,24 @@ class OClient(object):
         if not query_action:
             raise OPyClientException("you have to specify a query")
 
-        if isinstance(query_action, Select):
+        if isinstance(query_action, BoundQuery):
+            query_type = query_action.gettype()
+            if issubclass(query_type, Select) or issubclass(query_type, Traverse):
+                return self.fetch(query_action)
+            elif issubclass(query_type, Update):
+                return self.retry(self.update, query_action)
+            elif issubclass(query_type, Delete):
+                return self.retry(self.delete, query_action)
+            else:
+                raise OPyClientException("can't execute bound query of type '{}'".format(query_type.__name__))
+        elif isinstance(query_action, Select):
             return self.fetch(query_action)
         elif isinstance(query_action, Traverse):
             return self.fetch(query_action)
         elif isinstance(query_action, Update):
-            return self.update(query_action)
+            return self.retry(self.update, query_action)
         elif isinstance(query_action, Delete):
-            return self.delete(query_action)
+            return self.retry(self.delete, query_action)
         elif isinstance(query_action, Truncate):
             return self.truncate(query_action)
         elif isinstance(query_action, Drop):
@@ -279,18 +458,17 @@ class OClient(object):
                 return self.createvertex(type)
             elif isinstance(type, Vertices):
                 object = type.getobject()
-                if isinstance(object, list) or isinstance(object, set):
-                    for vertex in object:
-                        if isinstance(vertex, BaseVertex):
-                            self.createvertex(Vertex(vertex))
-                        else:
-                            logging.error("element has to subclass BaseVertex")
-                elif isinstance(object, dict):
-                    for vertex in object.items():
-                        if isinstance(vertex, BaseVertex):
-                            self.createvertex(Vertex(vertex))
-                        else:
-                            logging.error("element has to subclass BaseVertex")
+                if isinstance(object, dict):
+                    object = object.values()
+
+                # all vertices are planned together, so shared parts of the graph are created only once
+                vertices = list()
+                for vertex in object:
+                    if isinstance(vertex, BaseVertex):
+                        vertices.append(vertex)
+                    else:
+                        logging.error("element has to subclass BaseVertex")
+                self.save(*vertices)
                 return type.getobject()
             elif isinstance(type, Edge):
                 return self.createedge(type)
@@ -323,13 +501,14 @@ class OClient(object):
 
     def create(self, query_type:GraphType):
         if isinstance(query_type, Vertex) or isinstance(query_type, Vertices):
-            result_query = query_type.parse()
+            params = self.newparams()
+            result_query = query_type.parse(params)
             persistent_object = query_type.getobject()
 
             # execute command
-            command = OSQLCommand(result_query, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-            response_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
-            logging.debug("response data '{}'".format(response_data))
+            command = OSQLCommand(result_query, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params=self.serializeparams(params))
+            response_data = self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command, params)
+            debug("response data '%s'", response_data)
 
             # steps to extract data from response
             # TODO: sync vs. asynch
@@ -340,7 +519,7 @@ class OClient(object):
                         # next to an exception there are various reasons for success or a failure, so we
                         # we have to check the status
                         if "result" in response_data:
-                            logging.debug("parse synch response result for adding vertex")
+                            debug("parse synch response result for adding vertex")
                             result_data = response_data.get("result")
                             for records_data in result_data:
                                 if "records" in records_data:
@@ -363,7 +542,7 @@ class OClient(object):
 
                 # fetchplan is only needed on select query
                 command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-                return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
+                return self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
             except Exception as err:
                 logging.error(err)
         elif isinstance(query_type, Edge):
@@ -373,8 +552,8 @@ class OClient(object):
 
                 # execute command
                 command = OSQLCommand(result_query, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-                response_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
-                logging.debug("response data '{}'".format(response_data))
+                response_data = self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
+                debug("response data '%s'", response_data)
 
                 # steps to extract data from response
                 # TODO: sync vs. asynch
@@ -385,7 +564,7 @@ class OClient(object):
                             # next to an exception there are various reasons for success or a failure, so we
                             # we have to check the status
                             if "result" in response_data:
-                                logging.debug("parse synch response result for adding edge")
+                                debug("parse synch response result for adding edge")
                                 result_data = response_data.get("result")
                                 for records_data in result_data:
                                     if "records" in records_data:
@@ -398,6 +577,8 @@ class OClient(object):
                                                 # possibly raise an exception
                             if "asynch-result-type" in response_data:
                                 logging.info("cannot handle asynch response, yet")
+            except ConcurrentModificationException:
+                raise
             except Exception as err:
                 logging.error(err)
         elif isinstance(query_type, Property):
@@ -406,140 +587,645 @@ class OClient(object):
 
                 # execute command
                 command = OSQLCommand(result_query, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-                response_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.NON_IDEMPOTENT, command_payload=command)
-                logging.debug("response data '{}'".format(response_data))
+                response_data = self.__command(self.__connection, OCommandClass.NON_IDEMPOTENT, command)
+                debug("response data '%s'", response_data)
 
                 return response_data
             except Exception as err:
                 logging.error(err)
 
-    def fetch(self, query_type:QueryType):
+    def fetch(self, query_type:QueryType, materializer:OGraphMaterializer=None):
+        """
+        Executes the given select or traverse and returns a dict of rid -> object. The edges of the fetched objects
+        will be wired by the given materializer (or a new one). Pass your own instance to get access to the RIDs
+        which couldn't be resolved.
+
+        :param query_type:
+        :param materializer:
+        :return:
+        """
         try:
-            if isinstance(query_type, Select) or isinstance(query_type, Traverse):
-                query_string = query_type.parse()
-                # fetchplan is only needed on select query
-                command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params="")
-                result_data = self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+            if isinstance(query_type, Select) or isinstance(query_type, Traverse) or isinstance(query_type, BoundQuery):
+                params = self.newparams()
+                query_string = query_type.parse(params)
 
-                logging.debug("{} received {}".format(query_type.__class__.__name__,result_data))
+                # the schema has to be read from the server, see readschema
+                resultcache = self.resultcache if not ismetadata(query_type) else None
+                result_data = None
+                if resultcache is not None:
+                    credentials = self.__credentials
+                    key = resultcache.key(query_string, query_type.fetchplan, params,
+                                          (credentials["host"], credentials["port"], credentials["database"]))
+                    result_data = resultcache.get(key)
 
-                clazz = query_type.getclass()
+                if result_data is None:
+                    # fetchplan is only needed on select query
+                    command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=query_type.fetchplan, serialized_params=self.serializeparams(params))
+                    result_data = self.__command(self.__connection, OCommandClass.IDEMPOTENT, command, params)
 
-                # resulting objects list
-                fetchedobjects = dict()
-                returningobject = dict()
-                resultdata = None
+                    if resultcache is not None and result_data and result_data.get("success_status") == 0:
+                        resultcache.put(key, result_data, self.__connection.lastresponse[0], self.__cacheclass(query_type))
 
-                # if issubclass(clazz, BaseEntity):
-                if "success_status" in result_data:
-                    status = result_data.get("success_status")
-                    if status == 0:
-                        # next to an exception there are various reasons for success or a failure, so we
-                        # we have to check the status
-                        if "result" in result_data:
-                            logging.debug("parse sync response result for fetching vertex")
-                            result_data = result_data.get("result")
-                            for records_data in result_data:
-                                if "records" in records_data:
-                                    for record in records_data.get("records"):
-                                        if "cluster-id" in record and "cluster-position" in record and "record-content" in record:
-                                            # create objects and add values
-                                            # add to cache
-                                            try:
-                                                clusterid = record.get("cluster-id")
-                                                clusterposition = record.get("cluster-position")
-                                                version = record.get("record-version")
+                debug("%s received %s", query_type.__class__.__name__, result_data)
+
+                if materializer is None:
+                    materializer = OGraphMaterializer()
 
-                                                if '#{}:{}'.format(clusterid, clusterposition) not in returningobject:
+                fetchedobjects, resultdata, prefetched = self.extractobjects(result_data, query_type.getclass(), materializer)
+
+                # now set the correct references based of the fetched objects, links can only point to pre-fetched
+                # records so it's only necessary to wire them if there are some
+                materializer.materialize(links=len(prefetched) > 0)
+
+                fetchedobjects["rest"] = resultdata
+                return fetchedobjects
+            else:
+                return None
+        except Exception as err:
+            logging.error(err)
 
-                                                    parsedobject, resultdata = self.parseobject(record_content=record.get("record-content"), clazz=clazz)
+    def extractobjects(self, result_data:dict, clazz, materializer:OGraphMaterializer, cache:bool=True):
+        """
+        Parses the records of a command response and adds them to the materializer
 
+        :param result_data: decoded response
+        :param clazz: class to use if the record doesn't provide one
+        :param materializer:
+        :param cache: put the parsed entities into the object cache
+        :return: dict of rid -> object, the rest data of the last parsed record and a dict of the pre-fetched objects
+        """
+        fetchedobjects = dict()
+        prefetched = dict()
+        resultdata = None
+
+        if "success_status" in result_data:
+            status = result_data.get("success_status")
+            if status == 0:
+                # next to an exception there are various reasons for success or a failure, so we
+                # we have to check the status
+                if "result" in result_data:
+                    debug("parse sync response result for fetching vertex")
+                    for records_data in result_data.get("result"):
+                        if "records" in records_data:
+                            for record in records_data.get("records"):
+                                if "cluster-id" in record and "cluster-position" in record and "record-content" in record:
+                                    # create objects and add values
+                                    try:
+                                        clusterid = record.get("cluster-id")
+                                        clusterposition = record.get("cluster-position")
+                                        version = record.get("record-version")
+
+                                        parsedobject, resultdata = self.hydrate(record, clusterid, clusterposition, clazz)
+
+                                        fetchedobjects["#{}:{}".format(clusterid, clusterposition)] = parsedobject
+                                        materializer.add(parsedobject, (clusterid, clusterposition))
+
+                                        if cache and isinstance(parsedobject, BaseEntity) and clusterid >= 0:
+                                            self.cache[(clusterid, clusterposition)] = parsedobject
+
+                                        if OLogging.enabled:
+                                            debug("clusterid '%s' clusterposition '%s' version '%s'", clusterid, clusterposition, version, content=record.get("record-content"))
+
+                                    except SerializationException as err:
+                                            logging.error(err)
+
+                                else:
+                                    logging.error("no cluster information available")
+                                    # possibly raise an exception
+
+                        # records sent because of the fetch plan are only used to wire the result
+                        for record in records_data.get("pre-fetched", ()):
+                            try:
+                                rid = (record.get("cluster-id"), record.get("cluster-position"))
+                                prefetchedobject, _ = self.hydrate(record, rid[0], rid[1])
+                                materializer.add(prefetchedobject, rid)
+
+                                if isinstance(prefetchedobject, BaseEntity):
+                                    prefetched[rid] = prefetchedobject
+                            except SerializationException as err:
+                                logging.error(err)
+                if "asynch-result-type" in result_data:
+                    logging.info("cannot handle asynch response, yet")
+        else:
+            logging.info("no data fetched")
 
-                                                    if not isinstance(parsedobject, dict):
-                                                        parsedobject.setRID(clusterid, clusterposition)
-                                                        parsedobject.version = version
+        if cache:
+            self.cache.update(prefetched)
 
-                                                        # if isinstance(parsedobject, clazz):
-                                                        #     returningobject[parsedobject.getRID()] = parsedobject
+        return fetchedobjects, resultdata, prefetched
 
-                                                        fetchedobjects[parsedobject.getRID()] = parsedobject
-                                                    else:
-                                                        rid = "#{}:{}".format(clusterid, clusterposition)
-                                                        fetchedobjects[rid] = parsedobject
+    def hydrate(self, record:dict, clusterid:int, clusterposition:int, clazz=None,
+                operation_type:int=OOperationType.REQUEST_COMMAND.value, metrics:OMetrics=None):
+        """
+        Creates the object out of a decoded record and sets its rid and version
+
+        :param record: dict containing at least the record-content
+        :param clusterid:
+        :param clusterposition:
+        :param clazz: class to use if the record doesn't provide one
+        :param operation_type: operation which has read the record, the time is added to its metrics
+        :param metrics: metrics of the connection which has read the record, by default the one of the client
+        :return: object and the rest data
+        """
+        trace = OHooks.start("hydrate", operation=operation_type) if OHooks.active else None
+        start = time.perf_counter()
+        parsedobject, resultdata = self.parseobject(record_content=record.get("record-content"), clazz=clazz)
+        if OMetrics.enabled:
+            (metrics or self.__connection.metrics).observe(operation_type, "hydrate", time.perf_counter() - start)
+        if trace is not None:
+            trace.end(rid=(clusterid, clusterposition))
 
-                                                    logging.debug("clusterid '{}' clusterposition '{}'  version '{}'  content '{}'".format(clusterid, clusterposition, version, record.get("record-content")))
+        if not isinstance(parsedobject, dict):
+            parsedobject.setRID(clusterid, clusterposition)
+            parsedobject.version = record.get("record-version")
 
-                                            except SerializationException as err:
-                                                    logging.error(err)
+        return parsedobject, resultdata
 
-                                        else:
-                                            logging.error("no cluster information available")
-                                            # possibly raise an exception
-                        if "asynch-result-type" in result_data:
-                            logging.info("cannot handle asynch response, yet")
+    def load(self, rids:list, fetchplan:str="", ignorecache:bool=False, materializer:OGraphMaterializer=None):
+        """
+        Loads the records with the given RIDs. Every RID is loaded only once and records which are already part of
+        the object cache won't be loaded again. Up to pipelinelimit records are loaded by pipelined record load
+        requests, larger amounts by a single select command.
+
+        :param rids: list of RID strings, (cluster-id, cluster-position) tuples or entities
+        :param fetchplan:
+        :param ignorecache: load all records from the server
+        :param materializer: if given the objects will be added to it to finish the wiring of pending edges
+        :return: list of objects in the order of the given rids, None for records which could not be found
+        """
+        try:
+            keys = [torid(rid) for rid in rids]
+            unique = [key for key in dict.fromkeys(keys) if key is not None]
+
+            # the cache is bounded, so the cached objects are taken before the loaded ones might evict them
+            objects = dict()
+            if not ignorecache:
+                for key in unique:
+                    if key in self.cache:
+                        objects[key] = self.cache[key]
+            missing = [key for key in unique if key not in objects]
+
+            loaded = dict()
+            if missing:
+                if len(missing) <= OClient.pipelinelimit:
+                    loaded = self.__loadpipelined(missing, fetchplan, ignorecache)
                 else:
-                    logging.info("no data fetched")
-
-                # now set the correct references based of the fetched objects
-                for rid in fetchedobjects:
-                    # note that only embedded document don't own a RID therefore we only need to check the edges
-                    object = fetchedobjects[rid]
-
-                    if isinstance(object, BaseVertex):
-                        edge_dict = object.out_edges
-
-                        for edge_dict_key in edge_dict:
-                            for obj in edge_dict[edge_dict_key]:
-                                if isinstance(obj, list):
-                                    for edge in obj:
-                                        edge_rid = '#{}:{}'.format(edge.tmp_rid[0], edge.tmp_rid[1])
-                                        if edge_rid in fetchedobjects:
-                                            edge.out_vertex = fetchedobjects[edge_rid]
-                                elif isinstance(obj, BaseEdge):
-                                    edge_rid = '#{}:{}'.format(obj.tmp_rid[0], obj.tmp_rid[1])
-                                    if edge_rid in fetchedobjects:
-                                        obj.out_vertex = fetchedobjects[edge_rid]
-
-                        edge_dict = object.in_edges
-
-                        for edge_dict_key in edge_dict:
-                            for obj in edge_dict[edge_dict_key]:
-                                if isinstance(obj,list):
-                                    for edge in obj:
-                                        edge_rid = '#{}:{}'.format(edge.tmp_rid[0], edge.tmp_rid[1])
-                                        if edge_rid in fetchedobjects:
-                                            edge.in_vertex = fetchedobjects[edge_rid]
-                                elif isinstance(obj, BaseEdge):
-                                    edge_rid = '#{}:{}'.format(obj.tmp_rid[0], obj.tmp_rid[1])
-                                    if edge_rid in fetchedobjects:
-                                        obj.in_vertex = fetchedobjects[edge_rid]
-                    elif isinstance(object, BaseEdge):
-                        if isinstance(object.tmp_rid, dict):
-                            if 'in' in object.tmp_rid:
-                                in_rid = '#{}:{}'.format(object.tmp_rid['in'][0], object.tmp_rid['in'][1])
-                                if in_rid in fetchedobjects:
-                                    object.in_vertex = fetchedobjects[in_rid]
-                            if 'out' in object.tmp_rid:
-                                out_rid = '#{}:{}'.format(object.tmp_rid['out'][0], object.tmp_rid['out'][1])
-                                if out_rid in fetchedobjects:
-                                    object.out_vertex = fetchedobjects[out_rid]
+                    loaded = self.__loadselect(missing, fetchplan)
 
+                for key in missing:
+                    if key not in loaded:
+                        # drop outdated objects of records which don't exist anymore
+                        self.cache.pop(key, None)
+                self.cache.update(loaded)
+                objects.update(loaded)
 
-                fetchedobjects["rest"] = resultdata
-                return fetchedobjects
+            if materializer is not None:
+                materializer.addall(objects)
+                materializer.materialize(loaded.values())
+
+            return [objects.get(key) for key in keys]
+        except Exception as err:
+            logging.error(err)
+
+    def revalidate(self, objects=None):
+        """
+        Checks whether the given objects are still up to date. Only the rid and version of every record is fetched by
+        pipelined record metadata requests (up to batchsize per round trip) and just the records whose version has
+        changed are loaded again. The object cache is updated accordingly, records which don't exist anymore are
+        removed from it.
+
+        :param objects: list of entities, by default all objects of the cache
+        :return: dict of (cluster-id, cluster-position) -> reloaded object, None for deleted records. None if the
+                 versions couldn't be fetched, the cache is left untouched then.
+        """
+        try:
+            if objects is None:
+                objects = list(self.cache.values())
+
+            versions = dict()
+            for obj in objects:
+                if isinstance(obj, BaseEntity) and obj.clusterid is not None and obj.clusterposition is not None:
+                    versions[(obj.clusterid, obj.clusterposition)] = obj.version
+
+            rids = list(versions)
+            current = dict()
+            for i in range(0, len(rids), OClient.batchsize):
+                chunk = rids[i:i + OClient.batchsize]
+                try:
+                    responses = self.__odb.recordmetadatamany(self.__connection, chunk)
+                except RecordNotFoundException:
+                    # a missing record ends the pipeline, ask for each record separately
+                    responses = [self.__odb.recordmetadata(self.__connection, rid[0], rid[1]) for rid in chunk]
+
+                for rid, response in zip(chunk, responses):
+                    if response is not None:
+                        current[rid] = response.get("record-version")
+
+            changed = [rid for rid in rids if rid in current and current[rid] != versions[rid]]
+            deleted = [rid for rid in rids if rid not in current]
+
+            debug("revalidated %s records, %s changed, %s deleted", len(rids), len(changed), len(deleted))
+
+            result = dict.fromkeys(deleted)
+            for rid in deleted:
+                self.cache.pop(rid, None)
+
+            if changed:
+                loaded = self.__loadpipelined(changed, "", True) if len(changed) <= OClient.pipelinelimit else self.__loadselect(changed, "")
+                if len(loaded) < len(changed):
+                    logging.warning("{} changed records couldn't be reloaded".format(len(changed) - len(loaded)))
+                self.cache.update(loaded)
+                result.update({rid: loaded[rid] for rid in changed if rid in loaded})
+
+            if result:
+                self.invalidate(set(result))
+
+            return result
+        except Exception as err:
+            logging.error(err)
+
+    def __loadpipelined(self, rids:list, fetchplan:str, ignorecache:bool):
+        responses = self.__odb.recordloadmany(self.__connection, rids, fetch_plan=fetchplan, ignore_cache=int(ignorecache), load_tombstones=0)
+
+        loaded = dict()
+        if responses:
+            for rid, response in zip(rids, responses):
+                for payload in response.get("payload", ()):
+                    for record in payload.get("records"):
+                        if payload.get("payload-status") == 1:
+                            key = rid
+                        else:
+                            # pre-fetched records bring their own rid
+                            key = (record.get("cluster-id"), record.get("cluster-position"))
+
+                        try:
+                            loaded[key], _ = self.hydrate(record, key[0], key[1], operation_type=OOperationType.REQUEST_RECORD_LOAD.value)
+                        except SerializationException as err:
+                            logging.error(err)
+        return loaded
+
+    def __loadselect(self, rids:list, fetchplan:str):
+        query_string = "select from [{}]".format(", ".join("#{}:{}".format(rid[0], rid[1]) for rid in rids))
+
+        command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=fetchplan, serialized_params="")
+        result_data = self.__command(self.__connection, OCommandClass.IDEMPOTENT, command)
+
+        collector = OGraphMaterializer()
+        self.extractobjects(result_data, None, collector)
+
+        return collector.objects()
+
+    def paginate(self, query_type:Select, pagesize:int=1000, prefetch:bool=False):
+        """
+        Iterates over the result of a select page by page. Every page continues right after the rid of the last record
+        of the previous one (see Select.parsepage), so the costs of a page don't grow with the number of pages read
+        before. The objects are wired per page and not cached.
+
+        If prefetch is set the next page will be loaded on a pooled connection while the current one is consumed.
+
+        :param query_type: select of whole records without order, skip or limit
+        :param pagesize: number of records per page
+        :param prefetch: load the next page in background
+        :return: generator of objects
+        :raises: OPyClientException if a page doesn't end behind the previous one, which would repeat it forever
+        """
+        clazz = query_type.getclass()
+
+        def advance(page:dict, lastrid:tuple):
+            rid = torid(next(reversed(page)))
+            if lastrid is not None and (rid is None or rid <= lastrid):
+                raise OPyClientException("the page behind #{}:{} doesn't advance, it ends at {}".format(lastrid[0], lastrid[1], next(reversed(page))))
+            return rid
+
+        def loadpage(lastrid, pooled:bool=False):
+            # the rid is sent as parameter as well
+            params = self.newparams()
+            query_string = query_type.parsepage(lastrid, pagesize, params)
+            if pooled:
+                with self.getpool().connection() as connection:
+                    result_data = self.__query(connection, query_string, query_type.fetchplan, params)
             else:
-                return None
+                result_data = self.__query(self.__connection, query_string, query_type.fetchplan, params)
+
+            materializer = OGraphMaterializer()
+            fetchedobjects, _, prefetched = self.extractobjects(result_data, clazz, materializer, cache=False)
+            materializer.materialize(links=len(prefetched) > 0)
+            return fetchedobjects
+
+        if prefetch:
+            executor = ThreadPoolExecutor(max_workers=1)
+            try:
+                page = executor.submit(loadpage, None, True).result()
+                lastrid = None
+                while page:
+                    lastrid = advance(page, lastrid)
+                    nextpage = None
+                    if len(page) >= pagesize:
+                        nextpage = executor.submit(loadpage, lastrid, True)
+
+                    for obj in page.values():
+                        yield obj
+
+                    page = nextpage.result() if nextpage else None
+            finally:
+                executor.shutdown(wait=True)
+        else:
+            page = loadpage(None)
+            lastrid = None
+            while page:
+                lastrid = advance(page, lastrid)
+                for obj in page.values():
+                    yield obj
+
+                page = loadpage(lastrid) if len(page) >= pagesize else None
+
+    def __query(self, connection:OConnection, query_string:str, fetchplan:str="", params:list=None):
+        command = OSQLCommand(query_string, non_text_limit=-1, fetchplan=fetchplan, serialized_params=self.serializeparams(params))
+        return self.__command(connection, OCommandClass.IDEMPOTENT, command, params)
+
+    def __command(self, connection:OConnection, class_name:OCommandClass, command, params:list=None):
+        """
+        Sends a synchronous command and adds it to the slow query log if it took too long
+
+        :param connection:
+        :param class_name:
+        :param command: OSQLCommand or OSQLScriptCommand
+        :param params: query parameters, only used for the slow query log
+        :return: response data
+        """
+        if self.resultcache is not None:
+            # the cached results are invalidated even if the command fails, it might have been executed anyway
+            self.invalidate(writetargets(command.getdata().get("text") or ""))
+
+        slowlog = self.slowlog
+        if slowlog is None:
+            return self.__odb.command(connection, mode=OModeChar.SYNCHRONOUS, class_name=class_name, command_payload=command)
+
+        start = time.perf_counter()
+        result_data = self.__odb.command(connection, mode=OModeChar.SYNCHRONOUS, class_name=class_name, command_payload=command)
+        duration = time.perf_counter() - start
+
+        if duration >= slowlog.threshold:
+            data = command.getdata()
+            sql = data.get("text")
+            size, decode = connection.lastresponse
+
+            plan = None
+            if slowlog.explainable(sql):
+                explained, plan = slowlog.plan(sql)
+                if not explained:
+                    plan = self.__explain(connection, slowlog.explain, sql, data.get("fetchplan"), params)
+                    slowlog.addplan(sql, plan)
+
+            logging.warning("slow query ({:.3f}s): {}".format(duration, sql))
+            slowlog.add(OSlowQuery(time.time(), duration, sql, list(params) if params else None, data.get("fetchplan"),
+                                   size, decode, plan))
+
+        return result_data
+
+    def __cacheclass(self, query_type:QueryType):
+        """
+        :return: name of the class whose writes invalidate the cached result of the query or None if any write has to
+        """
+        query = query_type.template.query if isinstance(query_type, BoundQuery) else query_type
+        # traversals and fetch plans add records of other classes to the result
+        if not isinstance(query, Select) or query_type.fetchplan:
+            return None
+
+        clazz = query.getclass()
+        return self.retrieveclassname(clazz) if isinstance(clazz, type) else None
+
+    def invalidate(self, targets:set=None):
+        """
+        Removes the cached results (see OResultCache) of the written classes and their super classes
+
+        :param targets: set of class names and (cluster-id, cluster-position) tuples, None invalidates all results
+        """
+        resultcache = self.resultcache
+        if resultcache is None or (targets is not None and not targets):
+            return
+
+        classes = self.schema.classes if self.schema is not None else None
+        if targets is None or not classes:
+            resultcache.clear()
+            return
+
+        names = set()
+        for target in targets:
+            if isinstance(target, tuple):
+                target = next((name for name, data in classes.items() if target[0] in (data.get("clusterIds") or ())), None)
+
+            if target not in classes:
+                # the super classes are unknown
+                resultcache.clear()
+                return
+
+            while target is not None and target not in names:
+                names.add(target)
+                target = classes.get(target, {}).get("superClass")
+
+        resultcache.invalidate(names)
+
+    def __explain(self, connection:OConnection, prefix:str, sql:str, fetchplan:str, params:list):
+        """
+        Sends the query once more with the given prefix (explain or profile) to capture the plan of the server
+
+        :return: the decoded plan document or None
+        """
+        try:
+            command = OSQLCommand("{} {}".format(prefix, sql), non_text_limit=-1, fetchplan=fetchplan or "", serialized_params=self.serializeparams(params))
+            result_data = self.__odb.command(connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+            for record in iterrecords(result_data):
+                plan, _ = self.parseobject(record.get("record-content"), None)
+                return plan
+        except Exception as err:
+            logging.error(err)
+        return None
+
+    def batch(self, transactional:bool=False, retry:int=None):
+        """
+        Creates a batch to send several create, update, delete or move queries as one script
+
+            with client.batch(transactional=True) as batch:
+                batch.add(Create(Vertex(vertex)))
+                batch.add(Create(Edge(edge)))
+
+        :param transactional: wrap the queries into begin and commit
+        :param retry: number of retries of the commit in case of a concurrent modification
+        :return: OBatch
+        """
+        return OBatch(self, transactional, retry)
+
+    def metrics(self, aggregated:bool=False):
+        """
+        :param aggregated: return the metrics of all connections instead of the ones of this client's connection
+        :return: OMetrics with counters and latency histograms per operation type
+        """
+        if aggregated:
+            return OMetrics.aggregated
+        return self.__connection.metrics
+
+    def session(self):
+        """
+        Creates a unit of work which sends the changes of its entities within one transaction
+
+        :return: OSession
+        """
+        return OSession(self)
+
+    def transaction(self, *objects):
+        """
+        Creates a session for the given entities which commits all of their changes at once when the with block is
+        left. New entities (the ones without rid) and all new entities reachable from them get temporary rids, so a
+        graph of new vertices and edges can be created within one round trip.
+
+            with client.transaction(kassel, berlin) as tx:
+                tx.add(edge)
+
+        :param objects: new or already persisted entities
+        :return: OSession
+        """
+        session = OSession(self)
+        for obj in objects:
+            if getattr(obj, 'clusterid', None) is None:
+                session.add(obj)
+            else:
+                session.attach(obj)
+        return session
+
+    def commit(self, entries:list):
+        """
+        Sends the given entries (see OTXOperationCreate, OTXOperationUpdate and OTXOperationDelete) as one transaction
+
+        :param entries:
+        :return: response containing the created and updated records
+        """
+        try:
+            # the classes of the records aren't known here
+            self.invalidate()
+            return self.__odb.txcommit(self.__connection, next(self.__txids), 1, entries)
+        except ConcurrentModificationException:
+            # the entries are stale, they have to be recreated by the caller (see OSession.flush)
+            raise
+        except Exception as err:
+            logging.error(err)
+
+    def script(self, text:str, language:str="sql", params:list=None):
+        """
+        Executes a script
+
+        :param text: script text
+        :param language: language of the script
+        :param params: values of the named parameters of the script
+        :return: response
+        """
+        try:
+            command = OSQLScriptCommand(language, text, non_text_limit=-1, fetchplan="", serialized_params=self.serializeparams(params))
+            return self.__command(self.__connection, OCommandClass.SCRIPT, command, params)
+        except Exception as err:
+            logging.error(err)
+
+    def newparams(self):
+        """
+        :return: a list to collect query parameters or None if the values should be written into the query
+        """
+        if OClient.parameterized and ODriverConfig.SERIALIZATION == OSerialization.SERIALIZATION_BINARY:
+            return list()
+        return None
+
+    def serializeparams(self, params:list):
+        """
+        Serializes the collected query parameters for the serialized-params field of a command
+
+        :param params: values collected while parsing a query or a list of positional values
+        :return: bytes or an empty string if there are no parameters
+        """
+        if not params:
+            return ""
+
+        serializer = OBinarySerializer()
+        return serializer.encodeparams(toparams(params))
+
+    def live(self):
+        """
+        Opens a connection for live queries. Changes pushed for its subscriptions refresh the RID cache and invalidate
+        the result cache of this client (see OLiveQuery)
+
+        :return: OLiveQuery
+        """
+        return OLiveQuery(self, self.getpool().open(OPushConnection))
+
+    def getpool(self, size:int=4):
+        """
+        Returns the connection pool used for parallel work. It will be created on first use
+
+        :param size: maximum number of pooled connections
+        :return:
+        """
+        if self.__pool is None:
+            self.__pool = OConnectionPool(size=size, **self.__credentials)
+        return self.__pool
+
+    def clusters(self, clazz, polymorphic:bool=True):
+        """
+        Reads the ids of the clusters the records of the given class are stored in
+
+        :param clazz: class or class name
+        :param polymorphic: include the clusters of all subclasses
+        :return: list of cluster ids
+        """
+        try:
+            class_name = clazz if isinstance(clazz, str) else self.retrieveclassname(clazz)
+
+            classes = self.__readclasses()
+
+            names = [class_name]
+            if polymorphic:
+                for name in names:
+                    names.extend(sub for sub, data in classes.items() if data.get("superClass") == name and sub not in names)
+
+            clusterids = list()
+            for name in names:
+                if name in classes:
+                    clusterids.extend(classes[name].get("clusterIds") or ())
+                else:
+                    logging.warning("there is no class with name '{}'".format(name))
+            return clusterids
         except Exception as err:
             logging.error(err)
 
+    def scan(self, clazz, chunksize:int=1000, workers:int=4, polymorphic:bool=True, retries:int=2):
+        """
+        Reads all records of a class by loading chunks of its clusters in parallel on pooled connections. In contrast
+        to a select the objects are neither cached nor wired and they are yielded in no particular order.
+
+        :param clazz: class or class name
+        :param chunksize: number of cluster positions loaded per query
+        :param workers: number of parallel connections
+        :param polymorphic: include the records of all subclasses
+        :param retries: number of times a chunk which couldn't be loaded is tried again
+        :return: generator of objects
+        :raises: OPyClientException if a chunk couldn't be loaded
+        """
+        clusterids = self.clusters(clazz, polymorphic)
+        if not clusterids:
+            return iter(())
+
+        scanner = OClusterScanner(self, self.getpool(workers), chunksize=chunksize, workers=workers, retries=retries)
+        return scanner.scan(clusterids, None if isinstance(clazz, str) else clazz)
+
     def close(self):
         """
         Close connection
         """
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+
         self.__odb.dbclose(self.__connection)
 
     def parseobject(self, record_content:str, clazz):
-        logging.debug("start parsing record content")
+        debug("start parsing record content")
 
         # if issubclass(clazz, BaseVertex):
         #     logging.debug("class is from type BaseVertex")
@@ -587,14 +1273,47 @@ class OClient(object):
 
 
     def readschema(self, force:bool=False):
+        """
+        Reads the global properties and the classes of the schema. The binary serializer uses them to write the
+        fields of schemaful classes as global property ids.
 
+        :param force: read the schema even if it has been read before
+        :return:
+        """
         try:
             if not OClient.schema or force:
                 result = self.fetch(Select(OSchema, ['globalProperties'],()))
-            OClient.schema = result['#-2:0']
+                schema = result['#-2:0']
+
+                # class name -> dict with superClass and properties (property name -> global id)
+                schema.classes = dict()
+                for name, data in self.__readclasses().items():
+                    properties = dict()
+                    for prop in data.get("properties") or ():
+                        if isinstance(prop, dict) and prop.get("globalId") is not None:
+                            properties[prop.get("name")] = prop.get("globalId")
+                    schema.classes[name] = {"superClass": data.get("superClass"), "clusterIds": data.get("clusterIds"),
+                                            "properties": properties}
+
+                OClient.schema = schema
+                OSerializer.schema = schema
+                # the layouts depend on the schema
+                OBinarySerializer.layouts.clear()
         except Exception as err:
             logging.error(err)
 
+    def __readclasses(self):
+        """
+        :return: dict of class name -> name, superClass, clusterIds and properties of the class
+        """
+        command = OSQLCommand("select name, superClass, clusterIds, properties from (select expand(classes) from metadata:schema)", non_text_limit=-1, fetchplan="", serialized_params="")
+        result_data = self.__command(self.__connection, OCommandClass.IDEMPOTENT, command)
+
+        classes = dict()
+        for record in iterrecords(result_data):
+            data, _ = self.parseobject(record.get("record-content"), None)
+            classes[data.get("name")] = data
+        return classes
 
 
     def createentitydict(self, base_class):
@@ -606,4 +1325,34 @@ class OClient(object):
         subclasses = base_class.__subclasses__()
         for clazz in subclasses:
             OClient.entities[self.retrieveclassname(clazz)] = clazz.__module__
-            self.createentitydict(clazz)
\ No newline at end of file
+            self.createentitydict(clazz)
+
+
+def attributes(entity:BaseEntity):
+    """
+    :param entity:
+    :return: dict of the persistent attributes of the entity which have a value
+    """
+    result = dict()
+    for name in entity.persistentattributes():
+        value = getattr(entity, name, None)
+        if value is not None:
+            result[name] = value
+    return result
+
+def ismetadata(query_type:QueryType):
+    """
+    :param query_type:
+    :return: True if the query selects system records like the schema
+    """
+    clazz = query_type.getclass() if isinstance(query_type, Select) else None
+    return isinstance(clazz, type) and issubclass(clazz, SystemType)
+
+def chunks(values:list, size:int):
+    """
+    :param values:
+    :param size:
+    :return: generator of lists with up to size values
+    """
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
@@ -0,0 +1,181 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import logging
+import threading
+
+from opy.client.o_db_base import BaseEntity
+from opy.client.o_db_scan import iterrecords
+from opy.common.o_db_constants import OModeChar, OCommandClass, OTXOperationType
+from opy.common.o_db_model import OSQLCommand
+from opy.database.o_db_ops import ODB
+from opy.database.o_db_push import OPushConnection
+
+__author__ = 'daill'
+
+
+OLiveEvent = collections.namedtuple("OLiveEvent", ["operation", "token", "rid", "version", "object"])
+OLiveEvent.__doc__ = """
+Change of a record matching a live query. The operation is one of OTXOperationType, rid is a (cluster-id,
+cluster-position) tuple and object the hydrated record or None if it couldn't be created.
+"""
+
+
+class OLiveQuery(object):
+    """
+    LIVE SELECT subscriptions of a client. They use a connection of their own which is read by a background thread.
+    Every pushed change is fed to the client:
+
+        created     the result cache entries of the class are invalidated
+        updated     the object in the RID cache is replaced by the new version and the result cache entries of the
+                    class are invalidated
+        deleted     the object is removed from the RID cache and the result cache entries are invalidated
+
+    Afterwards the callback of the subscription gets an OLiveEvent. Callbacks run in the reader thread.
+
+        with client.live() as live:
+            live.subscribe(Select(City, (), ()), callback)
+    """
+    def __init__(self, client, connection:OPushConnection):
+        """
+        :param client: OClient which gets the changes
+        :param connection: opened OPushConnection
+        """
+        self.__client = client
+        self.__connection = connection
+        self.__odb = ODB()
+        # token -> callback
+        self.__subscriptions = dict()
+        # held by the reader while it waits for pushed messages, so requests don't interfere
+        self.__lock = threading.Lock()
+        self.__running = False
+        self.__thread = None
+
+    def subscribe(self, query, callback=None):
+        """
+        Sends a live select and starts the reader thread if it isn't running, yet
+
+        :param query: Select or the text of a select
+        :param callback: callable getting an OLiveEvent
+        :return: token of the subscription
+        """
+        text = query if isinstance(query, str) else query.parse()
+        result_data = self.__send("live {}".format(text))
+
+        token = None
+        for record in iterrecords(result_data):
+            data, _ = self.__client.parseobject(record.get("record-content"), None)
+            token = data.get("token")
+
+        if token is None:
+            raise ValueError("the server didn't accept the live query '{}'".format(text))
+
+        self.__subscriptions[token] = callback
+        self.start()
+        return token
+
+    def unsubscribe(self, token:int):
+        self.__subscriptions.pop(token, None)
+        self.__send("live unsubscribe {}".format(token))
+
+    def tokens(self):
+        return list(self.__subscriptions)
+
+    def start(self):
+        if self.__thread is None:
+            self.__running = True
+            self.__thread = threading.Thread(target=self.__run, name="opy-live", daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the reader thread and closes the connection, the subscriptions end with it
+        """
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__subscriptions.clear()
+        self.__odb.dbclose(self.__connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __send(self, text:str):
+        command = OSQLCommand(text, non_text_limit=-1, fetchplan="", serialized_params="")
+        # changes pushed while waiting for the response are kept by the connection until the reader polls
+        with self.__lock:
+            return self.__odb.command(self.__connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+
+    def isrunning(self):
+        """
+        :return: False if the reader has been stopped or the connection has been lost, the subscriptions are gone then
+        """
+        return self.__running
+
+    def __run(self):
+        while self.__running:
+            try:
+                with self.__lock:
+                    pushes = self.__connection.poll()
+            except Exception as err:
+                logging.error(err)
+                logging.warning("live queries {} ended".format(", ".join(str(token) for token in self.__subscriptions)))
+                self.__running = False
+                self.__subscriptions.clear()
+                break
+            self.__dispatchall(pushes)
+
+    def __dispatchall(self, pushes):
+        for push in pushes:
+            try:
+                self.dispatch(push)
+            except Exception as err:
+                logging.error(err)
+
+    def dispatch(self, push):
+        """
+        Feeds a pushed change to the caches of the client and calls the callback of its subscription
+
+        :param push: OPushRecord
+        """
+        client = self.__client
+        rid = (push.cluster_id, push.cluster_position)
+
+        obj = None
+        if push.content:
+            try:
+                obj, _ = client.hydrate({"record-content": push.content, "record-version": push.version}, *rid)
+            except Exception as err:
+                logging.error(err)
+
+        # plain dicts are records of classes without python counterpart
+        entity = obj if isinstance(obj, BaseEntity) else None
+
+        if push.operation == OTXOperationType.DELETE.value:
+            client.cache.pop(rid, None)
+        elif push.operation == OTXOperationType.UPDATES.value and entity is not None and rid in client.cache:
+            client.cache[rid] = entity
+
+        client.invalidate({client.retrieveclassname(type(entity)) if entity is not None else rid})
+
+        callback = self.__subscriptions.get(push.token)
+        if callback is not None:
+            callback(OLiveEvent(push.operation, push.token, rid, push.version, obj))
@@ -0,0 +1,211 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from opy.client.o_db_base import BaseVertex, BaseEdge, BaseEntity
+from opy.client.o_db_utils import parserid
+from opy.common.o_db_model import ORid
+
+__author__ = 'daill'
+
+
+class OGraphMaterializer(object):
+    """
+    Wires the edges of fetched vertices and edges to the objects they are pointing to.
+
+    The RID index is keyed by (cluster-id, cluster-position) tuples which is exactly the form the codec returns for
+    links and ridbag entries, so every endpoint is resolved by a single dict lookup without formatting RID strings.
+    Endpoints which are not part of the index are remembered together with the edges waiting for them. They can be
+    loaded afterwards (see unresolved) and passed back via addall to finish the wiring.
+
+    The edges of a vertex are stubs built from its ridbags. The owning side is already set by the edge setters of the
+    vertex, the other side is taken from the edge record the ridbag entry points to. If the entry points to a vertex
+    (lightweight edges) that vertex is the other side.
+    """
+    def __init__(self):
+        # (cluster-id, cluster-position) -> object
+        self.__index = dict()
+        # (cluster-id, cluster-position) -> list of (holder, attribute name, via edge record) waiting for the object
+        self.__pending = dict()
+
+    def add(self, obj, rid:tuple=None):
+        """
+        Adds an object to the index. If no rid tuple is given it will be taken from the object itself
+
+        :param obj: fetched object, either an entity or a plain dict
+        :param rid: (cluster-id, cluster-position)
+        :return:
+        """
+        if rid is None:
+            if isinstance(obj, BaseEntity):
+                rid = (obj.clusterid, obj.clusterposition)
+            else:
+                logging.warning("can't index object of type '{}' without rid".format(type(obj)))
+                return
+
+        self.__index[rid] = obj
+
+        # there might be edges or links which have been waiting for this object
+        waiting = self.__pending.pop(rid, None)
+        if waiting:
+            for holder, key, via in waiting:
+                self.__resolve(holder, key, obj, via)
+
+    def addall(self, objects:dict):
+        """
+        Adds the given objects and wires all edges which have been waiting for them
+
+        :param objects: dict of rid string or rid tuple -> object
+        :return:
+        """
+        for rid, obj in objects.items():
+            if isinstance(rid, str):
+                rid = parserid(rid)
+                if rid is None:
+                    continue
+            self.add(obj, rid)
+
+    def get(self, rid:tuple):
+        return self.__index.get(rid)
+
+    def objects(self):
+        """
+        :return: the index dict of (cluster-id, cluster-position) -> object
+        """
+        return self.__index
+
+    def materialize(self, objects=None, links:bool=False):
+        """
+        Resolves the edge endpoints of the given objects in one pass. By default every indexed object will be
+        processed. If links is set, link fields (single links, link lists and link maps, see ORid) of the persistent
+        attributes will be replaced by the objects they are pointing to as well.
+
+        :param objects: iterable of objects to wire
+        :param links: wire link fields
+        :return: list of unresolved RIDs
+        """
+        if objects is None:
+            objects = list(self.__index.values())
+
+        for obj in objects:
+            if links and isinstance(obj, BaseEntity):
+                self.__wirelinks(obj)
+
+            if isinstance(obj, BaseVertex):
+                # the vertex owns the out side of its out edges and the in side of its in edges
+                for edge in iteredges(getattr(obj, 'out_edges', None)):
+                    self.__wire(edge, getattr(edge, 'tmp_rid', None), 'in_vertex', True)
+                for edge in iteredges(getattr(obj, 'in_edges', None)):
+                    self.__wire(edge, getattr(edge, 'tmp_rid', None), 'out_vertex', True)
+            elif isinstance(obj, BaseEdge):
+                tmp_rid = getattr(obj, 'tmp_rid', None)
+                if isinstance(tmp_rid, dict):
+                    if 'in' in tmp_rid:
+                        self.__wire(obj, tmp_rid['in'], 'in_vertex')
+                    if 'out' in tmp_rid:
+                        self.__wire(obj, tmp_rid['out'], 'out_vertex')
+
+        return self.unresolved()
+
+    def unresolved(self):
+        """
+        :return: list of RID strings which are referenced by edges but are not part of the index
+        """
+        return ["#{}:{}".format(rid[0], rid[1]) for rid in self.__pending]
+
+    def __wire(self, holder, rid, key, via:bool=False):
+        """
+        :param via: rid is a ridbag entry, the object to assign is the endpoint of the edge record it points to
+        """
+        if not isinstance(rid, tuple):
+            return
+
+        target = self.__index.get(rid)
+        if target is not None:
+            self.__resolve(holder, key, target, via)
+        else:
+            self.__pending.setdefault(rid, list()).append((holder, key, via))
+
+    def __resolve(self, edge, key, target, via:bool):
+        if not via:
+            assign(edge, key, target)
+        elif isinstance(target, BaseEdge):
+            # take the endpoint from the edge record, the stub gets its rid as well
+            if target is not edge and getattr(edge, 'clusterid', None) is None:
+                edge.setRID(target.clusterid, target.clusterposition)
+            tmp_rid = getattr(target, 'tmp_rid', None)
+            side = 'in' if key == 'in_vertex' else 'out'
+            if isinstance(tmp_rid, dict) and side in tmp_rid:
+                self.__wire(edge, tmp_rid[side], key)
+            elif getattr(target, key, None) is not None:
+                assign(edge, key, getattr(target, key))
+        elif isinstance(target, BaseVertex):
+            assign(edge, key, target)
+
+    def __wirelinks(self, obj:BaseEntity):
+        if not hasattr(obj, 'persistentattributes'):
+            return
+
+        try:
+            attributes = obj.persistentattributes()
+        except NotImplementedError:
+            return
+
+        # only values decoded as links are wired, other pairs like UUIDs are tuples as well
+        for attribute in attributes:
+            value = getattr(obj, attribute, None)
+            if isinstance(value, ORid):
+                self.__wire(obj, value, attribute)
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, ORid):
+                        self.__wire(value, item, i)
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, ORid):
+                        self.__wire(value, item, key)
+
+
+def assign(holder, key, obj):
+    """
+    Sets the resolved object either as attribute of an entity or as item of a link collection
+    """
+    if isinstance(holder, (list, dict)):
+        holder[key] = obj
+    else:
+        setattr(holder, key, obj)
+
+
+def iteredges(edge_dict:dict):
+    """
+    Flattens the edge dict of a vertex. Values are either lists of edges or lists of edge lists
+
+    :param edge_dict:
+    :return: generator of edges
+    """
+    if not edge_dict:
+        return
+
+    for edge_list in edge_dict.values():
+        if not edge_list:
+            continue
+        for obj in edge_list:
+            if isinstance(obj, BaseEdge):
+                yield obj
+            elif isinstance(obj, list):
+                for edge in obj:
+                    if isinstance(edge, BaseEdge):
+                        yield edge
+
@@ -0,0 +1,127 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from opy.client.o_db_base import BaseVertex, BaseEdge
+from opy.client.o_db_materializer import iteredges
+from opy.client.o_db_set import Create, Vertex, Edge
+from opy.common.o_db_model import ORid
+
+
+__author__ = 'daill'
+
+
+class OGraphPlanner(object):
+    """
+    Plans the creation of an object graph. The graph is walked once without recursion, every object is visited only
+    once (by identity) so cycles and vertices shared by several edges don't cause any additional work.
+
+    Vertices without rid will be created first, afterwards the edges without rid, so every edge is created after both
+    of its vertices. Already persisted vertices are used as endpoints but their persisted edges aren't followed.
+    """
+    def __init__(self):
+        self.vertices = list()
+        self.edges = list()
+        # ids of the visited objects
+        self.__visited = set()
+
+    def __len__(self):
+        return len(self.vertices) + len(self.edges)
+
+    def endpoints(self):
+        """
+        :return: list of the vertices connected by the planned edges, each one only once
+        """
+        result = dict()
+        for edge in self.edges:
+            for vertex in (edge.in_vertex, edge.out_vertex):
+                result[id(vertex)] = vertex
+        return list(result.values())
+
+    def add(self, *objects):
+        """
+        Walks the graph reachable from the given vertices or edges
+
+        :param objects:
+        :return:
+        """
+        pending = list(objects)
+        while pending:
+            obj = pending.pop()
+            if obj is None or id(obj) in self.__visited:
+                continue
+            self.__visited.add(id(obj))
+
+            if isinstance(obj, BaseVertex):
+                if isnew(obj):
+                    self.vertices.append(obj)
+                pending.extend(iteredges(getattr(obj, 'out_edges', None)))
+                pending.extend(iteredges(getattr(obj, 'in_edges', None)))
+            elif isinstance(obj, BaseEdge):
+                if not isnew(obj):
+                    continue
+
+                in_vertex = getattr(obj, 'in_vertex', None)
+                out_vertex = getattr(obj, 'out_vertex', None)
+                if in_vertex is None or out_vertex is None:
+                    logging.error("edge '{}' has to connect two vertices".format(obj))
+                    continue
+
+                self.edges.append(obj)
+                pending.append(in_vertex)
+                pending.append(out_vertex)
+            else:
+                logging.warning("can't save object of type '{}'".format(type(obj)))
+
+    def queries(self, vertices:bool=True):
+        """
+        :param vertices: False if the vertices have been created otherwise
+        :return: generator of the create queries in the order they have to be executed
+        """
+        if vertices:
+            for vertex in self.vertices:
+                yield Create(Vertex(vertex))
+        for edge in self.edges:
+            yield Create(Edge(edge))
+
+    def batches(self, size:int, vertices:bool=True):
+        """
+        Splits the queries into batches. Edges refer to vertices of the same batch by their script variables and to
+        vertices of previous batches by their rids which have been assigned after these were sent.
+
+        :param size: maximum number of queries per batch
+        :param vertices: False if the vertices have been created otherwise
+        :return: generator of lists of queries
+        """
+        batch = list()
+        for query in self.queries(vertices):
+            batch.append(query)
+            if len(batch) >= size:
+                yield batch
+                batch = list()
+        if batch:
+            yield batch
+
+
+def isnew(obj):
+    """
+    Edges read from the ridbags of a vertex are stubs which only know their rid by tmp_rid, they are stored as well
+
+    :param obj: entity or rid
+    :return: True if the entity hasn't been saved, yet
+    """
+    if isinstance(obj, ORid):
+        return False
+    return getattr(obj, 'clusterid', None) is None and getattr(obj, 'tmp_rid', None) is None
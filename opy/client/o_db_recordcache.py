@@ -0,0 +1,76 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import collections.abc
+import threading
+
+__author__ = 'daill'
+
+
+class ORecordCache(collections.abc.MutableMapping):
+    """
+    RID cache of a client, maps (cluster-id, cluster-position) to the object of the record. It's filled by fetches,
+    including the records pre-fetched because of a fetch plan, by load and by saving objects. The least recently used
+    objects are evicted as soon as there are more than maxsize.
+
+    Saves and deletes of the client replace or remove its objects, live queries do so for the changes pushed by the
+    server. Writes of other clients aren't noticed, use OClient.revalidate to reload the changed records.
+    """
+    def __init__(self, maxsize:int=10000):
+        """
+        :param maxsize: maximum number of objects, None for an unbounded cache
+        """
+        self.maxsize = maxsize
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, rid:tuple):
+        with self.__lock:
+            obj = self.__entries[rid]
+            self.__entries.move_to_end(rid)
+            return obj
+
+    def __setitem__(self, rid:tuple, obj):
+        with self.__lock:
+            self.__entries[rid] = obj
+            self.__entries.move_to_end(rid)
+
+            if self.maxsize is not None:
+                while len(self.__entries) > self.maxsize:
+                    self.__entries.popitem(last=False)
+
+    def __delitem__(self, rid:tuple):
+        with self.__lock:
+            del self.__entries[rid]
+
+    def __contains__(self, rid:tuple):
+        # a lookup doesn't count as use
+        return rid in self.__entries
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(list(self.__entries))
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def values(self):
+        with self.__lock:
+            return list(self.__entries.values())
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
@@ -0,0 +1,174 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import re
+import threading
+import time
+
+__author__ = 'daill'
+
+
+# string literals are kept as they are while normalising the whitespace of a query
+QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")")
+WHITESPACE = re.compile(r"\s+")
+
+# write statements and their target, which is a class name, a rid or a sub query
+WRITES = re.compile(r"\b(create\s+vertex|create\s+edge|insert\s+into|update|delete\s+vertex|delete\s+edge|delete\s+from"
+                    r"|truncate\s+class|drop\s+class|move\s+vertex)\s+([^\s;]+)", re.IGNORECASE)
+RID = re.compile(r"#(-?\d+):(-?\d+)")
+READS = ("select", "traverse", "explain", "profile")
+
+
+OCachedResult = collections.namedtuple("OCachedResult", ["result", "size", "class_name", "expires"])
+
+
+class OResultCache(object):
+    """
+    Cache of the responses of idempotent queries (select and traverse), keyed by the normalised query text, the fetch
+    plan and the parameters. Entries expire after ttl seconds and the least recently used ones are evicted as soon as
+    the responses take more than maxbytes.
+
+    The decoded responses are cached, not the objects, so every fetch creates objects of its own. Writes of the clients
+    using the cache invalidate the entries of the written class and its super classes. Queries with a fetch plan might
+    contain records of other classes, so their entries are invalidated by any write. Writes of other clients aren't
+    noticed, so the ttl bounds how long a result may be stale.
+    """
+    def __init__(self, ttl:float=60.0, maxbytes:int=16 * 1024 * 1024):
+        """
+        :param ttl: seconds an entry is valid
+        :param maxbytes: maximum sum of the response sizes of the entries
+        """
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key:tuple):
+        """
+        :param key: see key
+        :return: the cached response or None
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry.expires <= time.monotonic():
+                self.__remove(key)
+                self.misses += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def put(self, key:tuple, result:dict, size:int, class_name:str=None):
+        """
+        :param key: see key
+        :param result: decoded response
+        :param size: size of the response in bytes
+        :param class_name: queried class, None if any write should invalidate the entry
+        """
+        size = size or 0
+        if size > self.maxbytes:
+            return
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+
+            self.__entries[key] = OCachedResult(result, size, class_name, time.monotonic() + self.ttl)
+            self.size += size
+
+            while self.size > self.maxbytes:
+                self.__remove(next(iter(self.__entries)))
+
+    def invalidate(self, class_names:set):
+        """
+        Removes the entries of the given classes and the ones which aren't bound to a class
+
+        :param class_names:
+        """
+        with self.__lock:
+            for key in [key for key, entry in self.__entries.items()
+                        if entry.class_name is None or entry.class_name in class_names]:
+                self.__remove(key)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def __remove(self, key:tuple):
+        self.size -= self.__entries.pop(key).size
+
+    @staticmethod
+    def key(sql:str, fetchplan:str, params:list, database:tuple=None):
+        """
+        :param database: (host, port, database name) of the client, the cache might be shared by clients of different
+                         databases
+        :return: tuple of the database, the query text with normalised whitespace, the fetch plan and the parameters
+        """
+        return database, normalise(sql), fetchplan or "", repr(params) if params else ""
+
+
+def normalise(sql:str):
+    """
+    Collapses the whitespace of a query outside of string literals
+
+    :param sql:
+    :return:
+    """
+    parts = QUOTED.split(sql.strip())
+    # every second part is a string literal
+    return "".join(part if i % 2 else WHITESPACE.sub(" ", part) for i, part in enumerate(parts))
+
+
+def writetargets(sql:str):
+    """
+    Determines what a command writes
+
+    :param sql: command or script text
+    :return: set containing class names and (cluster-id, cluster-position) tuples, an empty set if the command doesn't
+             write anything or None if the written records can't be determined
+    """
+    words = sql.split(None, 1)
+    if words and words[0].lower() in READS:
+        return set()
+
+    targets = set()
+    for statement, target in WRITES.findall(sql):
+        statement = statement.lower()
+        # edges change the vertices they connect and moving changes two classes
+        if "edge" in statement or statement.startswith("move"):
+            return None
+
+        rid = RID.match(target)
+        if rid:
+            targets.add((int(rid.group(1)), int(rid.group(2))))
+        elif re.fullmatch(r"\w+", target) and target.lower() not in ("from", "where"):
+            targets.add(target)
+        else:
+            return None
+
+    return targets if targets else None
@@ -0,0 +1,71 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+import time
+
+from opy.common.o_db_exceptions import ConcurrentModificationException
+
+
+__author__ = 'daill'
+
+
+class ORetryPolicy(object):
+    """
+    Retries write operations which failed because of a concurrent modification. The delay before the next attempt
+    grows exponentially with every attempt and is jittered (a random value between zero and the delay), so clients
+    which have been conflicting on the same records don't collide again.
+    """
+    def __init__(self, attempts:int=3, backoff:float=0.05, maxbackoff:float=1.0):
+        """
+        :param attempts: maximum number of attempts including the first one
+        :param backoff: delay in seconds before the first retry
+        :param maxbackoff: upper bound of the delay in seconds
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.maxbackoff = maxbackoff
+
+    def delay(self, attempt:int):
+        """
+        :param attempt: number of the failed attempt, starting with 1
+        :return: seconds to wait
+        """
+        return random.uniform(0, min(self.maxbackoff, self.backoff * (2 ** (attempt - 1))))
+
+    def run(self, operation, refresh=None):
+        """
+        Executes the operation until it succeeds or the attempts are exhausted
+
+        :param operation: callable without arguments
+        :param refresh: callable which gets the ConcurrentModificationException, used to re-read the stale records
+        before the next attempt
+        :return: result of the operation
+        """
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except ConcurrentModificationException as err:
+                attempt += 1
+                if attempt >= self.attempts:
+                    logging.error("giving up after {} attempts".format(attempt))
+                    raise
+
+                logging.warning("concurrent modification of {}, retry {} of {}".format(err.rid, attempt, self.attempts - 1))
+                time.sleep(self.delay(attempt))
+
+                if refresh is not None:
+                    refresh(err)
@@ -0,0 +1,158 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from opy.common.o_db_constants import OModeChar, OCommandClass
+from opy.common.o_db_exceptions import SerializationException, OPyClientException
+from opy.common.o_db_model import OSQLCommand
+from opy.database.o_db_ops import ODB
+from opy.database.o_db_pool import OConnectionPool
+
+
+__author__ = 'daill'
+
+
+class OClusterScanner(object):
+    """
+    Reads all records of a set of clusters in parallel. The position range of every cluster is split into chunks of
+    chunksize positions and each chunk is loaded by a range query on one of the pooled connections. The decoded
+    objects are yielded as soon as a chunk is finished, so the records are not returned in cluster order.
+
+    A chunk which couldn't be loaded is tried again on a new connection up to retries times, after that the scan fails
+    instead of leaving out the records of the chunk.
+    """
+    def __init__(self, client, pool:OConnectionPool, chunksize:int=1000, workers:int=4, retries:int=2):
+        self.__client = client
+        self.__pool = pool
+        self.__chunksize = chunksize
+        self.__workers = workers
+        self.__retries = retries
+        self.__odb = ODB()
+
+    def chunks(self, clusterids:list):
+        """
+        Splits the position ranges of the given clusters
+
+        :param clusterids:
+        :return: list of (cluster-id, first position, last position)
+        """
+        chunks = list()
+        with self.__pool.connection() as connection:
+            for clusterid in clusterids:
+                response = self.__odb.dataclusterdatarange(connection, clusterid)
+                if not response:
+                    raise OPyClientException("could not read the range of cluster {}".format(clusterid))
+
+                begin = response.get("begin")
+                end = response.get("end")
+                if begin is None or end is None or begin < 0 or end < begin:
+                    logging.debug("cluster {} is empty".format(clusterid))
+                    continue
+
+                for first in range(begin, end + 1, self.__chunksize):
+                    chunks.append((clusterid, first, min(first + self.__chunksize - 1, end)))
+        return chunks
+
+    def scan(self, clusterids:list, clazz=None):
+        """
+        Loads all records of the given clusters. At most two chunks per worker are in flight to keep the memory
+        bounded while the caller processes the stream.
+
+        :param clusterids:
+        :param clazz: class to use if the record doesn't provide one
+        :return: generator of objects
+        :raises: OPyClientException if a chunk couldn't be loaded
+        """
+        chunks = self.chunks(clusterids)
+        window = self.__workers * 2
+
+        executor = ThreadPoolExecutor(max_workers=self.__workers)
+        pending = set()
+        try:
+            for chunk in chunks:
+                pending.add(executor.submit(self.loadchunk, chunk, clazz))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for obj in future.result():
+                            yield obj
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for obj in future.result():
+                        yield obj
+        finally:
+            # the caller might stop consuming the stream early
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def loadchunk(self, chunk:tuple, clazz=None):
+        """
+        :param chunk: (cluster-id, first position, last position)
+        :param clazz: class to use if the record doesn't provide one
+        :return: list of objects ordered by their cluster position
+        :raises: OPyClientException if the chunk couldn't be loaded
+        """
+        clusterid, first, last = chunk
+        query_string = "select from cluster:{} where @rid >= #{}:{} and @rid <= #{}:{}".format(clusterid, clusterid, first, clusterid, last)
+
+        for attempt in range(self.__retries + 1):
+            command = OSQLCommand(query_string, non_text_limit=-1, fetchplan="", serialized_params="")
+            connection = self.__pool.acquire()
+            result_data = self.__odb.command(connection, mode=OModeChar.SYNCHRONOUS, class_name=OCommandClass.IDEMPOTENT, command_payload=command)
+
+            if result_data is not None and result_data.get("success_status") == 0:
+                self.__pool.release(connection)
+                break
+
+            # the state of the connection is unknown after a failed request
+            self.__pool.discard(connection)
+            logging.warning("loading the records of cluster {} between {} and {} failed on attempt {}".format(clusterid, first, last, attempt + 1))
+        else:
+            raise OPyClientException("could not load the records of cluster {} between {} and {}".format(clusterid, first, last))
+
+        objects = list()
+        for record in iterrecords(result_data):
+            try:
+                # the workers add the hydration time to the metrics of their connection
+                parsedobject, _ = self.__client.hydrate(record, record.get("cluster-id"), record.get("cluster-position"), clazz,
+                                                        metrics=connection.metrics)
+                objects.append(parsedobject)
+            except SerializationException as err:
+                logging.error(err)
+
+        logging.debug("loaded {} records of cluster {} between {} and {}".format(len(objects), clusterid, first, last))
+
+        return objects
+
+
+def iterrecords(result_data:dict):
+    """
+    Iterates over the records of a synchronous command response
+
+    :param result_data: decoded response
+    :return: generator of record dicts
+    """
+    if not result_data or result_data.get("success_status") != 0:
+        return
+
+    for records_data in result_data.get("result", ()):
+        for record in records_data.get("records", ()):
+            if "cluster-id" in record and "cluster-position" in record and "record-content" in record:
+                yield record
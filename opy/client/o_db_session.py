@@ -0,0 +1,336 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import logging
+
+from opy.client.o_db_base import BaseEntity, BaseVertex, BaseEdge
+from opy.client.o_db_materializer import iteredges
+from opy.common.o_db_constants import ORecordType
+from opy.common.o_db_exceptions import OPyClientException, ConcurrentModificationException
+from opy.common.o_db_model import OTXOperationCreate, OTXOperationUpdate, OTXOperationDelete
+from opy.database.o_db_serializer import OBinarySerializer
+
+
+__author__ = 'daill'
+
+
+class OSession(object):
+    """
+    Unit of work for entities. Attached entities are snapshotted by their persistent attributes and edges, flush
+    compares them with the snapshots and sends all new, changed and deleted records within one transaction commit.
+    Records which haven't been changed are not sent at all.
+
+    New entities get a temporary rid (-1:-2, -1:-3, ...) as soon as they are added. Links and edges between new
+    entities are written with these rids, the server replaces them on commit and the created rids are written back to
+    the objects afterwards. So a whole graph is saved within one round trip.
+
+        with client.session() as session:
+            session.attach(*client.load(["#12:0", "#12:1"]))
+            ...
+    """
+    def __init__(self, client):
+        self.__client = client
+        # id of object -> (object, snapshot)
+        self.__tracked = dict()
+        self.__new = list()
+        self.__deleted = list()
+        # temporary cluster positions of new records
+        self.__positions = itertools.count(-2, -1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def attach(self, *objects):
+        """
+        Starts tracking the changes of already persisted entities
+
+        :param objects: entities, the items of lists and values of dicts (i.e. load and fetch results) will be attached as well
+        :return:
+        """
+        for obj in objects:
+            if isinstance(obj, dict):
+                self.attach(*obj.values())
+            elif isinstance(obj, list):
+                self.attach(*obj)
+            elif isinstance(obj, BaseEntity):
+                if getattr(obj, 'clusterid', None) is None or obj.clusterid < 0:
+                    raise OPyClientException("can't attach '{}' without rid, use add instead".format(obj))
+                self.__tracked[id(obj)] = (obj, snapshot(obj))
+
+    def add(self, *objects):
+        """
+        Adds new entities which will be created on flush. New entities which can be reached from them (by links, edges
+        or the vertices of an edge) are added as well, already persisted ones are left untouched.
+
+        :param objects:
+        :return:
+        """
+        pending = list(objects)
+        while pending:
+            obj = pending.pop()
+            if not isinstance(obj, BaseEntity) or id(obj) in self.__tracked:
+                continue
+
+            clusterid = getattr(obj, 'clusterid', None)
+            if clusterid is not None:
+                # either persisted or already added
+                continue
+
+            obj.setRID(-1, next(self.__positions))
+            self.__new.append(obj)
+            pending.extend(neighbours(obj))
+
+    def delete(self, obj:BaseEntity):
+        """
+        Marks an entity to be deleted on flush
+        """
+        # entities compare by rid, so new ones have to be compared by identity
+        for i, item in enumerate(self.__new):
+            if item is obj:
+                del self.__new[i]
+                obj.setRID(None, None)
+                return
+
+        self.__tracked.pop(id(obj), None)
+        self.__deleted.append(obj)
+
+    def changes(self, obj:BaseEntity):
+        """
+        :param obj: attached entity
+        :return: list of the attributes which have been changed since the entity has been attached or flushed
+        """
+        tracked = self.__tracked.get(id(obj))
+        if tracked is None:
+            return list()
+
+        current = snapshot(obj)
+        return [name for name, value in current.items() if tracked[1].get(name) != value]
+
+    def dirty(self):
+        """
+        :return: list of attached entities with changes
+        """
+        return [obj for obj, _ in self.__tracked.values() if self.changes(obj)]
+
+    def entries(self):
+        """
+        Creates the transaction entries for all pending changes
+
+        :return: list of entries and dict of temporary rid -> new object
+        """
+        serializer = OBinarySerializer()
+        entries = list()
+        created = dict()
+
+        for obj in self.__new:
+            created[(obj.clusterid, obj.clusterposition)] = obj
+            entries.append(OTXOperationCreate(ORecordType.DOCUMENT.value, serializer.encode(obj), obj.clusterposition))
+
+        for obj in self.dirty():
+            entries.append(OTXOperationUpdate(ORecordType.DOCUMENT.value, obj.clusterid, obj.clusterposition, obj.version, True, serializer.encode(obj)))
+
+        for obj in self.__deleted:
+            entries.append(OTXOperationDelete(ORecordType.DOCUMENT.value, obj.clusterid, obj.clusterposition, obj.version))
+
+        return entries, created
+
+    def flush(self):
+        """
+        Sends all pending changes within one transaction. Afterwards new objects have their rid, updated ones their
+        new version and all of them are tracked with a fresh snapshot.
+
+        If the commit fails because of a concurrent modification it will be retried according to the retry policy of
+        the client. The stale records are re-read and merged (see refresh) before the next attempt.
+
+        :return: response of the commit or None if there was nothing to do
+        """
+        if not self.__new and not self.__deleted and not self.dirty():
+            logging.debug("nothing to flush")
+            return None
+
+        policy = getattr(self.__client, 'retrypolicy', None)
+        if policy is None:
+            response, created = self.__commit()
+        else:
+            response, created = policy.run(self.__commit, self.refresh)
+
+        self.apply(response, created)
+
+        for obj in created.values():
+            self.__tracked[id(obj)] = (obj, None)
+        for obj in self.__deleted:
+            self.__client.cache.pop((obj.clusterid, obj.clusterposition), None)
+
+        self.__new = list()
+        self.__deleted = list()
+
+        for key, (obj, _) in list(self.__tracked.items()):
+            self.__tracked[key] = (obj, snapshot(obj))
+
+        return response
+
+    def __commit(self):
+        # the entries have to be created for every attempt, they contain the versions
+        entries, created = self.entries()
+
+        response = self.__client.commit(entries)
+        if response is None:
+            raise OPyClientException("transaction commit failed")
+
+        return response, created
+
+    def refresh(self, error:ConcurrentModificationException):
+        """
+        Re-reads the conflicting record, or all changed and deleted ones if the server didn't name it. Attributes which
+        haven't been changed within this session take the stored values, the own changes are kept and will be sent
+        with the stored version on the next attempt.
+
+        :param error:
+        :return:
+        """
+        stale = [obj for obj in self.dirty() + self.__deleted
+                 if error.rid is None or (obj.clusterid, obj.clusterposition) == error.rid]
+        if not stale:
+            return
+
+        loaded = self.__client.load(stale, ignorecache=True) or ()
+        for obj, current in zip(stale, loaded):
+            # the cache has to keep the object of this session
+            self.__client.cache[(obj.clusterid, obj.clusterposition)] = obj
+            if current is not None:
+                self.merge(obj, current)
+
+    def merge(self, obj:BaseEntity, current:BaseEntity):
+        """
+        Takes the stored version and all attributes which haven't been changed within this session from the current
+        state of the record
+
+        :param obj: tracked or deleted entity
+        :param current: freshly loaded entity of the same record
+        :return:
+        """
+        obj.version = current.version
+        if id(obj) not in self.__tracked:
+            return
+
+        changed = self.changes(obj)
+        names = list(snapshot(obj))
+        for name in names:
+            if name in changed:
+                continue
+            value = getattr(current, name, None)
+            if name in ("out_edges", "in_edges"):
+                # edges can only be replaced by a dict
+                if value is not None:
+                    setattr(obj, name, value)
+            else:
+                setattr(obj, name, value)
+
+        # the stored state is the new base, so the own changes are still dirty
+        self.__tracked[id(obj)] = (obj, snapshot(current))
+
+    def apply(self, response:dict, created:dict):
+        """
+        Writes the rids of created records and the new versions of all records back to the objects
+
+        :param response: decoded transaction commit response
+        :param created: dict of temporary rid -> new object
+        :return:
+        """
+        for record in response.get("record-created", ()):
+            obj = created.get((record.get("client-specified-cluster-id"), record.get("client-specified-cluster-position")))
+            if obj is not None:
+                obj.setRID(record.get("created-cluster-id"), record.get("created-cluster-position"))
+                self.__client.cache[(obj.clusterid, obj.clusterposition)] = obj
+
+        objects = {(obj.clusterid, obj.clusterposition): obj for obj, _ in self.__tracked.values()}
+        objects.update({(obj.clusterid, obj.clusterposition): obj for obj in created.values()})
+
+        for record in response.get("record-updated", ()):
+            obj = objects.get((record.get("updated-cluster-id"), record.get("updated-cluster-position")))
+            if obj is not None:
+                obj.version = record.get("new-record-version")
+
+
+def freeze(value):
+    """
+    Converts a value to an immutable representation which can be compared with a later state of the value. Entities
+    are represented by their rid, or by their identity as long as they haven't been saved.
+    """
+    if isinstance(value, BaseEntity):
+        if getattr(value, 'clusterid', None) is not None:
+            return BaseEntity, value.clusterid, value.clusterposition
+        return BaseEntity, id(value)
+    elif isinstance(value, list):
+        return list, tuple(freeze(item) for item in value)
+    elif isinstance(value, set):
+        return set, frozenset(freeze(item) for item in value)
+    elif isinstance(value, dict):
+        return dict, frozenset((key, freeze(item)) for key, item in value.items())
+    return value
+
+def neighbours(obj:BaseEntity):
+    """
+    :param obj:
+    :return: list of the entities referenced by the persistent attributes, edges or vertices of the given one
+    """
+    result = list()
+    try:
+        names = obj.persistentattributes()
+    except (AttributeError, NotImplementedError):
+        names = ()
+
+    for name in names:
+        value = getattr(obj, name, None)
+        if isinstance(value, list):
+            result.extend(value)
+        elif isinstance(value, dict):
+            result.extend(value.values())
+        else:
+            result.append(value)
+
+    if isinstance(obj, BaseVertex):
+        result.extend(iteredges(getattr(obj, 'out_edges', None)))
+        result.extend(iteredges(getattr(obj, 'in_edges', None)))
+    elif isinstance(obj, BaseEdge):
+        result.append(getattr(obj, 'out_vertex', None))
+        result.append(getattr(obj, 'in_vertex', None))
+
+    return result
+
+def snapshot(obj:BaseEntity):
+    """
+    :param obj:
+    :return: dict of attribute name -> frozen value of all persistent attributes and edges
+    """
+    result = dict()
+    try:
+        names = obj.persistentattributes()
+    except (AttributeError, NotImplementedError):
+        names = ()
+
+    for name in names:
+        result[name] = freeze(getattr(obj, name, None))
+
+    if isinstance(obj, BaseVertex):
+        result["out_edges"] = freeze(getattr(obj, 'out_edges', None))
+        result["in_edges"] = freeze(getattr(obj, 'in_edges', None))
+
+    return result
@@ -16,7 +16,7 @@ import io
 import logging
 
 from opy.client.o_db_base import BaseEntity, BaseEdge, BaseVertex
-from opy.client.o_db_utils import escapeclassname, retrieveclassname
+from opy.client.o_db_utils import escapeclassname, retrieveclassname, torid
 from opy.common.o_db_constants import OBinaryType, OPlainClass, OSQLOperationType, OSQLIndexType
 from opy.common.o_db_exceptions import SQLCommandException, WrongTypeException, OPyClientException
 
@@ -29,13 +29,182 @@ class QueryType(object):
     def getclass(self):
         raise NotImplementedError("You have to implement the getclass method")
 
+    def compile(self):
+        """
+        Parses the query once into a template which can be bound to different values without parsing it again
+
+        :return: QueryTemplate
+        """
+        return QueryTemplate(self)
+
+class QueryTemplate(object):
+    """
+    Parsed query with placeholders for all values. The SQL text and the layout of the parameter slots are built
+    once, binding only fills the slots.
+
+    Values which have been given while building the query are the defaults of their slots. Positional slots can be
+    overridden by positional arguments of bind, named slots (see Param) by keyword arguments.
+    """
+    def __init__(self, query:QueryType):
+        self.query = query
+        self.fetchplan = getattr(query, 'fetchplan', "")
+
+        params = list()
+        self.text = query.parse(params)
+
+        # list of (name, default), the name is None for positional slots
+        self.slots = list()
+        for value in params:
+            if isinstance(value, Param):
+                self.slots.append((value.name, value.value))
+            else:
+                self.slots.append((None, value))
+
+    def bind(self, *positional, **named):
+        """
+        :param positional: values of the positional slots in order of appearance
+        :param named: values of the named slots
+        :return: BoundQuery
+        """
+        params = list()
+        index = 0
+        for name, default in self.slots:
+            if name is None:
+                if index < len(positional):
+                    params.append(positional[index])
+                else:
+                    params.append(default)
+                index += 1
+            elif name in named:
+                params.append(Param(name, named[name]))
+            elif default is not None:
+                params.append(Param(name, default))
+            else:
+                raise SQLCommandException("there is no value for parameter '{}'".format(name))
+
+        if index < len(positional):
+            raise SQLCommandException("the query has only {} positional parameters".format(index))
+
+        return BoundQuery(self, params)
+
+    def gettype(self):
+        return self.query.__class__
+
+    def getclass(self):
+        return self.query.getclass()
+
+class BoundQuery(QueryType):
+    """
+    Query template together with the values of its parameters
+    """
+    def __init__(self, template:QueryTemplate, params:list):
+        self.template = template
+        self.params = params
+        self.fetchplan = template.fetchplan
+
+    def parse(self, params:list=None):
+        if params is None:
+            raise SQLCommandException("a bound query can only be sent with serialized parameters")
+        params.extend(self.params)
+        return self.template.text
+
+    def gettype(self):
+        return self.template.gettype()
+
+    def getclass(self):
+        return self.template.getclass()
+
 class QueryElement(object):
     def __init__(self):
         self._query = ""
 
+    def render(self, params:list=None):
+        """
+        Renders the element. If a params list is given the values are not written into the query but replaced by
+        placeholders and appended to the list in the order of their appearance.
+
+        :param params: list to collect the values
+        :return: query string
+        """
+        return str(self)
+
     def __str__(self):
         return self._query
 
+class Param(object):
+    """
+    Named parameter. It will be rendered as :name and its value will be sent as serialized parameter
+    """
+    def __init__(self, name:str, value=None):
+        self.name = name
+        self.value = value
+
+    def __str__(self):
+        return ":{}".format(self.name)
+
+def placeholder(value, params:list):
+    """
+    Appends the value to the params and returns the placeholder to use instead
+
+    :param value:
+    :param params:
+    :return: ? for positional and :name for named parameters
+    """
+    params.append(value)
+    if isinstance(value, Param):
+        return str(value)
+    return "?"
+
+def toparams(params:list):
+    """
+    Converts the collected values to the parameter map expected by the server. Positional parameters are keyed by
+    their index, named parameters by their name.
+
+    :param params: values collected by render or parse
+    :return: dict of key -> value
+    """
+    def tovalue(value):
+        # entities are sent as links
+        if isinstance(value, BaseEntity):
+            return value.clusterid, value.clusterposition
+        return value
+
+    result = dict()
+    index = 0
+    for value in params:
+        if isinstance(value, Param):
+            result[value.name] = tovalue(value.value)
+        else:
+            result[str(index)] = tovalue(value)
+            index += 1
+    return result
+
+def renderelements(elements, rule_index:list, params:list=None):
+    """
+    Renders the elements of a statement in the order given by the rule index. The values of each element are
+    collected separately so the parameters keep the order of the placeholders within the query.
+
+    :param elements: query elements
+    :param rule_index: class names in order of appearance
+    :param params: list to collect the values
+    :return: dict of class name -> query string
+    """
+    query_dict = dict()
+    element_params = dict()
+    for element in elements:
+        name = element.__class__.__name__
+        if params is not None and isinstance(element, QueryElement):
+            element_params[name] = list()
+            query_dict[name] = element.render(element_params[name])
+        else:
+            query_dict[name] = str(element)
+
+    if params is not None:
+        for key in rule_index:
+            params.extend(element_params.get(key, ()))
+
+    return query_dict
+
 class GraphType(QueryType):
     def __init__(self):
         self.fetchplan = ""
@@ -142,7 +311,7 @@ class Delete(QueryType):
         return self
 
 
-    def parse(self):
+    def parse(self, params:list=None):
         try:
             # inner method for building the query string based on the given information
             # it's the same action for edges as well as vertices
@@ -172,8 +341,7 @@ class Delete(QueryType):
             def _parseelements():
                 try:
                     query_string = io.StringIO()
-                    for element in self.__elements:
-                        self.__query_dict[element.__class__.__name__] = str(element)
+                    self.__query_dict.update(renderelements(self.__elements, self.__query_rule_index, params))
 
                     for key in self.__query_rule_index:
                         if key in self.__query_dict:
@@ -248,8 +416,10 @@ class Create(QueryType):
         self.type.operationtype = OSQLOperationType.CREATE
         pass
 
-    def parse(self):
-        return self.type.parse()
+    def parse(self, params:list=None):
+        if params is None:
+            return self.type.parse()
+        return self.type.parse(params)
 
 class Drop(QueryType):
     """
@@ -394,10 +564,15 @@ class Edge(GraphType):
         super().__init__()
         self.__object = object
         self.__class_name = self.__object.__class__.__name__
+        # id of vertex -> expression to use instead of its rid, i.e. a variable of a script
+        self.references = dict()
 
     def getobject(self):
         return self.__object
 
+    def __reference(self, vertex:BaseVertex):
+        return self.references.get(id(vertex)) or vertex.getrid()
+
     def parse(self):
         result_query = None
         try:
@@ -409,9 +584,9 @@ class Edge(GraphType):
                     query_string.write("create edge ") # start off with writing the common part of the command
                     query_string.write(escapeclassname(self.__class_name)) # append class name
                     query_string.write(" from ")
-                    query_string.write(self.__object.in_vertex.getrid())
+                    query_string.write(self.__reference(self.__object.in_vertex))
                     query_string.write(" to ")
-                    query_string.write(self.__object.out_vertex.getrid())
+                    query_string.write(self.__reference(self.__object.out_vertex))
                 elif self.operationtype == OSQLOperationType.DELETE:
                     query_string.write("delete edge ") # start off with writing the common part of the command
 
@@ -448,7 +623,7 @@ class Vertex(GraphType):
     def getobject(self):
         return self.__object
 
-    def parse(self):
+    def parse(self, params:list=None):
         result_query = None
         try:
 
@@ -469,9 +644,13 @@ class Vertex(GraphType):
                             attr_name = data_to_store[i]
 
                             query_string.write(attr_name)
-                            query_string.write(" = \"")
-                            query_string.write(str(self.__object.__getattribute__(attr_name)))
-                            query_string.write("\"")
+                            if params is None:
+                                query_string.write(" = \"")
+                                query_string.write(str(self.__object.__getattribute__(attr_name)))
+                                query_string.write("\"")
+                            else:
+                                query_string.write(" = ")
+                                query_string.write(placeholder(self.__object.__getattribute__(attr_name), params))
                             if i < count-1:
                                 query_string.write(" , ")
                 elif self.operationtype == OSQLOperationType.DELETE:
@@ -503,7 +682,7 @@ class Insert(QueryType):
         self.__clazz_name = getattr(persistent_object.__class__,'__name__')
         self.__object = persistent_object
 
-    def parse(self):
+    def parse(self, params:list=None):
         try:
             query_string = io.StringIO()
 
@@ -526,9 +705,12 @@ class Insert(QueryType):
             query_string.write("(")
             if len(persistent_attributes) > 0:
                 for attribute in persistent_attributes:
-                    query_string.write("'")
-                    query_string.write(str(self.__object.__getattribute__(attribute)))
-                    query_string.write("'")
+                    if params is None:
+                        query_string.write("'")
+                        query_string.write(str(self.__object.__getattribute__(attribute)))
+                        query_string.write("'")
+                    else:
+                        query_string.write(placeholder(self.__object.__getattribute__(attribute), params))
                     if persistent_attributes.index(attribute) != len(persistent_attributes)-1:
                         query_string.write(",")
             query_string.write(")")
@@ -590,7 +772,7 @@ class Traverse(QueryType):
         self.__query_dict = dict()
         self.fetchplan = ""
 
-    def parse(self):
+    def parse(self, params:list=None):
         try:
             query_string = io.StringIO()
             query_string.write("traverse ")
@@ -613,7 +795,7 @@ class Traverse(QueryType):
                 query_string.write(self.__target.classname())
             elif isinstance(self.__target, Traverse) or isinstance(self.__target, Select):
                 query_string.write(" ( ")
-                query_string.write(self.__target.parse())
+                query_string.write(self.__target.parse(params))
                 query_string.write(" ) ")
             elif isinstance(self.__target, Cluster):
                 query_string.write(self.__target.parse())
@@ -637,8 +819,7 @@ class Traverse(QueryType):
 
             if self.__elements:
                 query_string.write(" ")
-                for element in self.__elements:
-                    self.__query_dict[element.__class__.__name__] = str(element)
+                self.__query_dict = renderelements(self.__elements, self.__query_rule_index, params)
                 for key in self.__query_rule_index:
                     if key in self.__query_dict:
                         query_string.write(" ")
@@ -700,7 +881,46 @@ class Select(QueryType):
         return_obj.fetchplan = fetchplan
         return return_obj
 
-    def parse(self):
+    def parse(self, params:list=None):
+        return self.__parse(params=params)
+
+    def parsepage(self, lastrid:str=None, count:int=1000, params:list=None):
+        """
+        Parses the select as one page of a keyset pagination. Instead of skipping the records of the previous pages
+        the records are ordered by their rid and only those behind the last rid of the previous page are selected,
+        so the server can start right at the page.
+
+        :param lastrid: rid of the last record of the previous page (string or tuple), None for the first page
+        :param count: page size
+        :param params: list to collect the values, the rid is sent as a link parameter
+        :return: query string
+        """
+        if self.__props:
+            raise SQLCommandException("pagination is only supported for selects of whole records")
+
+        replacements = {"OrderBy": str(OrderBy.asc("@rid")), "Limit": str(Limit(count))}
+        conditions = list()
+
+        if lastrid:
+            rid = torid(lastrid)
+            if rid is None:
+                raise SQLCommandException("'{}' is not a rid".format(lastrid))
+            value = placeholder(rid, params) if params is not None else "#{}:{}".format(*rid)
+            conditions.append("@rid > {}".format(value))
+
+        for element in self.__elements:
+            name = element.__class__.__name__
+            if name in ("OrderBy", "Skip", "Limit"):
+                raise SQLCommandException("a paginated select must not define its own '{}'".format(name))
+            elif isinstance(element, Where):
+                conditions.append("( {} )".format(element.conditions(params)))
+
+        if conditions:
+            replacements["Where"] = " where {} ".format(" and ".join(conditions))
+
+        return self.__parse(replacements, params, skip=("Where",))
+
+    def __parse(self, replacements:dict=None, params:list=None, skip:tuple=()):
         try:
             query_string = io.StringIO()
             query_string.write("select ")
@@ -719,8 +939,11 @@ class Select(QueryType):
                     query_string.write(" ")
                     query_string.write(self.__prefix)
 
-            for element in self.__elements:
-                self.__query_dict[element.__class__.__name__] = str(element)
+            # already rendered elements must not collect their values twice
+            elements = [element for element in self.__elements if element.__class__.__name__ not in skip]
+            self.__query_dict = renderelements(elements, self.__query_rule_index, params)
+            if replacements:
+                self.__query_dict.update(replacements)
             for key in self.__query_rule_index:
                 if key in self.__query_dict:
                     query_string.write(" ")
@@ -802,7 +1025,7 @@ class Update(QueryType):
         self.__elements = elements
         self.__object = object
 
-    def parse(self):
+    def parse(self, params:list=None):
         try:
             self.__query_dict = dict()
             query_string = io.StringIO()
@@ -816,10 +1039,12 @@ class Update(QueryType):
                 # its a class
                 query_string.write(self.__object.__name__)
             query_string.write(" ")
-            query_string.write(str(self.__updateaction))
+            if isinstance(self.__updateaction, QueryElement):
+                query_string.write(self.__updateaction.render(params))
+            else:
+                query_string.write(str(self.__updateaction))
 
-            for element in self.__elements:
-                self.__query_dict[element.__class__.__name__] = str(element)
+            self.__query_dict = renderelements(self.__elements, self.__query_rule_index, params)
 
             for key in self.__query_rule_index:
                 if key in self.__query_dict:
@@ -915,6 +1140,9 @@ class ActionElement(QueryElement):
         self.__fields = fields
 
     def __str__(self):
+        return self.render()
+
+    def render(self, params:list=None):
         try:
             query_string = io.StringIO()
             query_string.write(" ")
@@ -925,7 +1153,11 @@ class ActionElement(QueryElement):
             for field_name in self.__fields:
                 query_string.write(field_name)
                 query_string.write(" = ")
-                if isinstance(self.__fields[field_name], str):
+                if params is not None:
+                    query_string.write(placeholder(self.__fields[field_name], params))
+                elif isinstance(self.__fields[field_name], Param):
+                    query_string.write(str(self.__fields[field_name]))
+                elif isinstance(self.__fields[field_name], str):
                     query_string.write("'")
                     query_string.write(str(self.__fields[field_name]))
                     query_string.write("'")
@@ -976,32 +1208,42 @@ class Condition(WhereType):
     def __init__(self, attribute_name:str):
         super().__init__()
         self.__attribute_name = attribute_name
+        self.__operator = None
+        self.__value = None
 
     def isle(self, value:object):
-        self._query = "{} <= {}".format(self.__attribute_name, self.__valuestring(value))
-        return self
+        return self.__compare("<=", value)
 
     def islt(self, value:object):
-        self._query = "{} < {}".format(self.__attribute_name, self.__valuestring(value))
-        return self
+        return self.__compare("<", value)
 
     def isge(self, value:object):
-        self._query = "{} >= {}".format(self.__attribute_name, self.__valuestring(value))
-        return self
+        return self.__compare(">=", value)
 
     def isgt(self, value:object):
-        self._query = "{} > {}".format(self.__attribute_name, self.__valuestring(value))
-        return self
+        return self.__compare(">", value)
 
     def iseq(self, value:object):
-        self._query = "{} = {}".format(self.__attribute_name, self.__valuestring(value))
-        return self
+        return self.__compare("=", value)
 
     def isin(self, value:object):
         pass
 
+    def render(self, params:list=None):
+        if params is None or self.__operator is None or self.__value is None:
+            return self._query
+        return "{} {} {}".format(self.__attribute_name, self.__operator, placeholder(self.__value, params))
+
+    def __compare(self, operator:str, value:object):
+        self.__operator = operator
+        self.__value = value
+        self._query = "{} {} {}".format(self.__attribute_name, operator, self.__valuestring(value))
+        return self
+
     def __valuestring(self, value):
-        if isinstance(value, str):
+        if isinstance(value, Param):
+            return str(value)
+        elif isinstance(value, str):
             return "'{}'".format(value)
         elif isinstance(value, int):
             return "{}".format(value)
@@ -1012,14 +1254,19 @@ class While(QueryElement):
         self.__elements = objects
 
     def __str__(self):
+        return self.render()
+
+    def render(self, params:list=None):
         try:
             query_string = io.StringIO()
             query_string.write(" while ")
             for element in self.__elements:
                 if isinstance(element, Select):
                     query_string.write("(")
-                    query_string.write(element.parse())
+                    query_string.write(element.parse(params))
                     query_string.write(")")
+                elif isinstance(element, QueryElement):
+                    query_string.write(element.render(params))
                 else:
                     query_string.write(str(element))
             query_string.write(" ")
@@ -1036,18 +1283,22 @@ class Where(QueryElement):
         super().__init__()
         self.__elements = objects
 
-    def __str__(self):
+    def conditions(self, params:list=None):
+        """
+        :param params: list to collect the values
+        :return: the conditions without the where keyword
+        """
         try:
             query_string = io.StringIO()
-            query_string.write(" where ")
             for element in self.__elements:
                 if isinstance(element, Select):
                     query_string.write("(")
-                    query_string.write(element.parse())
+                    query_string.write(element.parse(params))
                     query_string.write(")")
+                elif isinstance(element, QueryElement):
+                    query_string.write(element.render(params))
                 else:
                     query_string.write(str(element))
-            query_string.write(" ")
             result_string = query_string.getvalue()
 
             return result_string
@@ -1056,6 +1307,12 @@ class Where(QueryElement):
         finally:
             query_string.close()
 
+    def __str__(self):
+        return self.render()
+
+    def render(self, params:list=None):
+        return " where {} ".format(self.conditions(params))
+
 
 class GroupBy(QueryElement):
     def __init__(self, grouping_field:str):
@@ -1104,45 +1361,47 @@ class OrderBy(QueryElement):
         finally:
             query_string.close()
 
-class Or(WhereType):
-    def __init__(self, *types:WhereType):
+class Junction(WhereType):
+    """
+    Combines the given conditions with the given operator
+    """
+    def __init__(self, operator:str, *types:WhereType):
         super().__init__()
+        self.__operator = operator
+        self.__types = types
+
+    def __str__(self):
+        return self.render()
+
+    def render(self, params:list=None):
         try:
             query_string = io.StringIO()
             query_string.write(" ( ")
-            for i,type in enumerate(types):
+            for i,type in enumerate(self.__types):
 
-                query_string.write(str(type))
+                if isinstance(type, QueryElement):
+                    query_string.write(type.render(params))
+                else:
+                    query_string.write(str(type))
                 query_string.write(" ")
 
-                if i < len(types)-1:
-                    query_string.write(" or ")
+                if i < len(self.__types)-1:
+                    query_string.write(" {} ".format(self.__operator))
 
             query_string.write(" ) ")
-            self._query = query_string.getvalue()
+            return query_string.getvalue()
         except Exception as err:
             logging.error(err)
         finally:
             query_string.close()
 
-class And(WhereType):
+class Or(Junction):
     def __init__(self, *types:WhereType):
-        super().__init__()
-        try:
-            query_string = io.StringIO()
-            query_string.write(" ( ")
-            for i,type in enumerate(types):
-
-                query_string.write(str(type))
-                query_string.write(" ")
+        super().__init__("or", *types)
 
-                if i < len(types)-1:
-                    query_string.write(" and ")
-
-            query_string.write(" ) ")
-            self._query = query_string.getvalue()
-        except Exception as err:
-            logging.error(err)
+class And(Junction):
+    def __init__(self, *types:WhereType):
+        super().__init__("and", *types)
 
 class Index(GraphType):
     """
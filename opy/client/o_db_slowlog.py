@@ -0,0 +1,117 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import json
+import threading
+
+__author__ = 'daill'
+
+
+OSlowQuery = collections.namedtuple("OSlowQuery", ["timestamp", "duration", "sql", "params", "fetchplan", "size",
+                                                   "decode", "plan"])
+OSlowQuery.__doc__ = """
+Command which took longer than the threshold of the slow query log
+
+timestamp   time.time() when the command has been finished
+duration    seconds from sending the command until the response has been decoded
+sql         command text
+params      list of query parameters or None
+fetchplan
+size        size of the response in bytes
+decode      seconds needed to decode the response
+plan        result of the explain (or profile) command or None
+"""
+
+
+class OSlowQueryLog(object):
+    """
+    Ring buffer of the commands which took longer than the threshold. Set it as OClient.slowlog (or on a single client)
+    to enable it.
+
+    If explain is set to a command prefix like "explain" or "profile", slow selects and traverses are sent once more
+    with this prefix to capture the plan of the server. Every query text is explained only once, the plan is reused
+    for later occurrences.
+    """
+    def __init__(self, threshold:float=1.0, capacity:int=100, explain:str=None):
+        """
+        :param threshold: seconds
+        :param capacity: maximum number of kept entries, the oldest ones are dropped
+        :param explain: command prefix to capture the plan, None disables it
+        """
+        self.threshold = threshold
+        self.capacity = capacity
+        self.explain = explain
+        self.__entries = collections.deque(maxlen=capacity)
+        # query text -> plan
+        self.__plans = dict()
+        self.__lock = threading.Lock()
+
+    def add(self, entry:OSlowQuery):
+        with self.__lock:
+            self.__entries.append(entry)
+
+    def entries(self):
+        """
+        :return: list of OSlowQuery, the oldest first
+        """
+        with self.__lock:
+            return list(self.__entries)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__plans.clear()
+
+    def explainable(self, sql:str):
+        """
+        :param sql:
+        :return: True if the plan of the query should be captured
+        """
+        if not self.explain or not sql:
+            return False
+        return sql.lstrip().split(" ", 1)[0].lower() in ("select", "traverse")
+
+    def plan(self, sql:str):
+        """
+        :param sql:
+        :return: (True, plan) if the query has been explained before, otherwise (False, None)
+        """
+        with self.__lock:
+            if sql in self.__plans:
+                return True, self.__plans[sql]
+            return False, None
+
+    def addplan(self, sql:str, plan):
+        with self.__lock:
+            self.__plans[sql] = plan
+            # the plans are bounded as well, the oldest one is dropped
+            if len(self.__plans) > self.capacity:
+                self.__plans.pop(next(iter(self.__plans)))
+
+    def export(self, path:str):
+        """
+        Writes the entries as JSON lines, one object per entry. Values which can't be represented in JSON (i.e.
+        dates or bytes) are written as strings.
+
+        :param path:
+        :return: number of written entries
+        """
+        entries = self.entries()
+        with open(path, "w") as file:
+            for entry in entries:
+                file.write(json.dumps(entry._asdict(), default=str))
+                file.write("\n")
+        return len(entries)
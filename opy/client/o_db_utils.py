@@ -11,7 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from opy.client.o_db_base import SystemType
+import logging
+
+from opy.client.o_db_base import SystemType, BaseEntity
 
 __author__ = 'daill'
 
@@ -31,4 +33,33 @@ def retrieveclassname(base_class):
             return base_class.getcustomclassname()
 
         return base_class.__name__
-    return None
\ No newline at end of file
+    return None
+
+def parserid(rid:str):
+    """
+    Converts a RID string like #12:3 to a tuple
+
+    :param rid:
+    :return: (cluster-id, cluster-position) or None
+    """
+    try:
+        clusterid, clusterposition = rid.lstrip('#').split(':')
+        return int(clusterid), int(clusterposition)
+    except ValueError:
+        logging.warning("'{}' is not a valid rid".format(rid))
+        return None
+
+def torid(value):
+    """
+    Converts the different representations of a RID (string, tuple or entity) to a tuple
+
+    :param value:
+    :return: (cluster-id, cluster-position) or None
+    """
+    if isinstance(value, tuple):
+        return value
+    elif isinstance(value, str):
+        return parserid(value)
+    elif isinstance(value, BaseEntity):
+        return value.clusterid, value.clusterposition
+    return None
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+
 from opy.common.o_db_constants import OConst
 
 __author__ = 'daill'
@@ -39,7 +41,69 @@ class OPyException(Exception):
                                            exception_dict[OConst.EXCEPTION_MESSAGE.value].decode('utf-8'))
         return error_msg
 
+    def exceptions(self):
+        """
+        :return: list of (exception class, exception message) sent by the server
+        """
+        result = list()
+        for exception_dict in self.__error_data.get(OConst.EXCEPTION, ()):
+            result.append((todecoded(exception_dict.get(OConst.EXCEPTION_CLASS.value)),
+                           todecoded(exception_dict.get(OConst.EXCEPTION_MESSAGE.value))))
+        return result
+
+class ConcurrentModificationException(OPyException):
+    """
+    Raised if a record has been modified by someone else since it has been read, i.e. the sent version is not the
+    latest one. rid and version denote the conflicting record and its stored version if the server named them.
+    """
+    exception_class = "com.orientechnologies.orient.core.exception.OConcurrentModificationException"
+
+    def __init__(self, msg, error_data):
+        super().__init__(msg, error_data)
+        self.rid = None
+        self.version = None
+
+        for exception_class, message in self.exceptions():
+            if exception_class == ConcurrentModificationException.exception_class and message:
+                rid = re.search(r"#(-?\d+):(-?\d+)", message)
+                if rid:
+                    self.rid = (int(rid.group(1)), int(rid.group(2)))
+                version = re.search(r"db=v(\d+)", message)
+                if version:
+                    self.version = int(version.group(1))
+                break
+
+    @classmethod
+    def matches(cls, error:OPyException):
+        """
+        :param error:
+        :return: True if one of the exceptions sent by the server (including the causes) is a concurrent modification
+        """
+        return any(exception_class == cls.exception_class for exception_class, _ in error.exceptions())
+
+class RecordNotFoundException(OPyException):
+    """
+    Raised if the requested record doesn't exist (anymore)
+    """
+    exception_class = "com.orientechnologies.orient.core.exception.ORecordNotFoundException"
+
+    def __init__(self, msg, error_data):
+        super().__init__(msg, error_data)
+
+    @classmethod
+    def matches(cls, error:OPyException):
+        """
+        :param error:
+        :return: True if one of the exceptions sent by the server (including the causes) is a missing record
+        """
+        return any(exception_class == cls.exception_class for exception_class, _ in error.exceptions())
+
 class NotConnectedException(OPyException):
+    def __init__(self, msg, error_data:dict=None):
+        # raised by the client itself, so there are usually no exceptions of the server
+        super().__init__(msg, error_data if error_data is not None else {OConst.EXCEPTION: []})
+
+class ReplayException(Exception):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -57,4 +121,10 @@ class SerializationException(Exception):
 
 class TypeNotFoundException(SerializationException):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
\ No newline at end of file
+        super().__init__(*args, **kwargs)
+
+
+def todecoded(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
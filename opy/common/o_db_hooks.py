@@ -0,0 +1,132 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import time
+
+__author__ = 'daill'
+
+
+class OHook(object):
+    """
+    Pair of callbacks registered for one hook point
+
+        start(point, info)                      called before the work, the return value is passed to end as context
+        end(point, info, duration, context)     called afterwards, duration in seconds
+
+    info is a dict, i.e. with the operation type and the size in bytes. The end callbacks get the same dict updated
+    by the values known afterwards, like the response size or the raised exception (key error).
+    """
+    def __init__(self, point:str, start=None, end=None):
+        self.point = point
+        self.start = start
+        self.end = end
+
+
+class OTrace(object):
+    """
+    Running hook point, returned by OHooks.start
+    """
+    __slots__ = ("point", "info", "started", "contexts")
+
+    def __init__(self, point:str, info:dict, hooks:list):
+        self.point = point
+        self.info = info
+        self.contexts = list()
+        for hook in hooks:
+            context = None
+            if hook.start is not None:
+                try:
+                    context = hook.start(point, info)
+                except Exception as err:
+                    logging.error(err)
+            self.contexts.append((hook, context))
+        self.started = time.perf_counter()
+
+    def end(self, **info):
+        """
+        :param info: values to add to the info dict before the end callbacks are called
+        """
+        duration = time.perf_counter() - self.started
+        self.info.update(info)
+        for hook, context in self.contexts:
+            if hook.end is not None:
+                try:
+                    hook.end(self.point, self.info, duration, context)
+                except Exception as err:
+                    logging.error(err)
+
+
+class OHooks(object):
+    """
+    Registry of the callbacks around the hot paths of the driver. The hook points are
+
+        send          writing a request to the socket
+        receive       waiting for and reading the response
+        decode        decoding the response of an operation
+        deserialize   decoding the content of a record
+        hydrate       creating an object out of a decoded record
+
+    The call sites only check OHooks.active, which is false as long as there isn't any hook registered, before they
+    create a trace. So the hooks don't cost more than a single attribute lookup if they aren't used.
+    """
+    points = ("send", "receive", "decode", "deserialize", "hydrate")
+    active = False
+    __registry = dict()
+
+    @classmethod
+    def register(cls, point:str, start=None, end=None):
+        """
+        :param point: one of OHooks.points
+        :param start: callable(point, info) -> context
+        :param end: callable(point, info, duration, context)
+        :return: the registered OHook, which is needed to unregister it
+        """
+        if point not in cls.points:
+            raise ValueError("unknown hook point '{}'".format(point))
+
+        hook = OHook(point, start, end)
+        # the lists are replaced instead of modified, so running traces aren't affected
+        cls.__registry[point] = cls.__registry.get(point, list()) + [hook]
+        cls.active = True
+        return hook
+
+    @classmethod
+    def unregister(cls, hook:OHook):
+        hooks = [registered for registered in cls.__registry.get(hook.point, ()) if registered is not hook]
+        if hooks:
+            cls.__registry[hook.point] = hooks
+        else:
+            cls.__registry.pop(hook.point, None)
+        cls.active = len(cls.__registry) > 0
+
+    @classmethod
+    def clear(cls):
+        cls.__registry = dict()
+        cls.active = False
+
+    @classmethod
+    def start(cls, point:str, **info):
+        """
+        Calls the start callbacks of the hook point. The caller has to call end of the returned trace afterwards.
+
+        :param point:
+        :param info: operation, size, ...
+        :return: OTrace or None if there isn't any hook registered for the point
+        """
+        hooks = cls.__registry.get(point)
+        if not hooks:
+            return None
+        return OTrace(point, info, hooks)
@@ -0,0 +1,71 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+
+__author__ = 'daill'
+
+
+# parent of all driver loggers, records are passed on to the root logger
+logger = logging.getLogger("opy")
+
+
+class OLogging(object):
+    """
+    Logging facade of the driver. Checking the level is cheap but the arguments of a log call are built anyway, so
+    the hot paths check OLogging.enabled first. It reflects whether DEBUG is enabled for the driver logger and is
+    cached, so call refresh (or configure) after changing the logging configuration. OClient refreshes it on creation.
+
+    In the structured mode the fields given to debug are attached to the log record as attribute 'opy', i.e. for a
+    JSON formatter. Large values like whole buffers are only passed as fields, so they never end up in the messages.
+    """
+    enabled = False
+    structured = False
+
+    @classmethod
+    def configure(cls, level:int=None, structured:bool=None):
+        """
+        :param level: level of the driver logger
+        :param structured: enable the structured debug mode
+        """
+        if level is not None:
+            logger.setLevel(level)
+        if structured is not None:
+            cls.structured = structured
+        cls.refresh()
+
+    @classmethod
+    def refresh(cls):
+        cls.enabled = logger.isEnabledFor(logging.DEBUG)
+
+
+def debug(message:str, *args, **fields):
+    """
+    Logs a debug message which is formatted %-style, only if the record is emitted
+
+    :param message:
+    :param args: arguments of the message
+    :param fields: structured fields, only used in the structured mode
+    """
+    if not OLogging.enabled:
+        return
+
+    if OLogging.structured and fields:
+        logger.debug(message, *args, extra={"opy": fields})
+    else:
+        logger.debug(message, *args)
+
+
+OLogging.refresh()
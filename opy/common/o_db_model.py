@@ -11,6 +11,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import collections
 from io import BytesIO
 import struct
 
@@ -20,6 +21,13 @@ from opy.database.o_db_profile_parser import OProfileParser, OElement, OGroup
 
 __author__ = 'daill'
 
+
+ORid = collections.namedtuple("ORid", ["cluster_id", "cluster_position"])
+ORid.__doc__ = """
+RID of a link, link list, link set or link map entry as it is decoded. It equals the plain (cluster-id,
+cluster-position) tuple but tells links apart from other pairs like UUIDs.
+"""
+
 class ORidBagBinary(object):
     def __init__(self):
         self.size = 0
@@ -233,7 +241,8 @@ class OTXOperationDelete(OTXEntry):
 class OTXOperationUpdate(OTXEntry):
     def __init__(self, record_type:ORecordType, cluster_id:int, cluster_position:int, version:int, content_changed:bool, record_content:bytes):
         super().__init__(1, record_type, cluster_id, cluster_position)
-        self._request_profile = self._request_base_profile + "(version:int)(record-content:bytes)"
+        # content-changed is part of the entry since protocol version 23
+        self._request_profile = self._request_base_profile + "(version:int)(content-changed:boolean)(record-content:bytes)"
         self._data.update({"version": version,
                            "content-changed": content_changed,
                            "record-content": record_content})
@@ -16,9 +16,12 @@ import logging
 import struct
 
 from opy.client.o_db_base import BaseVertex
-from opy.common.o_db_exceptions import WrongTypeException, TypeNotFoundException, OPyException
-from opy.common.o_db_model import ORidBagBinary, OVarInteger
+from opy.common.o_db_exceptions import WrongTypeException, TypeNotFoundException, OPyException, \
+    ConcurrentModificationException, RecordNotFoundException
+from opy.common.o_db_model import ORidBagBinary, OVarInteger, ORid
 from opy.common.o_db_constants import OProfileType, OConst, OBinaryType
+from opy.common.o_db_hooks import OHooks
+from opy.common.o_db_logging import OLogging, debug
 from opy.database.o_db_profile_parser import OCondition
 from opy.database.protocol.o_op import OOperation
 from opy.database.protocol.o_op_error import OOperationError
@@ -36,13 +39,15 @@ class OCodec(object):
         self.toobject = None
 
     def findotype(self, value):
-        if isinstance(value, int):
-            if value >= 0xFFFFFFFF:
+        # bool is a subclass of int, so it has to be checked first
+        if isinstance(value, bool):
+            return OBinaryType.BOOLEAN
+        elif isinstance(value, int):
+            # everything beyond the 32 bit range needs a long
+            if -0x80000000 <= value <= 0x7FFFFFFF:
                 return OBinaryType.INTEGER
             else:
                 return OBinaryType.LONG
-        elif isinstance(value, bool):
-            return OBinaryType.BOOLEAN
         elif isinstance(value, float):
             return OBinaryType.DOUBLE
         elif isinstance(value, str):
@@ -51,8 +56,12 @@ class OCodec(object):
             return OBinaryType.BYTE
         elif isinstance(value, list):
             return OBinaryType.EMBEDDEDLIST
+        elif isinstance(value, set):
+            return OBinaryType.EMBEDDEDSET
         elif isinstance(value, dict):
             return OBinaryType.EMBEDDEDMAP
+        elif isinstance(value, tuple):
+            return OBinaryType.LINK
         elif isinstance(value, BaseVertex):
             return OBinaryType.EMBEDDED
         else:
@@ -61,7 +70,9 @@ class OCodec(object):
     def writevarint(self, value):
         return OVarInteger().encode(value)
 
-    def writevarintstring(self, value:str):
+    def writevarintstring(self, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
         length = len(value)
         result = self.writevarint(length)
         result += self.writebytes(length, value)
@@ -71,6 +82,8 @@ class OCodec(object):
         return self.writebyte(value)
 
     def writestring(self, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
         length = len(value)
         result = self.writeint(len(value))
         result += self.writebytes(length, value)
@@ -84,66 +97,79 @@ class OCodec(object):
         value += local_timezone_offset
         return self.writevarint(value)
 
-    def writeembeddedcollection(self, values):
-        if len(values) > 0:
-            result = self.writevarint(len(values))
+    def writeembeddedcollection(self, values, offset:int=0):
+        """
+        :param values:
+        :param offset: position of the collection within the record, needed by the maps it contains
+        :return:
+        """
+        result = self.writevarint(len(values))
 
-            type = self.findotype(OBinaryType.ANY)
-            result += self.writeotype(type)
+        # the items are of mixed type, so every item is written with its own type
+        result += self.writeotype(OBinaryType.ANY)
 
-            # iterate through the items
-            for value in values:
-                type = self.findotype(value)
-                result += self.writeotype(type)
-                result += self.writevalue(type, value)
+        # iterate through the items
+        for value in values:
+            type = self.findotype(value)
+            result += self.writeotype(type)
+            result += self.writevalue(type, value, offset + len(result))
 
-            return result
+        return result
 
     def writeembedded(self, value):
         if isinstance(value, BaseVertex):
-            logging.debug("serialize vertex")
+            debug("serialize vertex")
             return self.serialization_encoder(value)
         else:
             # edge
-            logging.debug("serialize edge")
+            debug("serialize edge")
 
-    def writeembeddedmap(self, values):
-        if len(values) > 0:
-            result_header = self.writevarint(len(values))
-            result_values = b''
-            header_dict = dict()
-            value_dict = dict()
-            byte_count = len(result_header)
+    def writeembeddedmap(self, values, offset:int=0):
+        """
+        Writes the map with the header entries (key-type:byte)(key:string)(pointer:int)(value-type:byte) followed
+        by the values. The pointers are absolute, so the offset of the map within the record has to be given.
 
-            for key in values:
-                temp_header_bytes = b''
-                temp_value_bytes = b''
+        :param values:
+        :param offset: position of the map within the record
+        :return:
+        """
+        result_header = self.writevarint(len(values))
+        result_values = b''
+        header_dict = dict()
+        type_dict = dict()
+        byte_count = offset + len(result_header)
 
-                # keys are strings
-                temp_header_bytes += self.writeotype(OBinaryType.STRING)
-                temp_header_bytes += self.writevarintstring(key)
+        for key in values:
+            temp_header_bytes = b''
 
-                header_dict[key] = temp_header_bytes
-                byte_count += len(temp_header_bytes) + 4
+            # keys are strings
+            temp_header_bytes += self.writeotype(OBinaryType.STRING)
+            temp_header_bytes += self.writevarintstring(key)
 
-                value = values[key]
-                type = self.findotype(value)
-                temp_value_bytes += self.writeotype(type)
-                temp_value_bytes += self.writevalue(type, value)
-                value_dict[key] = temp_value_bytes
+            header_dict[key] = temp_header_bytes
+            byte_count += len(temp_header_bytes) + 5
 
+            type_dict[key] = self.findotype(values[key]) if values[key] is not None else OBinaryType.ANY
 
-            for key in values:
-                # join the two dict to write the correct position
-                result_header += header_dict[key]
-                result_header += self.writeint(byte_count)
+        for key in values:
+            # join the dicts to write the correct position
+            result_header += header_dict[key]
 
-                value_byte = value_dict[key]
-                result_values += value_byte
-                byte_count += len(value_byte)
+            if values[key] is None:
+                # null values have no data, they are marked by a zero pointer
+                result_header += self.writeint(0)
+                result_header += self.writeotype(type_dict[key])
+                continue
 
-            return result_header + result_values
+            result_header += self.writeint(byte_count)
+            result_header += self.writeotype(type_dict[key])
 
+            # the pointers of nested maps are absolute as well
+            value_byte = self.writevalue(type_dict[key], values[key], byte_count)
+            result_values += value_byte
+            byte_count += len(value_byte)
+
+        return result_header + result_values
 
     def writelinkcollection(self, values):
         if len(values) > 0:
@@ -153,6 +179,11 @@ class OCodec(object):
                 if isinstance(value, BaseVertex):
                     # requires that the value has been already written to database otherwise theres no rid
                     result += self.writelink((value.clusterid, value.clusterposition))
+                elif isinstance(value, tuple):
+                    result += self.writelink(value)
+
+            return result
+        return self.writevarint(0)
 
 
     def writelinkmap(self, values):
@@ -176,9 +207,27 @@ class OCodec(object):
             result = self.writevarint(value[0])
             # write cluster position
             result += self.writevarint(value[1])
+            return result
         else:
             logging.error("could not serialize link in fact of a wrong value type. Should be tuple is '{}'".format(type(value)))
 
+    def writeridbag(self, values):
+        """
+        Writes an embedded ridbag
+
+        :param values: list of (cluster-id, cluster-position) tuples
+        :return:
+        """
+        # config: embedded without uuid
+        result = self.writebyte(1)
+        result += self.writeint(len(values))
+
+        for cluster_id, cluster_position in values:
+            result += self.wrieshort(cluster_id)
+            result += self.writelong(cluster_position)
+
+        return result
+
     def writenulllink(self):
         return self.writelink(-2, -1)
 
@@ -204,11 +253,13 @@ class OCodec(object):
         return struct.pack(">f", value)
 
     def writebytes(self, length, value):
-        return struct.pack(">{}s".format(length), value.encode('utf-8'))
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        return struct.pack(">{}s".format(length), value)
 
     def packdata(self, type, value, name=" "):
-        if not 'pass' in name:
-            logging.debug("packing '{}' with type '{}' and value '{}'".format(name, type, value))
+        if OLogging.enabled and not 'pass' in name:
+            debug("packing '%s' with type '%s' and value '%s'", name, type, value, field=name, type=str(type))
 
         if type == OProfileType.BOOLEAN:
             return self.writeboolean(value)
@@ -229,7 +280,7 @@ class OCodec(object):
         elif type == OProfileType.STRING or type == OProfileType.BYTES:
             if value == '-1' or value == -1 and type == OProfileType.STRING:
                 return self.writeint(-1)
-            elif isinstance(value, str):
+            elif isinstance(value, str) or isinstance(value, bytes):
                 return self.writestring(value)
             else:
                 raise WrongTypeException("wrong value type for '{}' type".format(type))
@@ -238,11 +289,11 @@ class OCodec(object):
             pass
         elif type == OProfileType.STRINGS:
             if isinstance(value, list):
-                bytes = ''
-                bytes += self.writeint(len(value))
+                result = b''
+                result += self.writeint(len(value))
                 for string in value:
-                    bytes += self.writestring(string)
-                return bytes
+                    result += self.writestring(string)
+                return result
             else:
                 raise WrongTypeException("wrong value type for '{}' type".format(type))
         elif type == OProfileType.DYNAMIC:
@@ -250,7 +301,8 @@ class OCodec(object):
             pass
 
     def unpackdata(self, type, data, condition: OCondition=None, name=""):
-        logging.debug("unpacking '{}' with type '{}'".format(name, type))
+        if OLogging.enabled:
+            debug("unpacking '%s' with type '%s'", name, type, field=name, type=str(type))
 
         if type == OProfileType.BOOLEAN:
             result, rest = self.readboolean(data)
@@ -306,7 +358,19 @@ class OCodec(object):
         return operation.encode(self.packdata, arguments)
 
     def decode(self, operation: OOperation, data: bytes):
+        trace = OHooks.start("decode", operation=operation.getoperationtype(), size=len(data)) if OHooks.active else None
+        if trace is None:
+            return self.__decode(operation, data)
+
+        try:
+            data_dict = self.__decode(operation, data)
+        except Exception as err:
+            trace.end(error=err)
+            raise
+        trace.end()
+        return data_dict
 
+    def __decode(self, operation: OOperation, data: bytes):
         data_dict, status = operation.decode(self.unpackdata, data)
 
         # handle error
@@ -314,8 +378,17 @@ class OCodec(object):
             error_operation = OOperationError()
             error_operation.token_based = operation.token_based
             data_dict, status = error_operation.decode(self.unpackdata, data)
-            logging.debug("error data: %s", data_dict)
-            raise OPyException("exception occured", data_dict)
+            debug("error data: %s", data_dict)
+            error = OPyException("exception occured", data_dict)
+            # pipelined responses go on behind the error
+            operation.rest = error_operation.rest
+
+            # version conflicts can be solved by the caller, so they have to be distinguishable
+            if ConcurrentModificationException.matches(error):
+                raise ConcurrentModificationException("concurrent modification", data_dict)
+            if RecordNotFoundException.matches(error):
+                raise RecordNotFoundException("record not found", data_dict)
+            raise error
 
         return data_dict
 
@@ -374,7 +447,7 @@ class OCodec(object):
     def readdouble(self, data):
         self.position+=8
         self.bytecount+=8
-        return struct.unpack('>d', data[:8])[0], data[48]
+        return struct.unpack('>d', data[:8])[0], data[8:]
 
     def readboolean(self, data):
         return self.readbyte(data)
@@ -428,40 +501,43 @@ class OCodec(object):
     def readembeddedmap(self, data):
         size, rest = self.readvarint(data)
         result = dict()
-        delta = 0
+
+        # the values are placed behind the header, so remember where the last one ends
+        end = self.position
 
         for i in range(size):
             key_type, rest = self.readbyte(rest)
             key, rest = self.readvalue(key_type, rest)
             pos, rest = self.readint(rest)
+            value_type, rest = self.readbyte(rest)
 
-            # due to the implementation its necessary to calculate the actual position in
-            # byte array to extract the value of each key. Afterwards we have to cumulate the
-            # read bytes to receive the complete amount of read bytes
+            if pos == 0:
+                # null value
+                result[key] = None
+                continue
 
-            estimated_position = pos-self.position
-            last_position = self.position
+            # the pointer is absolute, so we have to calculate the position relative to the rest. Nested maps
+            # share the base, so the position has to point to the value while reading it.
+            header_position = self.position
+            self.position = pos
+            value, temp_rest = self.readvalue(value_type, rest[pos-header_position:])
+            end = max(end, self.position)
 
-            value_type, temp_rest = self.readbyte(rest[estimated_position:])
-            estimated_position += 1
-            value, temp_rest = self.readvalue(value_type, rest[estimated_position:])
-            delta += self.position-estimated_position
-            
-            self.position = last_position
+            self.position = header_position
 
             result[key] = value
 
         # set the count to real read position
-        self.position += delta
+        rest = rest[max(end-self.position, 0):]
+        self.position = max(end, self.position)
 
-
-        return result, rest[self.position:]
+        return result, rest
 
     def readlink(self, data):
         cluster_id, rest = self.readvarint(data)
         position, rest = self.readvarint(rest)
 
-        return (cluster_id, position), rest
+        return ORid(cluster_id, position), rest
 
     def readlinkset(self, data):
         length, rest = self.readvarint(data)
@@ -499,7 +575,7 @@ class OCodec(object):
         return (most_sig_bits, least_sig_bits), rest
 
     def readembeddedridbag(self, data):
-        logging.debug("read embeddedridbag")
+        debug("read embeddedridbag")
         value, rest = self.readint(data)
         content_size = value * 10 + 4
         size, rest = self.readint(data)
@@ -524,8 +600,8 @@ class OCodec(object):
 
             entries.append((id, position))
 
-            # should we read all the records here?
-            logging.debug("automatic record loading is not yet implemented")
+        # should we read all the records here?
+        debug("automatic record loading is not yet implemented")
 
         ridbag.entries = entries
         self.position = actual_position
@@ -540,60 +616,75 @@ class OCodec(object):
         :param data:
         :return:
         """
-        logging.debug("read ridbag")
+        debug("read ridbag")
 
         type, rest = self.readbyte(data)
 
         if (type & 2) == 2:
-            logging.debug("read uuid")
+            debug("read uuid")
             # reads the uuid tuple
             uuid, rest = self.readuuid(rest)
 
         if (type & 1) == 1:
-            logging.debug("read embedded")
+            debug("read embedded")
             # embedded
             ridbag, rest = self.readembeddedridbag(rest)
         else:
-            logging.debug("read tree")
+            debug("read tree")
             # tree
             pass
 
         return ridbag, rest
 
-    def writevalue(self, type, value):
-        otype = OBinaryType(type)
+    # OBinaryType -> name of the method which writes values of this type
+    writers = {
+        OBinaryType.INTEGER: "writevarint",
+        OBinaryType.LONG: "writevarint",
+        OBinaryType.SHORT: "writevarint",
+        OBinaryType.STRING: "writevarintstring",
+        OBinaryType.DOUBLE: "writedouble",
+        OBinaryType.FLOAT: "writefloat",
+        OBinaryType.BYTE: "writebyte",
+        OBinaryType.BOOLEAN: "writeboolean",
+        # as timestamp with format long
+        OBinaryType.DATETIME: "writevarint",
+        OBinaryType.DATE: "writedate",
+        OBinaryType.EMBEDDEDLIST: "writeembeddedcollection",
+        OBinaryType.EMBEDDEDSET: "writeembeddedcollection",
+        OBinaryType.EMBEDDED: "writeembedded",
+        OBinaryType.LINKSET: "writelinkcollection",
+        OBinaryType.LINKLIST: "writelinkcollection",
+        OBinaryType.LINKMAP: "writelinkmap",
+        OBinaryType.EMBEDDEDMAP: "writeembeddedmap",
+        OBinaryType.LINK: "writelink",
+        OBinaryType.LINKBAG: "writeridbag"
+    }
+
+    # types whose values might contain embedded maps, their writers take the offset of the value
+    containers = (OBinaryType.EMBEDDEDMAP, OBinaryType.EMBEDDEDLIST, OBinaryType.EMBEDDEDSET)
+
+    def writer(self, type):
+        """
+        :param type: OBinaryType
+        :return: the method writing values of the given type or None if the type isn't supported
+        """
+        name = OCodec.writers.get(OBinaryType(type))
+        if name:
+            return getattr(self, name)
+        return None
 
-        if otype == OBinaryType.INTEGER or otype == OBinaryType.LONG or otype == OBinaryType.SHORT:
-            return self.writevarint(value)
-        elif otype == OBinaryType.STRING:
-            return self.writevarintstring(value)
-        elif otype == OBinaryType.DOUBLE:
-            return self.writedouble(value)
-        elif otype == OBinaryType.FLOAT:
-            return self.writefloat(value)
-        elif otype == OBinaryType.BYTE:
-            return self.writebyte(value)
-        elif otype == OBinaryType.BOOLEAN:
-            return self.writeboolean(value)
-        elif otype == OBinaryType.DATETIME:
-            # as timestamp with format long
-            return self.writevarint(value)
-        elif otype == OBinaryType.DATE:
-            return self.writedate(value)
-        elif otype == OBinaryType.EMBEDDEDLIST or otype == OBinaryType.EMBEDDEDSET:
-            return self.writeembeddedcollection(value)
-        elif otype == OBinaryType.EMBEDDED:
-            return self.writeembedded(value)
-        elif otype == OBinaryType.LINKSET or otype == OBinaryType.LINKLIST:
-            return self.writelinkcollection(value)
-        elif otype == OBinaryType.LINKMAP:
-            return self.writelinkmap(value)
-        elif otype == OBinaryType.EMBEDDEDMAP:
-            return self.writeembeddedmap(value)
-        elif otype == OBinaryType.LINK:
-            return self.writelink(value)
-        elif otype == OBinaryType.LINKBAG:
-            pass
+    def writevalue(self, type, value, offset:int=0):
+        """
+        :param type: OBinaryType
+        :param value:
+        :param offset: position of the value within the record, the pointers of embedded maps are absolute
+        :return:
+        """
+        writer = self.writer(type)
+        if writer:
+            if OBinaryType(type) in OCodec.containers:
+                return writer(value, offset)
+            return writer(value)
 
 
 
@@ -19,8 +19,11 @@ import sys
 import time
 import select
 
-from opy.common.o_db_exceptions import NotConnectedException
+from opy.common.o_db_exceptions import NotConnectedException, OPyException
 from opy.database.o_db_codec import OCodec
+from opy.database.o_db_metrics import OMetrics
+from opy.common.o_db_hooks import OHooks
+from opy.common.o_db_logging import debug
 from opy.common.o_db_constants import OOperationType
 from opy.database.protocol.o_op import OOperation
 from opy.database.protocol.o_op_connect import OOperationConnect
@@ -31,9 +34,26 @@ from opy.database.protocol.o_op_init import OOperationInit
 __author__ = 'daill'
 
 class OConnection(object):
-    def __init__(self, host:str='0.0.0.0', port:int=2424):
+    # seconds to wait for the first bytes of a response and the pause before another read if nothing has arrived
+    initialtimeout = 1
+    retrydelay = 0.1
+
+    def __init__(self, host:str='0.0.0.0', port:int=2424, recorder=None):
+        """
+        :param host:
+        :param port:
+        :param recorder: ORecorder which writes every request and response of this connection to a file
+        """
         self.__host = host
         self.__port = port
+        self.recorder = recorder
+        # latencies and sizes of the operations of this connection
+        self.metrics = OMetrics(OMetrics.aggregated)
+        # (size in bytes, decode seconds) of the last response
+        self.lastresponse = (None, None)
+
+        # set as soon as the server has closed the connection
+        self.peerclosed = False
 
         self.protocol_version = None
         self.__sock = None
@@ -43,8 +63,7 @@ class OConnection(object):
 
         self.__buffer_size = 4096
 
-        # set timeout to 1 second
-        self.__initial_timeout = 1
+        self.__initial_timeout = OConnection.initialtimeout
         self.__short_timeout = 0.01
         self.__timeout_inc = 0.01
         self.__timeout_dec = 0.01
@@ -74,11 +93,12 @@ class OConnection(object):
                 if self.__sock in read:
                     buffer = self.__sock.recv(self.__buffer_size)
 
-                    logging.debug("read {} bytes on retry count {} with timeout {}s".format(len(buffer), retry_count, timeout))
+                    debug("read %s bytes on retry count %s with timeout %ss", len(buffer), retry_count, timeout)
 
                     if buffer:
                         data += buffer
                     else:
+                        self.peerclosed = True
                         break
 
                     timeout = self.__short_timeout
@@ -97,15 +117,15 @@ class OConnection(object):
                     retry_count = 3
                 else:
                     # if there were no bytes to read, try a bit longer timeout
-                    time.sleep(0.1)
+                    time.sleep(OConnection.retrydelay)
                     retry_count -= 1
 
                     if retry_count == 0:
                         break
             except socket.error as e:
-                logging.error("socket error: " + e)
+                logging.error("socket error: %s", e)
         end = time.time()
-        logging.debug("total runtime {}s".format(end-start))
+        debug("total runtime %ss", end-start)
         return data
 
     def exec(self, operation: OOperation, data: dict):
@@ -113,9 +133,9 @@ class OConnection(object):
         # send request
         # receive response
 
-        logging.debug("execute {}".format(operation.__class__))
+        debug("execute %s", operation.__class__)
 
-        if self.__sock is None:
+        if not self.isopen():
             logging.error("execution of {} failed".format(operation.__class__))
             raise NotConnectedException("the socket connection it not open")
 
@@ -127,30 +147,186 @@ class OConnection(object):
         request_bytes = self.getrequesthead(operation.getoperationtype())
         request_bytes += self.parserequest(operation, data)
 
-        self.__sock.sendall(request_bytes)
+        operation_type = operation.getoperationtype()
+        sent = time.time()
+        start = time.perf_counter()
+        self.sendrequest(operation_type, request_bytes)
+        written = time.perf_counter()
 
         if not isinstance(operation, OOperationDBClose):
-            data = self.receive()
-            logging.debug("read {}".format(data))
-            parsed_data = self.parseresponse(operation, data)
+            data = self.receiveresponse(operation_type)
+            received = time.perf_counter()
+            self.record(operation_type, sent, request_bytes, data)
+            debug("read %s bytes", len(data), data=data)
+            self.lastresponse = (len(data), None)
+            try:
+                parsed_data = self.parseresponse(operation, data)
+            except Exception:
+                self.measure(operation_type, start, written, received, len(data), error=True)
+                raise
+            self.lastresponse = (len(data), time.perf_counter() - received)
+            self.measure(operation_type, start, written, received, len(data))
+
             if isinstance(operation, OOperationConnect) or isinstance(operation, OOperationDBOpen):
                 self.session_id = parsed_data["session-id"]
-                logging.debug("session id {} saved".format(self.session_id))
+                debug("session id %s saved", self.session_id)
 
                 if "token" in parsed_data:
                     self.token = parsed_data["token"]
-                    logging.debug("token {} saved".format(self.token))
+                    debug("token %s saved", self.token)
             return parsed_data
 
+        self.record(operation_type, sent, request_bytes, b'')
+        self.measure(operation_type, start, written)
         return None
 
+    def execmany(self, requests:list):
+        """
+        Pipelines the given operations. All requests are sent at once and the responses are decoded in the same order
+        afterwards which saves a round trip per operation. Only operations which keep track of the bytes left after
+        decoding (see OOperation.rest) can be used. The responses don't have to arrive within one read, more bytes are
+        read as long as the decoding of a response runs short.
+
+        :param requests: list of (operation, data) tuples
+        :return: list of parsed responses
+        :raises: the error of the first failed operation after all responses have been read
+        """
+        debug("execute %s pipelined operations", len(requests))
+
+        if not self.isopen():
+            logging.error("execution of pipelined operations failed")
+            raise NotConnectedException("the socket connection it not open")
+
+        request_bytes = b''
+        for operation, data in requests:
+            request_bytes += self.getrequesthead(operation.getoperationtype())
+            request_bytes += self.parserequest(operation, data)
+
+        # pipelined requests are accounted to the first operation type
+        operation_type = requests[0][0].getoperationtype()
+        sent = time.time()
+        start = time.perf_counter()
+        self.sendrequest(operation_type, request_bytes)
+        written = time.perf_counter()
+
+        data = self.receiveresponse(operation_type)
+        received = time.perf_counter()
+        response = data
+
+        results = list()
+        # the server answers every request even if one of them failed, so the responses behind an error have to be
+        # read as well, otherwise they would be taken as responses of the next requests
+        failure = None
+        try:
+            for operation, _ in requests:
+                while True:
+                    try:
+                        result = self.parseresponse(operation, data)
+                        error = None
+                    except struct.error as err:
+                        result = None
+                        error = err
+                    except OPyException as err:
+                        # an error response is complete once it has been decoded
+                        result = None
+                        if failure is None:
+                            failure = err
+                        break
+
+                    if error is None and operation.complete:
+                        break
+
+                    # the response has been cut off, the rest is still on its way
+                    more = self.receive()
+                    if not more:
+                        if error is not None:
+                            raise error
+                        break
+                    debug("read %s more bytes of pipelined response %s", len(more), len(results))
+                    data += more
+                    response += more
+
+                results.append(result)
+                data = operation.rest
+        except Exception:
+            self.record(operation_type, sent, request_bytes, response)
+            self.measure(operation_type, start, written, received, len(response), len(requests), True)
+            raise
+        self.record(operation_type, sent, request_bytes, response)
+        self.measure(operation_type, start, written, received, len(response), len(requests), failure is not None)
+
+        if failure is not None:
+            raise failure
+
+        return results
+
     def sendbytes(self, bytes):
         """
         Use this method i.e. to cancel a running transaction
         :param bytes: data to send
         """
-        if self.__sock is not None:
-            self.__sock.sendall(bytes)
+        if self.isopen():
+            self.write(bytes)
+
+    def write(self, bytes):
+        self.__sock.sendall(bytes)
+
+    def sendrequest(self, operation_type:int, request_bytes:bytes):
+        """
+        Writes the request and calls the send hooks
+        """
+        trace = OHooks.start("send", operation=operation_type, size=len(request_bytes)) if OHooks.active else None
+        self.write(request_bytes)
+        if trace is not None:
+            trace.end()
+
+    def receiveresponse(self, operation_type:int):
+        """
+        Reads the response and calls the receive hooks
+        """
+        trace = OHooks.start("receive", operation=operation_type) if OHooks.active else None
+        data = self.receive()
+        if trace is not None:
+            trace.end(size=len(data))
+        return data
+
+    def measure(self, operation_type:int, start:float, written:float, received:float=None, size:int=None,
+                count:int=1, error:bool=False):
+        """
+        Adds the timings of a request to the metrics. The decoding is assumed to be finished now.
+
+        :param operation_type:
+        :param start: perf_counter before sending the request
+        :param written: perf_counter after sending the request
+        :param received: perf_counter after receiving the response, None if there is no response
+        :param size: size of the response
+        :param count: number of pipelined requests
+        :param error: the response couldn't be decoded or has been an error
+        """
+        if not OMetrics.enabled:
+            return
+
+        metrics = self.metrics
+        metrics.increment(operation_type, "requests", count)
+        metrics.observe(operation_type, "send", written - start)
+        if received is not None:
+            metrics.observe(operation_type, "wait", received - written)
+            metrics.observe(operation_type, "decode", time.perf_counter() - received)
+            metrics.observe(operation_type, "response", size)
+        if error:
+            metrics.increment(operation_type, "errors")
+
+    def record(self, operation_type:int, sent:float, request:bytes, response:bytes):
+        """
+        Passes a request and its response to the recorder if there is one
+
+        :param operation_type:
+        :param sent: timestamp of sending the request
+        :param request:
+        :param response:
+        """
+        if self.recorder is not None:
+            self.recorder.record(operation_type, sent, time.time(), request, response)
 
 
     def getrequesthead(self, operation_type):
@@ -171,13 +347,13 @@ class OConnection(object):
         return head
 
     def parserequest(self, operation: OOperation, data: dict):
-        logging.debug("parse request for {} operation".format(operation.__class__))
+        debug("parse request for %s operation", operation.__class__)
         parser = OCodec()
 
         return parser.encode(operation, data)
 
     def parseresponse(self, operation: OOperation, data):
-        logging.debug("parse response for {} operation".format(operation.__class__))
+        debug("parse response for %s operation", operation.__class__)
 
         parser = OCodec()
 
@@ -199,20 +375,23 @@ class OConnection(object):
     def open(self):
         try:
             if self.__sock is None:
-                logging.debug("opening connection")
+                debug("opening connection")
                 self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.__sock.connect((self.__host, self.__port))
                 self.__sock.setblocking(0)
 
                 operation_init = OOperationInit()
+                sent = time.time()
                 data = self.receive()
+                # the handshake is recorded as operation 0
+                self.record(0, sent, b'', data)
                 result = self.parseresponse(operation_init, data)
 
                 self.protocol_version = result['protocol_number']
                 logging.info("working with protocol version {}".format(self.protocol_version))
             else:
-                logging.debug("connection already opened")
-            logging.debug("connection opened")
+                debug("connection already opened")
+            debug("connection opened")
         except socket.error as msg:
             logging.error('Error code: ' + str(msg[0]) + ' , Error message : ' + msg[1])
             self.__sock.close()
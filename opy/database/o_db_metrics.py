@@ -0,0 +1,186 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import bisect
+import threading
+
+from opy.common.o_db_constants import OOperationType
+
+__author__ = 'daill'
+
+
+class OHistogram(object):
+    """
+    Cumulative histogram with fixed upper bounds like the Prometheus histograms
+    """
+    # seconds
+    latency_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    # bytes
+    size_buckets = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+    def __init__(self, buckets:tuple):
+        self.buckets = buckets
+        # the last count is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, number of values less or equal to the bound), the last bound is inf
+        """
+        result = list()
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def todict(self):
+        return {"count": self.count, "sum": self.sum, "buckets": self.cumulative()}
+
+
+class OMetrics(object):
+    """
+    Counters and histograms per operation type. Every connection has its own metrics which pass all values to the
+    aggregated metrics (OMetrics.aggregated) as well.
+
+    The histograms are
+        send       time to write the request to the socket
+        wait       time until the response has been read, i.e. network and server time
+        decode     time to decode the response
+        hydrate    time to create the objects out of the decoded records
+        response   size of the response in bytes
+
+    Set OMetrics.enabled to False to switch off the measurement.
+    """
+    enabled = True
+    aggregated = None
+
+    histograms = {"send": ("seconds", OHistogram.latency_buckets, "time to send the request"),
+                  "wait": ("seconds", OHistogram.latency_buckets, "time waiting for the response"),
+                  "decode": ("seconds", OHistogram.latency_buckets, "time to decode the response"),
+                  "hydrate": ("seconds", OHistogram.latency_buckets, "time to create objects out of the records"),
+                  "response": ("bytes", OHistogram.size_buckets, "size of the response")}
+
+    def __init__(self, parent=None):
+        """
+        :param parent: metrics which get all observed values as well
+        """
+        self.__parent = parent
+        self.__lock = threading.Lock()
+        # operation name -> metric name -> OHistogram or int
+        self.__operations = dict()
+
+    def observe(self, operation_type:int, metric:str, value):
+        """
+        :param operation_type: OOperationType value
+        :param metric: name of a histogram (see histograms)
+        :param value:
+        """
+        with self.__lock:
+            self.__histogram(operationname(operation_type), metric).observe(value)
+        if self.__parent is not None:
+            self.__parent.observe(operation_type, metric, value)
+
+    def increment(self, operation_type:int, counter:str, value:int=1):
+        """
+        :param operation_type: OOperationType value
+        :param counter: requests or errors
+        :param value:
+        """
+        with self.__lock:
+            metrics = self.__operations.setdefault(operationname(operation_type), dict())
+            metrics[counter] = metrics.get(counter, 0) + value
+        if self.__parent is not None:
+            self.__parent.increment(operation_type, counter, value)
+
+    def snapshot(self):
+        """
+        :return: dict of operation name -> metric name -> count (counters) or dict with count, sum and cumulative
+                 buckets (histograms)
+        """
+        with self.__lock:
+            return {operation: {name: (metric.todict() if isinstance(metric, OHistogram) else metric)
+                                for name, metric in metrics.items()}
+                    for operation, metrics in self.__operations.items()}
+
+    def reset(self):
+        with self.__lock:
+            self.__operations.clear()
+
+    def prometheus(self, labels:dict=None):
+        """
+        :param labels: additional labels of all samples, i.e. {"connection": "1"}
+        :return: the metrics in the Prometheus text format
+        """
+        snapshot = self.snapshot()
+        extra = "".join(',{}="{}"'.format(key, value) for key, value in sorted((labels or dict()).items()))
+        lines = list()
+
+        for counter in ("requests", "errors"):
+            name = "opy_{}_total".format(counter)
+            lines.append("# HELP {} number of {}".format(name, counter))
+            lines.append("# TYPE {} counter".format(name))
+            for operation in sorted(snapshot):
+                lines.append('{}{{operation="{}"{}}} {}'.format(name, operation, extra, snapshot[operation].get(counter, 0)))
+
+        for metric in sorted(OMetrics.histograms):
+            unit, _, description = OMetrics.histograms[metric]
+            name = "opy_{}_{}".format(metric, unit)
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} histogram".format(name))
+            for operation in sorted(snapshot):
+                histogram = snapshot[operation].get(metric)
+                if histogram is None:
+                    continue
+                label = 'operation="{}"{}'.format(operation, extra)
+                for bound, count in histogram["buckets"]:
+                    bound = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, label, bound, count))
+                lines.append("{}_sum{{{}}} {}".format(name, label, histogram["sum"]))
+                lines.append("{}_count{{{}}} {}".format(name, label, histogram["count"]))
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path:str, labels:dict=None):
+        """
+        Writes the metrics in the Prometheus text format to a file, i.e. for the textfile collector of the node exporter
+        """
+        with open(path, "w") as file:
+            file.write(self.prometheus(labels))
+
+    def __histogram(self, operation:str, metric:str):
+        metrics = self.__operations.setdefault(operation, dict())
+        histogram = metrics.get(metric)
+        if histogram is None:
+            histogram = OHistogram(OMetrics.histograms[metric][1])
+            metrics[metric] = histogram
+        return histogram
+
+
+def operationname(operation_type:int):
+    try:
+        return OOperationType(operation_type).name
+    except ValueError:
+        return str(operation_type)
+
+
+OMetrics.aggregated = OMetrics()
@@ -17,15 +17,18 @@ import logging
 from opy.database.o_db_connection import OConnection
 from opy.common.o_db_constants import OStorageTypes, ODBType, OModeInt, ORecordType, OModeChar, OCommandClass
 from opy.database.o_db_driverconfig import ODriverConfig
+from opy.database.protocol.o_op_cluster import OOperationDataClusterDataRange
 from opy.database.protocol.o_op_connect import OOperationConnect
 from opy.database.protocol.o_op_db import OOperationDBClose, OOperationDBCreate, OOperationDBExist, OOperationDBList, \
     OOperationDBOpen, OOperationDBReload, \
     OOperationDBSize, OOperationDBCountrecords
 from opy.database.protocol.o_op_record import OOperationRecordCreate, OOperationRecordLoad, OOperationRecordUpdate, \
-    OOperationRecordDelete
+    OOperationRecordDelete, OOperationRecordMetadata
 from opy.database.protocol.o_op_request import OOperationRequestConfigGet, OOperationRequestConfigList, \
     OOperationRequestConfigSet, OOperationRequestCommand, OOperationRequestTXCommit
+from opy.common.o_db_exceptions import ConcurrentModificationException, RecordNotFoundException
 from opy.common.o_db_model import OSQLPayload
+from opy.common.o_db_logging import debug
 
 
 __author__ = 'daill'
@@ -49,7 +52,7 @@ class ODB:
 
             operation = OOperationDBReload()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             response = connection.exec(operation, {})
 
@@ -138,7 +141,7 @@ class ODB:
 
             operation = OOperationDBOpen()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
@@ -157,7 +160,7 @@ class ODB:
 
             operation = OOperationDBClose()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             connection.exec(operation, {})
 
@@ -183,7 +186,7 @@ class ODB:
             data = {"key": key,
                     "value": value}
 
-            logging.debug("called {} with data {}".format(operation, data))
+            debug("called %s with data %s", operation, data)
 
             response = connection.exec(operation, data)
 
@@ -201,7 +204,7 @@ class ODB:
         try:
             operation = OOperationDBList()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             response = connection.exec(operation, {})
 
@@ -220,7 +223,7 @@ class ODB:
         try:
             operation = OOperationRequestConfigList()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             response = connection.exec(operation, {})
 
@@ -242,7 +245,7 @@ class ODB:
             # data dict
             data = {"key": key}
 
-            logging.debug("called {} with data {}".format(operation, data))
+            debug("called %s with data %s", operation, data)
 
             response = connection.exec(operation, data)
 
@@ -260,7 +263,7 @@ class ODB:
         try:
             operation = OOperationDBCountrecords()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             response = connection.exec(operation, {})
 
@@ -278,7 +281,7 @@ class ODB:
         try:
             operation = OOperationDBSize()
 
-            logging.debug("called {}".format(operation))
+            debug("called %s", operation)
 
             response = connection.exec(operation, {})
 
@@ -288,6 +291,28 @@ class ODB:
 
 
 
+    def dataclusterdatarange(self, connection:OConnection, cluster_id:int):
+        """
+        Gets the range of the cluster positions used by the given cluster
+
+        :param connection:
+        :param cluster_id:
+        :return: response containing begin and end
+        """
+        try:
+            # prepare data dict
+            request_data = {"cluster-id": cluster_id}
+
+            operation = OOperationDataClusterDataRange()
+
+            debug("called %s with data %s", operation, request_data)
+
+            response = connection.exec(operation, request_data)
+
+            return response
+        except Exception as err:
+            logging.error(err)
+
     def recordupdate(self, connection:OConnection, cluster_id:int, cluster_position:int, update_content:bool, record_content:bytes, record_version:int, record_type:ORecordType, mode:OModeInt):
         """
         Tries to update a record
@@ -309,16 +334,19 @@ class ODB:
                             "update-content": update_content,
                             "record-content": record_content,
                             "record-version": record_version,
-                            "record-type": record_type,
-                            "mode": mode}
+                            "record-type": record_type.value,
+                            "mode": mode.value}
 
             operation = OOperationRecordUpdate()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
             return response
+        except ConcurrentModificationException:
+            # has to be handled by the caller
+            raise
         except Exception as err:
             logging.error(err)
 
@@ -342,7 +370,7 @@ class ODB:
 
             operation = OOperationRecordDelete()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
@@ -350,6 +378,9 @@ class ODB:
                 return True
             else:
                 return False
+        except ConcurrentModificationException:
+            # has to be handled by the caller
+            raise
         except Exception as err:
             logging.error(err)
 
@@ -376,7 +407,7 @@ class ODB:
 
             operation = OOperationRecordLoad()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
@@ -384,7 +415,148 @@ class ODB:
         except Exception as err:
             logging.error(err)
 
-    def recordcreate(self, connection:OConnection, record_content:bytes, record_type:ORecordType, mode:OModeInt):
+    def recordloadmany(self, connection:OConnection, rids:list, fetch_plan:str, ignore_cache:bytes, load_tombstones:bytes):
+        """
+        Loads several records by pipelining one load request per record
+
+        :param connection:
+        :param rids: list of (cluster-id, cluster-position) tuples
+        :param fetch_plan:
+        :param ignore_cache:
+        :param load_tombstones:
+        :return: list of responses in the order of the given rids
+        """
+        try:
+            requests = list()
+            for cluster_id, cluster_position in rids:
+                # prepare data dict
+                request_data = {"cluster-id": cluster_id,
+                                "cluster-position": cluster_position,
+                                "fetch-plan": fetch_plan,
+                                "ignore-cache": ignore_cache,
+                                "load-tombstones": load_tombstones}
+                requests.append((OOperationRecordLoad(), request_data))
+
+            debug("called pipelined %s for %s records", OOperationRecordLoad, len(requests))
+
+            return connection.execmany(requests)
+        except Exception as err:
+            logging.error(err)
+
+    def recordmetadata(self, connection:OConnection, cluster_id:int, cluster_position:int):
+        """
+        Fetches the rid and version of a record without its content
+
+        :param connection:
+        :param cluster_id:
+        :param cluster_position:
+        :return: response with cluster-id, cluster-position and record-version or None if the record doesn't exist
+        :raises: any other error, the caller can't tell it from a missing record otherwise
+        """
+        try:
+            # prepare data dict
+            request_data = {"cluster-id": cluster_id,
+                            "cluster-position": cluster_position}
+
+            operation = OOperationRecordMetadata()
+
+            debug("called %s with data %s", operation, request_data)
+
+            return connection.exec(operation, request_data)
+        except RecordNotFoundException:
+            return None
+        except Exception as err:
+            logging.error(err)
+            raise
+
+    def recordmetadatamany(self, connection:OConnection, rids:list):
+        """
+        Fetches the rids and versions of several records by pipelining one metadata request per record. As an error
+        response ends the pipeline, a RecordNotFoundException is raised if one of the records doesn't exist.
+
+        :param connection:
+        :param rids: list of (cluster-id, cluster-position) tuples
+        :return: list of responses in the order of the given rids
+        :raises: RecordNotFoundException and any other error
+        """
+        try:
+            requests = list()
+            for cluster_id, cluster_position in rids:
+                request_data = {"cluster-id": cluster_id,
+                                "cluster-position": cluster_position}
+                requests.append((OOperationRecordMetadata(), request_data))
+
+            debug("called pipelined %s for %s records", OOperationRecordMetadata, len(requests))
+
+            return connection.execmany(requests)
+        except RecordNotFoundException:
+            # has to be handled by the caller
+            raise
+        except Exception as err:
+            logging.error(err)
+            raise
+
+    def recordupdatemany(self, connection:OConnection, records:list, record_type:ORecordType):
+        """
+        Updates several records by pipelining one update request per record
+
+        :param connection:
+        :param records: list of (cluster-id, cluster-position, record-version, record-content) tuples
+        :param record_type:
+        :return: list of responses in the order of the given records
+        """
+        try:
+            requests = list()
+            for cluster_id, cluster_position, record_version, record_content in records:
+                # prepare data dict
+                request_data = {"cluster-id": cluster_id,
+                                "cluster-position": cluster_position,
+                                "update-content": True,
+                                "record-content": record_content,
+                                "record-version": record_version,
+                                "record-type": record_type.value,
+                                "mode": OModeInt.SYNCHRONOUS.value}
+                requests.append((OOperationRecordUpdate(), request_data))
+
+            debug("called pipelined %s for %s records", OOperationRecordUpdate, len(requests))
+
+            return connection.execmany(requests)
+        except ConcurrentModificationException:
+            # has to be handled by the caller
+            raise
+        except Exception as err:
+            logging.error(err)
+
+    def recordcreatemany(self, connection:OConnection, records:list, record_type:ORecordType):
+        """
+        Creates several records by pipelining one create request per record
+
+        :param connection:
+        :param records: list of (cluster-id, record-content) tuples, use -1 as cluster id to let the server choose the
+        cluster of the records class
+        :param record_type:
+        :return: list of responses in the order of the given records
+        """
+        try:
+            requests = list()
+            for cluster_id, record_content in records:
+                # prepare data dict
+                request_data = {"cluster-id": cluster_id,
+                                "record-content": record_content,
+                                "record-type": record_type.value,
+                                "mode": OModeInt.SYNCHRONOUS.value}
+                requests.append((OOperationRecordCreate(), request_data))
+
+            debug("called pipelined %s for %s records", OOperationRecordCreate, len(requests))
+
+            return connection.execmany(requests)
+        except ConcurrentModificationException:
+            # has to be handled by the caller
+            raise
+        except Exception as err:
+            logging.error(err)
+
+    def recordcreate(self, connection:OConnection, record_content:bytes, record_type:ORecordType, mode:OModeInt, cluster_id:int=-1):
         """
         Creates a record
 
@@ -392,19 +564,20 @@ class ODB:
         :param record_content:
         :param record_type:
         :param mode:
+        :param cluster_id: -1 lets the server choose the cluster of the records class
         :return:
         """
         try:
             # prepare data dict
             request_data = {"datasegment-id": -1,
-                            "cluster-id": -1,
+                            "cluster-id": cluster_id,
                             "record-content": record_content,
                             "record-type": record_type.value,
                             "mode": mode.value}
 
             operation = OOperationRecordCreate()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
@@ -429,7 +602,7 @@ class ODB:
 
             operation = OOperationDBExist()
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
@@ -469,11 +642,14 @@ class ODB:
             if mode == OModeInt.ASYNCHRONOUS:
                 operation.setasync(True)
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
             return response
+        except ConcurrentModificationException:
+            # has to be handled by the caller
+            raise
         except Exception as err:
             logging.error(err)
 
@@ -504,11 +680,14 @@ class ODB:
                             "end": 0}
 
 
-            logging.debug("called {} with data {}".format(operation, request_data))
+            debug("called %s with data %s", operation, request_data)
 
             response = connection.exec(operation, request_data)
 
             return response
+        except ConcurrentModificationException:
+            # the server has already rolled back the transaction
+            raise
         except Exception as err:
             # in case of an error terminate the tx
             connection.sendbytes(b'-1')
@@ -0,0 +1,147 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import queue
+import threading
+
+from contextlib import contextmanager
+
+from opy.common.o_db_constants import ODBType
+from opy.common.o_db_exceptions import NotConnectedException
+from opy.database.o_db_connection import OConnection
+from opy.database.o_db_ops import ODB
+
+
+__author__ = 'daill'
+
+
+class OConnectionPool(object):
+    """
+    Keeps a number of opened database connections which can be shared between threads. Connections are created lazily
+    up to the given size, a thread which asks for a connection while all of them are in use has to wait until one is
+    given back.
+    """
+    def __init__(self, database:str, user_name:str, user_password:str, host:str=None, port:int=None, size:int=4):
+        self.__database = database
+        self.__user_name = user_name
+        self.__user_password = user_password
+        self.__host = host
+        self.__port = port
+        self.__size = size
+
+        self.__odb = ODB()
+        self.__idle = queue.LifoQueue()
+        self.__connections = list()
+        self.__lock = threading.Lock()
+
+    def acquire(self, timeout:float=None):
+        """
+        Takes an idle connection or opens a new one if the pool is not exhausted, yet
+
+        :param timeout: seconds to wait for a connection, None waits forever
+        :return: opened connection
+        """
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.__lock:
+            create = len(self.__connections) < self.__size
+            if create:
+                # reserve the slot before the connection is opened to keep the lock short
+                self.__connections.append(None)
+
+        if create:
+            try:
+                connection = self.open()
+            except Exception:
+                with self.__lock:
+                    self.__connections.remove(None)
+                raise
+
+            with self.__lock:
+                self.__connections[self.__connections.index(None)] = connection
+            return connection
+
+        try:
+            return self.__idle.get(timeout=timeout)
+        except queue.Empty:
+            raise NotConnectedException("no connection available within {}s".format(timeout))
+
+    def release(self, connection:OConnection):
+        """
+        Gives a connection back to the pool
+        """
+        self.__idle.put(connection)
+
+    def discard(self, connection:OConnection):
+        """
+        Closes a connection which shouldn't be used anymore, i.e. after a failed request, instead of giving it back. The
+        next acquire opens a new one in its place.
+        """
+        with self.__lock:
+            if connection in self.__connections:
+                self.__connections.remove(connection)
+
+        connection.close()
+
+    @contextmanager
+    def connection(self, timeout:float=None):
+        """
+        Use this method within a with statement to give the connection back in any case
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def open(self, factory=OConnection):
+        """
+        Opens a new connection to the database, it's only part of the pool if it has been opened by acquire
+
+        :param factory: connection class
+        :return: opened connection
+        """
+        connection = factory(self.__host, self.__port)
+
+        self.__odb.connect(connection, user_name=self.__user_name, user_password=self.__user_password)
+        self.__odb.dbopen(connection, database_name=self.__database, database_type=ODBType.GRAPH.value, user_name=self.__user_name, user_password=self.__user_password)
+
+        if connection.session_id is None:
+            connection.close()
+            raise NotConnectedException("could not open database '{}'".format(self.__database))
+
+        logging.debug("pooled connection with session id {} opened".format(connection.session_id))
+
+        return connection
+
+    def close(self):
+        """
+        Closes all connections of the pool
+        """
+        with self.__lock:
+            connections = [connection for connection in self.__connections if connection is not None]
+            self.__connections = list()
+
+        while not self.__idle.empty():
+            self.__idle.get_nowait()
+
+        for connection in connections:
+            self.__odb.dbclose(connection)
+
+    def __len__(self):
+        return len(self.__connections)
@@ -0,0 +1,129 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import logging
+import struct
+
+from opy.common.o_db_constants import OOperationType
+from opy.common.o_db_exceptions import NotConnectedException
+from opy.common.o_db_logging import debug
+from opy.database.o_db_connection import OConnection
+
+__author__ = 'daill'
+
+
+# status byte of messages which are pushed by the server instead of being a response
+PUSH_STATUS = 3
+# (status:byte)(session-id:int)(push-type:byte)(content-length:int)
+PUSH_HEAD = struct.Struct(">bibi")
+# (operation:byte)(token:int)(record-type:byte)(record-version:int)(cluster-id:short)(cluster-position:long)
+PUSH_RECORD = struct.Struct(">bibihq")
+
+
+OPushRecord = collections.namedtuple("OPushRecord", ["operation", "token", "record_type", "version", "cluster_id",
+                                                     "cluster_position", "content"])
+OPushRecord.__doc__ = """
+Record change pushed for a live query (REQUEST_PUSH_RECORD). The operation is one of OTXOperationType, the content
+is the binary record or None.
+"""
+
+
+class OPushConnection(OConnection):
+    """
+    Connection which receives pushed record changes besides the responses. Pushed messages which are read while
+    waiting for a response are put aside, poll returns them.
+    """
+    def __init__(self, host:str, port:int, recorder=None):
+        self.__pending = b''
+        self.__pushes = collections.deque()
+        super().__init__(host, port, recorder)
+
+    def receive(self):
+        while True:
+            received = super().receive()
+            pushes, data = self.__split(received)
+            self.__pushes.extend(pushes)
+
+            # the response might follow the pushed messages
+            if data or not received:
+                return data
+
+    def poll(self):
+        """
+        Waits for pushed messages as long as receive does
+
+        :return: list of OPushRecord
+        :raises: NotConnectedException if the server has closed the connection and all pushed messages have been read
+        """
+        pushes, data = self.__split(super().receive())
+        if data:
+            logging.warning("dropped {} bytes which haven't been requested".format(len(data)))
+
+        self.__pushes.extend(pushes)
+        result = list(self.__pushes)
+        self.__pushes.clear()
+
+        if not result and self.peerclosed:
+            # receive returns at once after the end of the stream
+            raise NotConnectedException("the server closed the connection")
+        return result
+
+    def __split(self, data:bytes):
+        pushes, data, pending = splitpushes(self.__pending + data)
+        self.__pending = pending
+        return pushes, data
+
+
+def splitpushes(data:bytes):
+    """
+    Splits the pushed messages off the beginning of the received data
+
+    :param data:
+    :return: (list of OPushRecord, the data following them, an incomplete pushed message)
+    """
+    pushes = list()
+    position = 0
+
+    while len(data) > position and data[position] == PUSH_STATUS:
+        if len(data) < position + PUSH_HEAD.size:
+            return pushes, b'', data[position:]
+
+        _, _, push_type, length = PUSH_HEAD.unpack_from(data, position)
+        end = position + PUSH_HEAD.size + length
+        if len(data) < end:
+            return pushes, b'', data[position:]
+
+        if push_type == OOperationType.REQUEST_PUSH_RECORD.value:
+            pushes.append(readpushrecord(data[position + PUSH_HEAD.size:end]))
+        else:
+            debug("ignored pushed message of type %s", push_type)
+        position = end
+
+    return pushes, data[position:], b''
+
+def readpushrecord(content:bytes):
+    operation, token, record_type, version, cluster_id, cluster_position = PUSH_RECORD.unpack_from(content)
+    length = struct.unpack_from(">i", content, PUSH_RECORD.size)[0]
+    record = content[PUSH_RECORD.size + 4:PUSH_RECORD.size + 4 + length] if length > 0 else None
+    return OPushRecord(operation, token, record_type, version, cluster_id, cluster_position, record)
+
+def pushrecord(operation:int, token:int, version:int, cluster_id:int, cluster_position:int, content:bytes=None):
+    """
+    :return: the pushed message of a record change as it is sent by the server
+    """
+    body = PUSH_RECORD.pack(operation, token, ord('d'), version, cluster_id, cluster_position)
+    body += struct.pack(">i", len(content) if content is not None else -1) + (content or b'')
+    return PUSH_HEAD.pack(PUSH_STATUS, -1, OOperationType.REQUEST_PUSH_RECORD.value, len(body)) + body
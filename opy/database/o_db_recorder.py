@@ -0,0 +1,161 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import logging
+import struct
+import threading
+
+from opy.common.o_db_exceptions import ReplayException
+from opy.database.o_db_connection import OConnection
+from opy.database.protocol.o_op_init import OOperationInit
+
+__author__ = 'daill'
+
+
+# operation type (0 for the handshake), timestamps of sending the request and receiving the response, request and
+# response bytes
+ORecordingEntry = collections.namedtuple("ORecordingEntry", ["operation_type", "sent", "received", "request", "response"])
+
+
+class ORecorder(object):
+    """
+    Writes the requests and responses of connections to a file. Each entry consists of a fixed head
+    (operation-type:byte)(sent:double)(received:double)(request-length:int)(response-length:int) followed by the
+    request and the response bytes. Pipelined requests are recorded as one entry with the type of the first operation.
+
+    Usage:
+
+        with ORecorder("select.rec") as recorder:
+            client = OClient("db", "root", "root", host, port, recorder=recorder)
+            client.fetch(Select(VertexClass, (), ()))
+    """
+    magic = b'OPYREC\x01'
+    head = struct.Struct(">bddii")
+
+    def __init__(self, path:str):
+        self.__file = open(path, "wb")
+        self.__file.write(ORecorder.magic)
+        self.__lock = threading.Lock()
+        self.count = 0
+
+    def record(self, operation_type:int, sent:float, received:float, request:bytes, response:bytes):
+        with self.__lock:
+            if self.__file.closed:
+                logging.warning("recorder has been closed, operation {} is not recorded".format(operation_type))
+                return
+            self.__file.write(ORecorder.head.pack(operation_type, sent, received, len(request), len(response)))
+            self.__file.write(request)
+            self.__file.write(response)
+            self.count += 1
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def readrecording(path:str):
+    """
+    :param path: file written by an ORecorder
+    :return: generator of ORecordingEntry
+    """
+    with open(path, "rb") as file:
+        if file.read(len(ORecorder.magic)) != ORecorder.magic:
+            raise ReplayException("'{}' is not a recording".format(path))
+
+        head_size = ORecorder.head.size
+        while True:
+            head = file.read(head_size)
+            if not head:
+                break
+            if len(head) < head_size:
+                raise ReplayException("recording '{}' is truncated".format(path))
+
+            operation_type, sent, received, request_length, response_length = ORecorder.head.unpack(head)
+            yield ORecordingEntry(operation_type, sent, received, file.read(request_length), file.read(response_length))
+
+
+class OReplayConnection(OConnection):
+    """
+    Connection which answers the requests with the responses of a recording instead of a server, without any waiting.
+    The requests have to be sent in the recorded order. Pass it to OClient to replay a recorded session, i.e. to
+    profile the decoding of real responses or to compare the results of different decoder versions.
+
+        client = OClient("db", "root", "root", connection=OReplayConnection("select.rec"))
+        client.fetch(Select(VertexClass, (), ()))
+
+    If strict is set, the requests have to match the recorded ones byte by byte, otherwise only the operation type is
+    compared.
+    """
+    def __init__(self, recording, strict:bool=False):
+        """
+        :param recording: path of a recording or list of ORecordingEntry
+        :param strict:
+        """
+        if isinstance(recording, str):
+            recording = readrecording(recording)
+        self.__entries = collections.deque(recording)
+        self.__strict = strict
+        self.__response = None
+
+        super().__init__(None, None)
+
+    def isopen(self):
+        return True
+
+    def remaining(self):
+        """
+        :return: number of recorded requests which haven't been replayed
+        """
+        return len(self.__entries)
+
+    def open(self):
+        entry = self.__next()
+        if entry.operation_type != 0:
+            raise ReplayException("recording doesn't start with a handshake")
+
+        result = self.parseresponse(OOperationInit(), entry.response)
+        self.protocol_version = result['protocol_number']
+
+    def write(self, bytes):
+        entry = self.__next()
+
+        if self.__strict:
+            if entry.request != bytes:
+                raise ReplayException("request doesn't match the recorded request of operation {}".format(entry.operation_type))
+        elif entry.request[:1] != bytes[:1]:
+            raise ReplayException("expected operation {} but got {}".format(entry.operation_type, struct.unpack(">b", bytes[:1])[0]))
+
+        self.__response = entry.response
+
+    def receive(self):
+        response, self.__response = self.__response, None
+        if response is None:
+            raise ReplayException("there is no response to replay")
+        return response
+
+    def close(self):
+        self.__entries.clear()
+
+    def __next(self):
+        if not self.__entries:
+            raise ReplayException("recording is exhausted")
+        return self.__entries.popleft()
@@ -15,9 +15,14 @@
 import logging
 import inspect
 import binascii
+import operator
+import struct
 
-from opy.client.o_db_base import BaseVertex, BaseEdge
+from opy.client.o_db_base import BaseVertex, BaseEdge, BaseEntity
+from opy.common.o_db_constants import OBinaryType
 from opy.common.o_db_exceptions import SerializationException, TypeNotFoundException
+from opy.common.o_db_hooks import OHooks
+from opy.common.o_db_logging import OLogging, debug
 from opy.database.o_db_codec import OCodec
 from opy.common.o_db_model import ORidBagType
 from opy.common.o_db_model import ORidBagDocument, ORidBagBinary
@@ -50,12 +55,12 @@ class OSerializer(object):
 
     def getinstance(self, class_name):
         try:
-            logging.debug("create instance of class'{}'".format(class_name))
+            debug("create instance of class '%s'", class_name)
 
             # get target module
             target_module = inspect.importlib.import_module(self.entities[class_name])
 
-            logging.debug("loaded module '{}'".format(target_module))
+            debug("loaded module '%s'", target_module)
 
             # instantiiate object by class name
             targetClass = getattr(target_module, class_name)
@@ -95,13 +100,16 @@ class OSerializer(object):
                             if hasattr(instance, field_name):
                                 setattr(instance, field_name, field_value)
                             else:
-                                logging.warning("instance of class '{}' has no attribute with the name '{}', added to result dict".format(class_name, field_name))
+                                logging.warning("instance of class '%s' has no attribute with the name '%s', added to result dict", class_name, field_name)
                                 result_data[field_name] = field_value
 
-                        logging.debug("parse field {} with value {}".format(field_name, field_value))
+                        if OLogging.enabled:
+                            debug("parse field %s with value %s", field_name, field_value, field=field_name)
 
                     instance.in_edges = in_edges
                     instance.out_edges = out_edges
+                    # the fields have to be written back on update, otherwise the server would drop them
+                    instance.unmappedfields = result_data
 
                     return instance, result_data
                 elif isinstance(instance, BaseEdge):
@@ -119,6 +127,8 @@ class OSerializer(object):
                         return edge_list
                     elif isinstance(data, dict):
                         instance.tmp_rid = data
+                        instance.unmappedfields = {field: value for field, value in data.items()
+                                                   if field not in ("in", "out") and not hasattr(instance, field)}
                         return instance, None
             else:
                 raise SerializationException("there is no class with name '{}'".format(class_name))
@@ -127,6 +137,59 @@ class OSerializer(object):
             logging.error(err)
 
 
+class OClassLayout(object):
+    """
+    Header bytes and declared types of the fields of one class. Fields which are properties of the class (or one of
+    its super classes) are written as global property ids, all others with their name.
+
+    The encode plan of a class (see plan) is cached as well, so encoding an object doesn't need to look up or encode
+    anything which only depends on the class.
+    """
+    def __init__(self, codec:OCodec, properties:dict):
+        """
+        :param codec:
+        :param properties: dict of property name -> (global id, OBinaryType)
+        """
+        self.__codec = codec
+        self.__properties = properties
+        # field name -> (header bytes, OBinaryType or None)
+        self.__fields = dict()
+        # tuple of field names -> list of (field name, getter, header bytes, declared OBinaryType, declared writer)
+        self.__plans = dict()
+
+    def plan(self, fields:tuple):
+        """
+        :param fields: names of the persistent attributes
+        :return: list of (field name, attribute getter, header bytes, declared OBinaryType or None, writer of the
+                 declared type or None)
+        """
+        plan = self.__plans.get(fields)
+        if plan is None:
+            plan = list()
+            for name in fields:
+                header, declared = self.field(name)
+                writer = self.__codec.writer(declared) if declared is not None else None
+                plan.append((name, operator.attrgetter(name), header, declared, writer))
+            self.__plans[fields] = plan
+        return plan
+
+    def field(self, name:str):
+        """
+        :param name:
+        :return: (header bytes, declared OBinaryType or None)
+        """
+        entry = self.__fields.get(name)
+        if entry is None:
+            if name in self.__properties:
+                global_id, otype = self.__properties[name]
+                # global properties are written as -(id + 1), zero and positive values denote field names
+                entry = (self.__codec.writevarint(-(global_id + 1)), otype)
+            else:
+                entry = (self.__codec.writevarintstring(name), None)
+            self.__fields[name] = entry
+        return entry
+
+
 class OBinarySerializer(OSerializer):
     """
     This class provides all necessary code to decode a binary encoded record and vice versa with the following structure:
@@ -137,6 +200,9 @@ class OBinarySerializer(OSerializer):
     data: depends on the type of data and position
 
     """
+    # class name -> OClassLayout, has to be cleared if the schema changes
+    layouts = dict()
+
     def __init__(self):
         super().__init__()
         self.__codec = OCodec()
@@ -146,64 +212,207 @@ class OBinarySerializer(OSerializer):
         self.class_name = None
 
     def encode(self, data:BaseVertex):
-        if data:
-            result_head = b''
-            logging.debug("start binary serializing data: {}".format(data))
-
-            # write version
-            result_head += self.__codec.writebyte(0)
-
-            # write class name
-            class_name = data.__class__.__name__
-            result_head += self.__codec.writevarintstring(class_name)
-
-            result_values = b''
-
-            fields = data.persistentattributes()
-            temp_header_bytes = dict()
-            temp_value_bytes = dict()
-            temp_type_bytes = dict()
-            byte_count = len(result_head)
-
-            for field in fields:
-                if hasattr(data, field):
-                    value = getattr(data, field)
-                    # check if the field is another vertex
-                    if value:
-                        try:
-                            temp_header_bytes[field] = (self.__codec.writevarintstring(field))
-                            type = self.__codec.findotype(value)
-                            temp_type_bytes[field] = (self.__codec.writeotype(type))
+        if not data:
+            return b''
 
-                            # byte length of key string, type and position
-                            byte_count += len(temp_header_bytes[field]) + len(temp_type_bytes[field]) + 4
+        debug("start binary serializing data: %s", data)
 
-                            temp_value_bytes[field] = (self.__codec.writevalue(type, value))
+        # write version
+        result_head = self.__codec.writebyte(0)
 
-                        except TypeNotFoundException as err:
-                            logging.error(err)
+        # write class name
+        class_name = data.__class__.__name__
+        result_head += self.__codec.writevarintstring(class_name)
 
+        layout = self.layout(class_name)
+
+        # edges don't need to have own attributes
+        if isinstance(data, BaseEdge) and not hasattr(data, "persistentattributes"):
+            fields = ()
+        else:
+            fields = tuple(data.persistentattributes())
+
+        # list of (header bytes, type bytes, value bytes or a function writing the value at a given offset)
+        entries = list()
+
+        for field, getter, header, declared, writer in layout.plan(fields):
+            try:
+                value = getter(data)
+            except AttributeError:
+                logging.info("class '%s' has no attribute with name '%s'", class_name, field)
+                continue
+
+            if value is None:
+                continue
+
+            # check if the field is another vertex
+            type, value = linkvalue(value)
+            self.__addentry(entries, field, header, declared, writer, type, value)
+
+        # the edges of a vertex are stored in ridbags, so they have to be written as well, otherwise the
+        # server would drop them on update. An edge record itself links to both of its vertices.
+        if isinstance(data, BaseVertex):
+            references = {field: (OBinaryType.LINKBAG, rids) for field, rids in self.ridbags(data).items()}
+        elif isinstance(data, BaseEdge):
+            references = self.endpoints(data)
+        else:
+            references = dict()
+
+        for field, (type, value) in references.items():
+            header, declared = layout.field(field)
+            writer = self.__codec.writer(declared) if declared is not None else None
+            self.__addentry(entries, field, header, declared, writer, type, value)
+
+        # fields of the stored record which the class doesn't know
+        unmapped = getattr(data, "unmappedfields", None)
+        if unmapped:
+            for field, value in unmapped.items():
+                if value is None or field in fields or field in references:
+                    continue
+                header, declared = layout.field(field)
+                writer = self.__codec.writer(declared) if declared is not None else None
+                type, value = linkvalue(value)
+                self.__addentry(entries, field, header, declared, writer, type, value)
+
+        # the header ends with a zero length field name, the values follow directly behind it
+        header_end = self.__codec.writevarint(0)
+        position = len(result_head) + len(header_end)
+        for header, type_bytes, value_bytes in entries:
+            # byte length of header, type and pointer
+            position += len(header) + len(type_bytes) + 4
+
+        result = bytearray(result_head)
+        values = bytearray()
+        for header, type_bytes, value_bytes in entries:
+            if callable(value_bytes):
+                # the pointers of embedded maps are absolute, so the position of the value has to be known
+                value_bytes = value_bytes(position + len(values))
+            result += header
+            result += struct.pack(">i", position + len(values))
+            result += type_bytes
+            values += value_bytes
+
+        result += header_end
+        result += values
+        return bytes(result)
+
+    def __addentry(self, entries:list, field:str, header:bytes, declared, writer, type, value):
+        """
+        Encodes the value of a field and appends (header bytes, type bytes, value bytes) to the entries
+
+        :param declared: type declared by the schema or None
+        :param writer: writer of the declared type
+        :param type: type of a link or ridbag value, otherwise None
+        """
+        try:
+            accepted, value = declaredvalue(declared, type, value)
+            if accepted:
+                # the type is part of the global property
+                if declared in OCodec.containers:
+                    entries.append((header, b'', lambda offset: writer(value, offset)))
                 else:
-                    logging.info("class '{}' has no attribute with name '{}'".format(class_name, field))
+                    entries.append((header, b'', writer(value)))
+                return
+
+            if declared is not None:
+                # the value doesn't fit to the schema, so it has to be written with its name
+                header = self.__codec.writevarintstring(field)
+            if type is None:
+                type = self.__codec.findotype(value)
+            if type in OCodec.containers:
+                entries.append((header, self.__codec.writeotype(type), lambda offset: self.__codec.writevalue(type, value, offset)))
+            else:
+                entries.append((header, self.__codec.writeotype(type), self.__codec.writevalue(type, value)))
+        except TypeNotFoundException as err:
+            logging.error(err)
 
-            # concat the bytes to fit the right order
-            for field in fields:
-                if field in temp_header_bytes:
-                    result_head += temp_header_bytes[field]
-                    # position of the data
-                    result_head += self.__codec.writeint(byte_count)
-                    result_head += temp_type_bytes[field]
+    def layout(self, class_name:str):
+        """
+        :param class_name:
+        :return: the cached OClassLayout of the class
+        """
+        layout = OBinarySerializer.layouts.get(class_name)
+        if layout is None:
+            layout = OClassLayout(OCodec(), declaredproperties(self.schema, class_name))
+            OBinarySerializer.layouts[class_name] = layout
+        return layout
 
-                    result_values += temp_value_bytes[field]
-                    byte_count += len(temp_value_bytes[field])
+    def ridbags(self, vertex:BaseVertex):
+        """
+        Collects the rids of the known edges of a vertex. Edges which haven't been saved, yet, are skipped.
 
+        :param vertex:
+        :return: dict of field name (i.e. out_EdgeClass) -> list of rid tuples
+        """
+        result = dict()
+        for prefix, edges in (("out_", getattr(vertex, "out_edges", None)), ("in_", getattr(vertex, "in_edges", None))):
+            if not edges:
+                continue
+
+            for edge_class, edge_list in edges.items():
+                rids = list()
+                for obj in edge_list or ():
+                    for edge in (obj if isinstance(obj, list) else [obj]):
+                        if isinstance(edge, BaseEdge):
+                            # new edges within a transaction have a temporary rid
+                            clusterid = getattr(edge, "clusterid", None)
+                            if clusterid is not None:
+                                rids.append((clusterid, edge.clusterposition))
+                            elif isinstance(getattr(edge, "tmp_rid", None), tuple):
+                                rids.append(edge.tmp_rid)
+                if rids:
+                    result[prefix + edge_class] = rids
+        return result
+
+    def endpoints(self, edge:BaseEdge):
+        """
+        :param edge:
+        :return: dict of out/in -> (OBinaryType.LINK, rid tuple) of the vertices the edge is connecting
+        """
+        result = dict()
+        for field, vertex in (("out", getattr(edge, "out_vertex", None)), ("in", getattr(edge, "in_vertex", None))):
+            type, value = linkvalue(vertex)
+            if type == OBinaryType.LINK:
+                result[field] = (type, value)
+        return result
+
+    def encodeparams(self, params:dict):
+        """
+        Serializes query parameters as the server expects them: a document without class whose field 'params' is an
+        embedded map of parameter key -> value
+
+        :param params: dict of parameter key -> value, positional parameters are keyed by their index
+        :return: bytes
+        """
+        # version and empty class name
+        result_head = self.__codec.writebyte(0)
+        result_head += self.__codec.writevarint(0)
+
+        # one header entry and the end of the header
+        result_head += self.__codec.writevarintstring("params")
+        pointer = len(result_head) + 4 + 1 + 1
+
+        result_head += self.__codec.writeint(pointer)
+        result_head += self.__codec.writeotype(OBinaryType.EMBEDDEDMAP.value)
+        result_head += self.__codec.writevarint(0)
 
-        return result_head + result_values
+        return result_head + self.__codec.writeembeddedmap(params, pointer)
 
     def decode(self, data, subcall:bool=False, initialpos:int=None):
+        # embedded records are part of the trace of the record containing them
+        trace = OHooks.start("deserialize", size=len(data)) if OHooks.active and not subcall else None
+        if trace is None:
+            return self.__decode(data, subcall, initialpos)
+
+        result = self.__decode(data, subcall, initialpos)
+        trace.end(class_name=result[1] if result else None)
+        return result
+
+    def __decode(self, data, subcall:bool, initialpos:int):
         try:
             if len(data) != 0:
-                logging.debug("start binary deserializing bytes: {}".format(data))
+                if OLogging.enabled:
+                    debug("start binary deserializing %s bytes", len(data), data=data)
                 rest = data
                 initpos = 0
 
@@ -211,6 +420,9 @@ class OBinarySerializer(OSerializer):
                 # start deserializing
                 # first read byte
                 if not subcall:
+                    # the positions of a previously decoded record mustn't affect this one
+                    self.__codec.position = 0
+                    self.__codec.bytecount = 0
                     version, rest = self.__codec.readbyte(rest)
 
                 # read class name
@@ -229,7 +441,8 @@ class OBinarySerializer(OSerializer):
 
                 # read fields and pointers
                 while True:
-                    logging.debug(rest)
+                    if OLogging.enabled:
+                        debug("read field at position %s, %s bytes left", self.__codec.position, len(rest), rest=rest)
 
                     if first_pos and self.__codec.position >= first_pos:
                         break
@@ -257,7 +470,8 @@ class OBinarySerializer(OSerializer):
                         # decode global property
                         id = (length * -1) - 1
 
-                        logging.debug("try to read global property with id '{}'".format(id))
+                        if OLogging.enabled:
+                            debug("try to read global property with id '%s'", id)
                         properties = self.schema.globalProperties
 
                         def testid(id:int, prop):
@@ -282,7 +496,7 @@ class OBinarySerializer(OSerializer):
                                 resultproperty = iterateprops(id)
 
                         except IndexError:
-                            logging.debug("id '{}' is out of range, try to iterate".format(id))
+                            debug("id '%s' is out of range, try to iterate", id)
 
                             resultproperty = iterateprops(id)
                         resultproperty
@@ -292,14 +506,16 @@ class OBinarySerializer(OSerializer):
                         type = resultproperty['type']
                         field_name = resultproperty['name']
 
-                        logging.debug("property with id '{}' found".format(id))
+                        if OLogging.enabled:
+                            debug("property with id '%s' found", id)
 
                         if initpos != 0:
                             pos -= initpos
 
                     if pos != 0:
                         actual_position = self.__codec.position
-                        self.__codec.position = 0
+                        # the pointers of embedded maps are absolute, so the codec has to know where the value starts
+                        self.__codec.position = pos + initpos
 
                         value, temp_rest = self.__codec.readvalue(type, data[pos:])
                         position_delta += self.__codec.position
@@ -346,7 +562,7 @@ class OCSVSerializer(OSerializer):
 
             field_list = field_list_str.split(',')
 
-            logging.debug("extracted field list {}".format(field_list))
+            debug("extracted field list %s", field_list)
 
             for field in field_list:
                 field_split = field.split(':')
@@ -358,23 +574,23 @@ class OCSVSerializer(OSerializer):
                         if hasattr(instance, field_name):
                             setattr(instance, field_name, field_value)
 
-                        logging.debug("parse field {} with value {}".format(field_name, field_value))
+                        debug("parse field %s with value %s", field_name, field_value)
                     else:
                         # possible base64 string
                         field_value = field_split[1].strip('%; ')
                         base64_binary = binascii.a2b_base64(field_value)
-                        logging.debug("decoded base64: " + str(base64_binary))
+                        debug("decoded base64: %s", base64_binary)
 
 
                         parser = OCodec()
                         data_dict = parser.serialization_decoder(ORidBagDocument(ORidBagType.EMBEEDED), base64_binary)
 
-                        logging.debug("decoded base64: " + str(base64_binary))
+                        debug("decoded base64: %s", base64_binary)
 
                         # map ids to instance
                         instance.linkdict[field_name] = data_dict['links']
 
-                        logging.debug("parsed data from base64: {}".format(data_dict))
+                        debug("parsed data from base64: %s", data_dict)
 
 
                 else:
@@ -384,3 +600,89 @@ class OCSVSerializer(OSerializer):
         else:
             raise SerializationException("could not split record content '{}' by @".format(decoded_str))
 
+
+def linkvalue(value):
+    """
+    Entities which already have a rid, even a temporary one, are written as links instead of being embedded. The same
+    applies to lists which consist of such entities only.
+
+    :param value:
+    :return: (OBinaryType or None, value to write)
+    """
+    if isinstance(value, BaseEntity):
+        if getattr(value, "clusterid", None) is not None:
+            return OBinaryType.LINK, (value.clusterid, value.clusterposition)
+    elif isinstance(value, list) and value:
+        if all(isinstance(item, BaseEntity) and getattr(item, "clusterid", None) is not None for item in value):
+            return OBinaryType.LINKLIST, [(item.clusterid, item.clusterposition) for item in value]
+    return None, value
+
+def declaredproperties(schema, class_name:str):
+    """
+    Collects the properties of a class and its super classes
+
+    :param schema: OSchema with global properties and classes (see OClient.readschema)
+    :param class_name:
+    :return: dict of property name -> (global id, OBinaryType)
+    """
+    result = dict()
+    classes = getattr(schema, "classes", None)
+    if not classes or not schema.globalProperties:
+        return result
+
+    globalproperties = {prop.get("id"): prop for prop in schema.globalProperties if isinstance(prop, dict)}
+
+    visited = set()
+    while class_name in classes and class_name not in visited:
+        visited.add(class_name)
+        for name, global_id in classes[class_name].get("properties", dict()).items():
+            prop = globalproperties.get(global_id)
+            if prop is not None and name not in result:
+                result[name] = (global_id, tobinarytype(prop.get("type")))
+        class_name = classes[class_name].get("superClass")
+
+    return result
+
+def tobinarytype(value):
+    """
+    :param value: type id or name
+    :return: OBinaryType
+    """
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        return OBinaryType[value.upper()]
+    return OBinaryType(value)
+
+def declaredvalue(declared, type, value):
+    """
+    Checks if a value can be written with the type declared by the schema
+
+    :param declared: declared OBinaryType or None
+    :param type: type of a link or ridbag value, otherwise None
+    :param value:
+    :return: (True if the declared type can be used, value converted to the declared type)
+    """
+    if declared is None:
+        return False, value
+
+    if type is not None:
+        if type == declared or (type == OBinaryType.LINKLIST and declared == OBinaryType.LINKSET):
+            return True, value
+    elif isinstance(value, bool):
+        return declared == OBinaryType.BOOLEAN, value
+    elif isinstance(value, int):
+        if declared in (OBinaryType.INTEGER, OBinaryType.SHORT, OBinaryType.LONG, OBinaryType.DATETIME, OBinaryType.DATE):
+            return True, value
+        if declared in (OBinaryType.DOUBLE, OBinaryType.FLOAT):
+            return True, float(value)
+    elif isinstance(value, float):
+        return declared in (OBinaryType.DOUBLE, OBinaryType.FLOAT), value
+    elif isinstance(value, str):
+        return declared == OBinaryType.STRING, value
+    elif isinstance(value, (list, set)):
+        return declared in (OBinaryType.EMBEDDEDLIST, OBinaryType.EMBEDDEDSET), value
+    elif isinstance(value, dict):
+        return declared == OBinaryType.EMBEDDEDMAP, value
+
+    return False, value
@@ -31,6 +31,10 @@ class OOperation(object):
         self.__token = "(token:bytes)"
         self.token_based = False
         self.token = None
+        # bytes left after decoding the response, used to decode pipelined responses
+        self.rest = None
+        # False if the response ended before the profile has been read completely
+        self.complete = True
 
     def getresponsehead(self):
         if self.token_based:
@@ -62,6 +66,7 @@ class OOperation(object):
         data_dict = {}
         error_state = False
         rest = data
+        self.complete = True
 
         def processelement(element: OElement):
             nonlocal rest
@@ -74,6 +79,7 @@ class OOperation(object):
                 # handling of a term
                 # check if there are bytes left
                 if not rest or len(rest) == 0:
+                    self.complete = False
                     return
 
                 rest, value = unpack_data(element.type, rest, name=element.name)
@@ -107,6 +113,7 @@ class OOperation(object):
 
 
         status = processprofile(self.getresponseprofile().getelements())
+        self.rest = rest
 
         # return the status (OK|Error) to decide what to do next and the extracted data
         return data_dict, status
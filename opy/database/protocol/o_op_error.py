@@ -105,6 +105,7 @@ class OOperationError(OOperation):
       return OConst.OK
 
     status = processprofile(self.getresponseprofile().getelements())
+    self.rest = rest
 
     return data_dict, status
 
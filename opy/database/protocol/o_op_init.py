@@ -28,6 +28,10 @@ class OOperationInit(OOperation):
     self.__request_profile = None
     self.__response_profile = None
 
+  def getoperationtype(self):
+    # the handshake isn't an operation of its own, so there's no OOperationType for it
+    return 0
+
   def getresponseprofile(self):
     if self.__response_profile is None:
       profile_parser = OProfileParser()
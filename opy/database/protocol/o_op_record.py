@@ -14,7 +14,8 @@
 
 import logging
 
-from opy.common.o_db_constants import OOperationType, OConst
+from opy.common.o_db_constants import OOperationType, OConst, OProfileType, ORecordKind
+from opy.common.o_db_model import ORecord
 from opy.database.o_db_profile_parser import OProfileParser, OElement, OGroup
 from opy.database.protocol.o_op import OOperation
 
@@ -116,6 +117,9 @@ class OOperationRecordUpdate(OOperation):
 
         status = processprofile(self.getresponseprofile().getelements())
 
+        # needed to decode pipelined responses
+        self.rest = rest
+
         # return the status (OK|Error) to decide what to do next and the extracted data
         return data_dict, status
 
@@ -143,6 +147,30 @@ class OOperationRecordDelete(OOperation):
             self.__request_profile = profile_parser.parse(self.__request_profile_str)
         return self.__request_profile
 
+class OOperationRecordMetadata(OOperation):
+    def __init__(self):
+        super().__init__(OOperationType.REQUEST_RECORD_METADATA)
+
+        self.__request_profile_str = "(cluster-id:short)(cluster-position:long)"
+        self.__response_profile_str = "(cluster-id:short)(cluster-position:long)(record-version:int)"
+
+        self.__request_profile = None
+        self.__response_profile = None
+
+    def getresponseprofile(self):
+        if self.__response_profile is None:
+            profile_parser = OProfileParser()
+            self.__response_profile = profile_parser.parse(
+                self.getresponsehead() + self.__response_profile_str)
+
+        return self.__response_profile
+
+    def getrequestprofile(self):
+        if self.__request_profile is None:
+            profile_parser = OProfileParser()
+            self.__request_profile = profile_parser.parse(self.__request_profile_str)
+        return self.__request_profile
+
 class OOperationRecordCreate(OOperation):
     def __init__(self):
         super().__init__(OOperationType.REQUEST_RECORD_CREATE)
@@ -241,6 +269,9 @@ class OOperationRecordCreate(OOperation):
 
         status = processprofile(self.getresponseprofile().getelements())
 
+        # needed to decode pipelined responses
+        self.rest = rest
+
         # return the status (OK|Error) to decide what to do next and the extracted data
         return data_dict, status
 
@@ -271,77 +302,61 @@ class OOperationRecordLoad(OOperation):
 
     def decode(self, unpack_data, data):
         """
-        Need to override because of the dependencies of term and group
+        The payload is a sequence of records each introduced by a status byte. 1 marks the requested record, 2 a record
+        which has been pre-fetched because of the fetch plan and 0 the end of the payload. The remaining bytes are
+        kept in rest to be able to decode pipelined responses.
 
         :param unpack_data:
         :param data:
         :return:
         """
         data_dict = {}
-        error_state = False
         rest = data
+        payload_group = None
 
-        def processelement(element: OElement):
-            nonlocal rest
-            nonlocal data_dict
-
+        # read the response head
+        for element in self.getresponseprofile().getelements():
             if isinstance(element, OGroup):
+                payload_group = element
+                break
 
-                # save main state
-                main_dict = data_dict
+            rest, value = unpack_data(element.type, rest, name=element.name)
 
-                main_dict[element.name] = list()
+            # check if its and error
+            if element.name == OConst.SUCCESS_STATUS.value and value == 1:
+                logging.error("received an error from the server. start handling")
+                return data_dict, OConst.ERROR
 
-                while element.is_repeating:
-                    data_dict = {}
+            data_dict[element.name] = value
 
-                    for sub_element in element.getelements():
-                        rest = processelement(sub_element)
+        # the record group is the second element of the payload group
+        record_elements = payload_group.getelements()[1].getelements()
 
-                    main_dict[element.name].append(data_dict)
-                    break
-
-                data_dict = main_dict
-            else:
-                # handling of a term
-
-                # check if there are bytes left
-                if not rest or len(rest) == 0:
-                    return
-
-                rest, value = unpack_data(element.type, rest, name=element.name)
-
-                # check if its and error
-                if element.name == OConst.SUCCESS_STATUS.value and value == 1:
-                    logging.error("received an error from the server. start handling")
-                    nonlocal error_state
-                    error_state = True
-                    return
+        data_dict[payload_group.name] = list()
 
+        # the payload is complete as soon as its end has been read
+        self.complete = False
+        while rest:
+            rest, status = unpack_data(OProfileType.BYTE, rest, name="payload-status")
+            if status == 0:
+                self.complete = True
+                break
 
-                data_dict[element.name] = value
-            return rest
+            record = {}
+            if status == 1:
+                elements = record_elements
+            else:
+                # pre-fetched records are complete records including their rid
+                rest, kind = unpack_data(OProfileType.SHORT, rest, name="record-kind")
+                elements = ORecord(ORecordKind(kind)).getresponseprofile().getelements()
 
-        def processprofile(elements):
-            """
-            Iterate of the whole set of profile elements and unpack them
-            :param elements:
-            :return:
-            """
             for element in elements:
-                # fetch an error if it occurs
-                nonlocal error_state
-                if error_state:
-                    return OConst.ERROR.value
-
-                processelement(element)
-
-            return OConst.OK
+                rest, value = unpack_data(element.type, rest, name=element.name)
+                record[element.name] = value
 
+            data_dict[payload_group.name].append({"payload-status": status, "records": [record]})
 
-        status = processprofile(self.getresponseprofile().getelements())
+        self.rest = rest
 
         # return the status (OK|Error) to decide what to do next and the extracted data
-        return data_dict, status
-
-
+        return data_dict, OConst.OK
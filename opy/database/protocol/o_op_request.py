@@ -17,6 +17,7 @@ import logging
 from opy.common.o_db_model import OSQLPayload, ORecord
 from opy.common.o_db_constants import OOperationType, OConst, OProfileType, ORecordKind
 from opy.common.o_db_exceptions import ProfileNotMatchException
+from opy.common.o_db_logging import debug
 from opy.database.o_db_profile_parser import OProfileParser, OElement, OGroup
 from opy.database.protocol.o_op import OOperation
 
@@ -190,8 +191,8 @@ class OOperationRequestCommand(OOperation):
 
         self.__command_payload = command_payload
 
-    def setasync(self, async:bool):
-        self.__async = async
+    def setasync(self, isasync:bool):
+        self.__async = isasync
 
     def getresponseprofile(self):
         if self.__response_profile is None:
@@ -278,6 +279,7 @@ class OOperationRequestCommand(OOperation):
         data_dict = {}
         error_state = False
         synch_result_type = None
+        prefetched_name = "pre-fetched"
 
         def parserecord(main_dict:dict, rest:bytes, name:str):
             """
@@ -319,16 +321,16 @@ class OOperationRequestCommand(OOperation):
                 if element.name and element.name == "records":
 
                     if synch_result_type == 'n':
-                        logging.debug("parsing null record command response")
+                        debug("parsing null record command response")
                         # null record
                         # do nothing
                         pass
                     elif synch_result_type == 'r':
-                        logging.debug("parsing single record command response")
+                        debug("parsing single record command response")
                         # single record
                         rest = parserecord(main_dict, rest, element.name)
                     elif synch_result_type == 'l':
-                        logging.debug("parsing record list command response")
+                        debug("parsing record list command response")
                         # list of records
                         rest, count = unpack_data(OProfileType.INT, rest, name="count")
 
@@ -336,7 +338,7 @@ class OOperationRequestCommand(OOperation):
                             rest = parserecord(main_dict, rest, element.name)
 
                     elif synch_result_type == 'a':
-                        logging.debug("parsing serialized records command response")
+                        debug("parsing serialized records command response")
 
                         rest, type = unpack_data(OProfileType.STRING, rest, name="type")
 
@@ -345,18 +347,18 @@ class OOperationRequestCommand(OOperation):
                         pass
 
                     if self.__protocol_version > 17:
-                        logging.debug("using new version of command response parsing")
+                        debug("using new version of command response parsing")
+                        # records which the server sends because of the fetch plan are kept apart from the result
+                        main_dict[prefetched_name] = list()
                         while len(rest) > 0:
                             rest, status = unpack_data(OProfileType.BYTE, rest, name="status")
-                            if status > 0:
-                                # read record
-                                length = len(main_dict)
+                            if status == 0:
+                                break
+                            elif status == 2:
+                                rest = parserecord(main_dict, rest, prefetched_name)
+                            else:
                                 rest = parserecord(main_dict, rest, element.name)
 
-                                if len(main_dict) > length and status == 2:
-                                    # do something
-                                    pass
-
                 else:
                     while True:
                         if len(rest) <= 1:
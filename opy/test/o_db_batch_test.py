@@ -0,0 +1,156 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from opy.client.o_db_batch import OBatch
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Create, Vertex, Edge, Update, Set, Where, Condition, toparams
+from opy.common.o_db_constants import OOperationType
+from opy.common.o_db_exceptions import OPyClientException
+from opy.test.model.o_db_test_model import TestCity, TestEdgeOne
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class ScriptClient(object):
+    """
+    Answers every script with the given records
+    """
+    def __init__(self, records:list, parameterized:bool=True):
+        self.records = records
+        self.parameterized = parameterized
+        self.text = None
+        self.params = None
+
+    def newparams(self):
+        return list() if self.parameterized else None
+
+    def script(self, text:str, params:list=None):
+        self.text = text
+        self.params = params
+        return {"success_status": 0, "result": [{"records": self.records}]}
+
+    def hydrate(self, record:dict, clusterid:int, clusterposition:int, clazz=None):
+        return record.get("record-content"), None
+
+
+class OBatchTests(unittest.TestCase):
+    def createcities(self):
+        kassel = TestCity()
+        kassel.name = "Kassel"
+        berlin = TestCity()
+        berlin.name = "Berlin"
+
+        edge = TestEdgeOne()
+        edge.in_vertex = kassel
+        edge.out_vertex = berlin
+
+        return kassel, berlin, edge
+
+    def test_script(self):
+        kassel, berlin, edge = self.createcities()
+
+        batch = OBatch(None, transactional=True, retry=3)
+        batch.add(Create(Vertex(kassel)))
+        batch.add(Create(Vertex(berlin)))
+        batch.add(Create(Edge(edge)))
+        batch.add(Update(TestCity, Set({'name': 'Cassel'}), Where(Condition("name").iseq("Kassel"))))
+
+        self.assertEqual(batch.parse(), "begin\n"
+                                        "let $r0 = create vertex TestCity set name = \"Kassel\"\n"
+                                        "let $r1 = create vertex TestCity set name = \"Berlin\"\n"
+                                        "let $r2 = create edge TestEdgeOne from $r0 to $r1\n"
+                                        "let $r3 = update TestCity  set name = 'Cassel'  where name = 'Kassel'\n"
+                                        "commit retry 3\n"
+                                        "return [first($r0), first($r1), first($r2), first($r3)]")
+
+    def test_results(self):
+        kassel, berlin, edge = self.createcities()
+        records = [{"cluster-id": 12, "cluster-position": 0, "record-version": 1, "record-content": b'x'},
+                   {"cluster-id": 12, "cluster-position": 1, "record-version": 1, "record-content": b'x'},
+                   {"cluster-id": 13, "cluster-position": 0, "record-version": 1, "record-content": b'x'},
+                   {"cluster-id": -2, "cluster-position": 0, "record-version": 0, "record-content": b'count'}]
+
+        with OBatch(ScriptClient(records)) as batch:
+            batch.add(Create(Vertex(kassel)))
+            batch.add(Create(Vertex(berlin)))
+            batch.add(Create(Edge(edge)))
+            batch.add(Update(TestCity, Set({'name': 'Cassel'}), Where(Condition("name").iseq("Kassel"))))
+
+        self.assertEqual(batch.results, [kassel, berlin, edge, b'count'])
+        self.assertEqual(kassel.getRID(), "#12:0")
+        self.assertEqual(edge.getRID(), "#13:0")
+
+    def test_params(self):
+        kassel, berlin, edge = self.createcities()
+        kassel.name = "Kassel' or '1' = '1"
+        client = ScriptClient([{"cluster-id": 12, "cluster-position": 0, "record-version": 1, "record-content": b'x'},
+                               {"cluster-id": 12, "cluster-position": 1, "record-version": 1, "record-content": b'x'}])
+
+        with OBatch(client) as batch:
+            batch.add(Create(Vertex(kassel)))
+            batch.add(Update(TestCity, Set({'name': 'Cassel'}), Where(Condition("name").iseq("Kassel"))))
+
+        # the server binds positional parameters per statement, so the values are named
+        self.assertEqual(client.text, "let $r0 = create vertex TestCity set name = :p0\n"
+                                      "let $r1 = update TestCity  set name = :p1  where name = :p2\n"
+                                      "return [first($r0), first($r1)]")
+        self.assertEqual(toparams(client.params), {'p0': "Kassel' or '1' = '1", 'p1': 'Cassel', 'p2': 'Kassel'})
+
+    def test_positions(self):
+        kassel, berlin, edge = self.createcities()
+        # the update doesn't return a record, the server sends a null record in its place
+        records = [{"cluster-id": 12, "cluster-position": 0, "record-version": 1, "record-content": b'x'},
+                   {},
+                   {"cluster-id": 12, "cluster-position": 1, "record-version": 1, "record-content": b'x'}]
+
+        with OBatch(ScriptClient(records)) as batch:
+            batch.add(Create(Vertex(kassel)))
+            batch.add(Update(TestCity, Set({'name': 'Cassel'}), Where(Condition("name").iseq("Hamburg"))))
+            batch.add(Create(Vertex(berlin)))
+
+        self.assertEqual(batch.results, [kassel, None, berlin])
+        self.assertEqual(berlin.getRID(), "#12:1")
+
+        # results which can't be assigned by their position are rejected
+        batch = OBatch(ScriptClient(records[:1]))
+        batch.add(Create(Vertex(kassel)))
+        batch.add(Create(Vertex(berlin)))
+        self.assertRaises(OPyClientException, batch.send)
+
+    def test_server(self):
+        self.addCleanup(fasttimeouts())
+        kassel, berlin, edge = self.createcities()
+
+        with OFakeServer(recordclass="TestCity") as server:
+            client = OClient("test", "root", "root", *server.address)
+            before = server.requests[OOperationType.REQUEST_COMMAND.value]
+            with client.batch() as batch:
+                batch.add(Create(Vertex(kassel)))
+                batch.add(Update(TestCity, Set({'name': 'Cassel'}), Where(Condition("name").iseq("Kassel"))))
+                batch.add(Create(Vertex(berlin)))
+                batch.add(Create(Edge(edge)))
+
+            self.assertEqual([kassel, None, berlin, edge], batch.results)
+            self.assertEqual(["#9:0", "#9:1", "#9:2"], [kassel.getRID(), berlin.getRID(), edge.getRID()])
+            # a single round trip
+            self.assertEqual(1, server.requests[OOperationType.REQUEST_COMMAND.value] - before)
+            client.close()
+        OClient.schema = None
+
+if __name__ == "__main__":
+    unittest.main()
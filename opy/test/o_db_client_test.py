@@ -15,8 +15,9 @@
 import unittest
 
 from opy.client.o_db_set import Select, Class, Where, Condition, OrderBy, Let, GroupBy, Insert, Create, Vertex, Property, Delete, And, Or, Drop, Edge, Index, Prefixed, Move, Cluster, Traverse, While, \
-    Limit
+    Limit, Update, Set, Param, toparams
 from opy.common.o_db_constants import OBinaryType, OSQLIndexType, OPlainClass
+from opy.common.o_db_exceptions import SQLCommandException
 from opy.test.model.o_db_test_model import TestLocation, TestCoordinates, TestEdgeOne
 
 
@@ -49,6 +50,48 @@ class ODBClientTests(unittest.TestCase):
         query = Select(Prefixed(TestCoordinates, 'l'),["l.a", "l.b"], OrderBy.asc("a"), Where(Condition("l.a").iseq("b"))).parse()
         self.assertEqual(query, "select l.a, l.b from TestCoordinates l  where l.a = 'b'   order by a asc ")
 
+    def test_selectpage(self):
+        query = Select(TestLocation, (), ()).parsepage(None, 100)
+        self.assertEqual(query, "select from TestLocation  order by @rid asc   limit 100 ")
+
+        query = Select(TestLocation, (), Where(Condition("name").iseq("Eddies"))).parsepage("#12:4", 100)
+        self.assertEqual(query, "select from TestLocation  where @rid > #12:4 and ( name = 'Eddies' )   order by @rid asc   limit 100 ")
+
+        # the rid is the first parameter
+        params = list()
+        query = Select(TestLocation, (), Where(Condition("name").iseq("Eddies"))).parsepage((12, 4), 100, params)
+        self.assertEqual(query, "select from TestLocation  where @rid > ? and ( name = ? )   order by @rid asc   limit 100 ")
+        self.assertEqual(params, [(12, 4), 'Eddies'])
+
+        select = Select(TestLocation, (), OrderBy.asc("name"))
+        self.assertRaises(SQLCommandException, select.parsepage, None, 100)
+
+    def test_params(self):
+        params = list()
+        query = Select(TestLocation, (), Where(Or(Condition("name").iseq("Eddies"), Condition("type").iseq(Param("type", "Pizzeria")))), Limit(5)).parse(params)
+        self.assertEqual(query, "select from TestLocation  where  ( name = ?  or type = :type  )    limit 5 ")
+        self.assertEqual(toparams(params), {'0': 'Eddies', 'type': 'Pizzeria'})
+
+        params = list()
+        query = Update(TestLocation, Set({'name': 'Eddies'}), Where(Condition("type").iseq(1))).parse(params)
+        self.assertEqual(query, "update TestLocation  set name = ?  where type = ? ")
+        self.assertEqual(params, ['Eddies', 1])
+
+    def test_compile(self):
+        template = Select(TestLocation, (), Where(And(Condition("name").iseq(Param("name")), Condition("type").iseq("Pizzeria")))).compile()
+        self.assertEqual(template.text, "select from TestLocation  where  ( name = :name  and type = ?  )  ")
+
+        params = list()
+        query = template.bind(name="Eddies").parse(params)
+        self.assertEqual(query, template.text)
+        self.assertEqual(toparams(params), {'name': 'Eddies', '0': 'Pizzeria'})
+
+        params = list()
+        template.bind("Bar", name="Eddies").parse(params)
+        self.assertEqual(toparams(params), {'name': 'Eddies', '0': 'Bar'})
+
+        self.assertRaises(SQLCommandException, template.bind)
+
     def test_orderby(self):
         query = str(OrderBy("a"))
         self.assertEqual(query, " order by a asc ")
@@ -0,0 +1,85 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select, Update, Set, Create, Vertex
+from opy.common.o_db_constants import OOperationType
+from opy.test.model.o_db_test_model import TestCity, TestLocation
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OFakeServerTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+        self.server = OFakeServer(recordclass="TestCity", recordsize=20, resultsize=3).start()
+        self.client = OClient("test", "root", "root", *self.server.address)
+        # commands sent while connecting (i.e. reading the schema)
+        self.commands = self.server.requests.get(OOperationType.REQUEST_COMMAND.value, 0)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_select(self):
+        result = self.client.fetch(Select(TestCity, (), ()))
+        result.pop("rest")
+
+        self.assertEqual(['#9:0', '#9:1', '#9:2'], sorted(result))
+        self.assertEqual("x" * 20, result['#9:1'].name)
+
+        # records which aren't cached are loaded by record load requests
+        loaded = self.client.load(["#9:7"])
+        self.assertEqual("x" * 20, loaded[0].name)
+        self.assertEqual(1, self.server.requests[OOperationType.REQUEST_RECORD_LOAD.value])
+
+    def test_conflict(self):
+        city = TestCity()
+        city.name = "Kassel"
+        with self.client.session() as session:
+            session.add(city)
+
+        self.assertEqual((9, 0), (city.clusterid, city.clusterposition))
+        self.assertEqual(1, city.version)
+
+        # somebody else updates the record in the meantime
+        self.server.update(9, 0, -1)
+
+        with self.client.session() as session:
+            session.attach(city)
+            city.name = "Berlin"
+
+        # the first commit failed, the second one has been sent with the refreshed version
+        self.assertEqual(3, self.server.requests[OOperationType.REQUEST_TX_COMMIT.value])
+        self.assertEqual(3, city.version)
+        self.assertIn(b'Berlin', self.server.records[(9, 0)][1])
+
+    def test_null_values(self):
+        # null values are sent as null entries of the serialized parameters
+        result = self.client.update(Update(TestCity, Set({'name': None})))
+        self.assertIsNotNone(result)
+
+        location = TestLocation()
+        location.name = "Kassel"
+        result = self.client.create(Create(Vertex(location)).type)
+        self.assertIsNotNone(result)
+
+        self.assertEqual(2, self.server.requests[OOperationType.REQUEST_COMMAND.value] - self.commands)
+
+if __name__ == "__main__":
+    unittest.main()
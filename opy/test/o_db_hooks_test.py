@@ -0,0 +1,93 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select
+from opy.common.o_db_constants import OOperationType
+from opy.common.o_db_hooks import OHooks
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OHooksTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OHooks.clear()
+        OClient.schema = None
+
+    def test_register(self):
+        self.assertFalse(OHooks.active)
+        self.assertIsNone(OHooks.start("send", size=1))
+
+        hook = OHooks.register("send", end=lambda point, info, duration, context: None)
+        self.assertTrue(OHooks.active)
+        self.assertIsNone(OHooks.start("receive"))
+
+        OHooks.unregister(hook)
+        self.assertFalse(OHooks.active)
+
+        with self.assertRaises(ValueError):
+            OHooks.register("unknown")
+
+    def test_trace(self):
+        calls = list()
+
+        def start(point, info):
+            calls.append(("start", point))
+            return point.upper()
+
+        def end(point, info, duration, context):
+            self.assertGreaterEqual(duration, 0)
+            calls.append(("end", point, context, dict(info)))
+
+        def failing(point, info):
+            raise RuntimeError("broken hook")
+
+        for point in OHooks.points:
+            OHooks.register(point, start, end)
+        # a failing hook mustn't break the driver
+        OHooks.register("decode", failing)
+
+        with OFakeServer(recordclass="TestCity", resultsize=5) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            calls.clear()
+            result = client.fetch(Select(TestCity, (), ()))
+
+        self.assertIn("#9:4", result)
+        self.assertEqual([("start", "send"), ("end", "send"), ("start", "receive"), ("end", "receive"),
+                          ("start", "decode"), ("end", "decode")], [call[:2] for call in calls[:6]])
+
+        send = calls[1]
+        self.assertEqual("SEND", send[2])
+        self.assertEqual(OOperationType.REQUEST_COMMAND.value, send[3]["operation"])
+        self.assertGreater(calls[3][3]["size"], 0)
+
+        hydrated = [call for call in calls if call[:2] == ("end", "hydrate")]
+        self.assertEqual(5, len(hydrated))
+        self.assertIn((9, 4), [call[3]["rid"] for call in hydrated])
+
+        deserialized = [call for call in calls if call[:2] == ("end", "deserialize")]
+        self.assertEqual(["TestCity"] * 5, [call[3]["class_name"] for call in deserialized])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import time
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_resultcache import OResultCache
+from opy.client.o_db_set import Select
+from opy.common.o_db_constants import OTXOperationType
+from opy.database.o_db_push import pushrecord, splitpushes
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OLiveQueryTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+        OClient.resultcache = None
+
+    def test_splitpushes(self):
+        first = pushrecord(OTXOperationType.UPDATES.value, 1, 2, 9, 0, b'\x00\x02V')
+        second = pushrecord(OTXOperationType.DELETE.value, 1, 3, 9, 1)
+        response = b'\x00\x00\x00\x00\x01'
+
+        pushes, data, pending = splitpushes(first + second + response)
+        self.assertEqual([(1, 9, 0, b'\x00\x02V'), (2, 9, 1, None)],
+                         [(push.operation, push.cluster_id, push.cluster_position, push.content) for push in pushes])
+        self.assertEqual(response, data)
+        self.assertEqual(b'', pending)
+
+        # incomplete messages are kept until the rest has been received
+        pushes, data, pending = splitpushes(first[:-2])
+        self.assertEqual(([], b'', first[:-2]), (pushes, data, pending))
+
+    def test_live(self):
+        OClient.resultcache = OResultCache()
+
+        with OFakeServer(recordclass="TestCity", resultsize=2) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            writer = OClient("test", "root", "root", *server.address)
+
+            events = list()
+            received = threading.Event()
+
+            def callback(event):
+                events.append(event)
+                if len(events) == 2:
+                    received.set()
+
+            with client.live() as live:
+                token = live.subscribe(Select(TestCity, (), ()), callback)
+                self.assertEqual([token], live.tokens())
+
+                fetched = client.fetch(Select(TestCity, (), ()))
+                self.assertEqual(1, len(OClient.resultcache))
+
+                city = TestCity()
+                city.name = "Kassel"
+                writer.save(city)
+
+                stored = client.load(["#{}:{}".format(city.clusterid, city.clusterposition)])
+                self.assertEqual(1, len(stored))
+
+                # with loaded edges the vertex is updated by a record update
+                city.out_edges = dict()
+                city.in_edges = dict()
+                city.name = "Berlin"
+                writer.save(city)
+
+                self.assertTrue(received.wait(5))
+
+        created, updated = events
+        self.assertEqual((OTXOperationType.CREATIONS.value, token), (created.operation, created.token))
+        self.assertEqual((OTXOperationType.UPDATES.value, 2), (updated.operation, updated.version))
+        self.assertEqual("Berlin", updated.object.name)
+
+        # the cached object has been refreshed and the cached results invalidated
+        self.assertEqual("Berlin", client.cache[(city.clusterid, city.clusterposition)].name)
+        self.assertEqual(0, len(OClient.resultcache))
+        self.assertIn('#9:0', fetched)
+
+    def test_disconnect(self):
+        with OFakeServer(recordclass="TestCity") as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+
+            with client.live() as live:
+                live.subscribe(Select(TestCity, (), ()))
+                self.assertTrue(live.isrunning())
+
+                server.disconnect()
+
+                # the reader stops instead of polling the closed connection over and over
+                deadline = time.time() + 5
+                while live.isrunning() and time.time() < deadline:
+                    time.sleep(0.05)
+
+                self.assertFalse(live.isrunning())
+                self.assertEqual([], live.tokens())
+
+if __name__ == "__main__":
+    unittest.main()
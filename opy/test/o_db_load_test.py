@@ -0,0 +1,100 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import struct
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.common.o_db_constants import OOperationType, ODBType
+from opy.database.o_db_codec import OCodec
+from opy.database.o_db_connection import OConnection
+from opy.database.o_db_ops import ODB
+from opy.database.protocol.o_op_record import OOperationRecordLoad
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts, document, record
+
+
+__author__ = 'daill'
+
+
+class OLoadTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def createcities(self, server, names):
+        for name in names:
+            server.create(9, document("TestCity", {"name": name}))
+
+    def test_decode(self):
+        head = struct.pack(">bi", 0, 1)
+        requested = b'\x01' + b'd' + struct.pack(">i", 3) + struct.pack(">i", 3) + b'abc'
+        prefetched = b'\x02' + record(9, 4, 2, b'de')
+
+        codec = OCodec()
+        operation = OOperationRecordLoad()
+        result = codec.decode(operation, head + requested + prefetched + b'\x00' + b'next')
+
+        payload = result["payload"]
+        self.assertEqual([1, 2], [entry["payload-status"] for entry in payload])
+        self.assertEqual((3, b'abc'), (payload[0]["records"][0]["record-version"], payload[0]["records"][0]["record-content"]))
+        self.assertEqual((9, 4, b'de'), (payload[1]["records"][0]["cluster-id"], payload[1]["records"][0]["cluster-position"],
+                                         payload[1]["records"][0]["record-content"]))
+        self.assertTrue(operation.complete)
+        self.assertEqual(b'next', operation.rest)
+
+        # without the end of the payload the response hasn't been received completely
+        codec.decode(operation, head + requested)
+        self.assertFalse(operation.complete)
+
+    def test_recordloadmany(self):
+        with OFakeServer(recordclass="TestCity", latency=0.1) as server:
+            self.createcities(server, ["A", "B", "C"])
+
+            connection = OConnection(*server.address)
+            odb = ODB()
+            odb.connect(connection, user_name="root", user_password="root")
+            odb.dbopen(connection, database_name="test", database_type=ODBType.GRAPH.value, user_name="root", user_password="root")
+
+            # the responses arrive one after another, slower than a single read waits for them
+            responses = odb.recordloadmany(connection, [(9, 2), (9, 0), (9, 1)], fetch_plan="", ignore_cache=0, load_tombstones=0)
+
+            contents = [response["payload"][0]["records"][0]["record-content"] for response in responses]
+            self.assertEqual([b'C', b'A', b'B'], [content[-1:] for content in contents])
+            odb.dbclose(connection)
+
+    def test_load(self):
+        with OFakeServer(recordclass="TestCity", latency=0.1) as server:
+            self.createcities(server, ["A", "B", "C", "D", "E"])
+
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+
+            loaded = client.load(["#9:2", (9, 0), "#9:2", "#9:1"])
+            self.assertEqual(["C", "A", "C", "B"], [city.name for city in loaded])
+            # every record is loaded once
+            self.assertIs(loaded[0], loaded[2])
+            self.assertEqual(3, server.requests[OOperationType.REQUEST_RECORD_LOAD.value])
+
+            # cached records aren't loaded again and the stream is still in sync
+            loaded = client.load([(9, 0), "#9:3", "#9:4"])
+            self.assertEqual(["A", "D", "E"], [city.name for city in loaded])
+            self.assertEqual([(9, 3), (9, 4)], [(city.clusterid, city.clusterposition) for city in loaded[1:]])
+            self.assertEqual(5, server.requests[OOperationType.REQUEST_RECORD_LOAD.value])
+
+if __name__ == "__main__":
+    unittest.main()
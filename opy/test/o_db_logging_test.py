@@ -0,0 +1,58 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import unittest
+
+from opy.common.o_db_logging import OLogging, debug, logger
+
+
+__author__ = 'daill'
+
+
+class Unprintable(object):
+    def __str__(self):
+        raise AssertionError("formatted although debug is disabled")
+
+
+class OLoggingTests(unittest.TestCase):
+    def tearDown(self):
+        OLogging.configure(logging.NOTSET, False)
+
+    def test_disabled(self):
+        OLogging.configure(logging.INFO)
+        self.assertFalse(OLogging.enabled)
+
+        with self.assertLogs(logger, logging.INFO) as logs:
+            debug("value %s", Unprintable())
+            logger.info("marker")
+        self.assertEqual(["INFO:opy:marker"], logs.output)
+
+    def test_structured(self):
+        OLogging.configure(logging.DEBUG, True)
+        self.assertTrue(OLogging.enabled)
+
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            debug("read %s bytes", 3, data=b'abc')
+        self.assertEqual("read 3 bytes", logs.records[0].getMessage())
+        self.assertEqual({"data": b'abc'}, logs.records[0].opy)
+
+        OLogging.configure(structured=False)
+        with self.assertLogs(logger, logging.DEBUG) as logs:
+            debug("read %s bytes", 3, data=b'abc')
+        self.assertFalse(hasattr(logs.records[0], "opy"))
+
+if __name__ == "__main__":
+    unittest.main()
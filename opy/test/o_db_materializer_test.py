@@ -0,0 +1,162 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from opy.client.o_db_materializer import OGraphMaterializer
+from opy.common.o_db_model import ORid
+from opy.database.o_db_codec import OCodec
+from opy.test.model.o_db_test_model import TestCity, TestEdgeOne, TestLocation
+
+
+__author__ = 'daill'
+
+
+class OGraphMaterializerTests(unittest.TestCase):
+    def createedge(self, rid):
+        edge = TestEdgeOne()
+        edge.tmp_rid = rid
+        edge.in_vertex = None
+        edge.out_vertex = None
+        return edge
+
+    def createcity(self, clusterid, clusterposition):
+        city = TestCity()
+        city.setRID(clusterid, clusterposition)
+        city.in_edges = dict()
+        city.out_edges = dict()
+        return city
+
+    def test_vertex_edges(self):
+        kassel = self.createcity(12, 0)
+        berlin = self.createcity(12, 1)
+
+        # lightweight edge, the ridbag entry points to the other vertex
+        edge = self.createedge((12, 1))
+        kassel.out_edges = {'TestEdgeOne': [edge]}
+
+        materializer = OGraphMaterializer()
+        materializer.add(kassel)
+        materializer.add(berlin)
+        unresolved = materializer.materialize()
+
+        self.assertEqual(unresolved, [])
+        self.assertIs(edge.out_vertex, kassel)
+        self.assertIs(edge.in_vertex, berlin)
+
+    def test_prefetched_edges(self):
+        kassel = self.createcity(12, 0)
+        berlin = self.createcity(12, 1)
+
+        # the ridbag entries point to the edge record
+        outgoing = self.createedge((13, 0))
+        kassel.out_edges = {'TestEdgeOne': [outgoing]}
+        incoming = self.createedge((13, 0))
+        berlin.in_edges = {'TestEdgeOne': [incoming]}
+
+        record = self.createedge({'out': (12, 0), 'in': (12, 1)})
+        record.setRID(13, 0)
+
+        materializer = OGraphMaterializer()
+        materializer.addall({'#12:0': kassel, '#12:1': berlin, '#13:0': record})
+        unresolved = materializer.materialize()
+
+        self.assertEqual(unresolved, [])
+        self.assertIs(outgoing.out_vertex, kassel)
+        self.assertIs(outgoing.in_vertex, berlin)
+        self.assertIs(incoming.out_vertex, kassel)
+        self.assertIs(incoming.in_vertex, berlin)
+        self.assertEqual((13, 0), (outgoing.clusterid, outgoing.clusterposition))
+
+    def test_edge_record(self):
+        kassel = self.createcity(12, 0)
+        berlin = self.createcity(12, 1)
+
+        edge = self.createedge({'out': (12, 0), 'in': (12, 1)})
+        edge.setRID(13, 0)
+
+        materializer = OGraphMaterializer()
+        materializer.addall({'#12:0': kassel, '#12:1': berlin, '#13:0': edge})
+        materializer.materialize()
+
+        self.assertIs(edge.out_vertex, kassel)
+        self.assertIs(edge.in_vertex, berlin)
+
+    def test_unresolved(self):
+        kassel = self.createcity(12, 0)
+        edge = self.createedge((12, 5))
+        kassel.in_edges = {'TestEdgeOne': [[edge]]}
+
+        materializer = OGraphMaterializer()
+        materializer.add(kassel)
+        unresolved = materializer.materialize()
+
+        self.assertEqual(unresolved, ['#12:5'])
+
+        # loading the missing edge record afterwards leads to its out vertex
+        record = self.createedge({'out': (12, 6), 'in': (12, 0)})
+        record.setRID(12, 5)
+        materializer.addall({'#12:5': record})
+        self.assertEqual(materializer.unresolved(), ['#12:6'])
+
+        loaded = self.createcity(12, 6)
+        materializer.addall({'#12:6': loaded})
+
+        self.assertEqual(materializer.unresolved(), [])
+        self.assertIs(edge.out_vertex, loaded)
+        self.assertIs(edge.in_vertex, kassel)
+
+    def test_links(self):
+        kassel = self.createcity(12, 0)
+        berlin = self.createcity(12, 1)
+
+        location = TestLocation()
+        location.setRID(14, 0)
+        location.city = ORid(12, 0)
+        location.coordinates = [ORid(12, 1), ORid(12, 7)]
+        # uuids are decoded as pairs as well
+        location.name = (12, 1)
+
+        materializer = OGraphMaterializer()
+        materializer.add(location)
+        materializer.add(kassel)
+        materializer.add(berlin)
+        unresolved = materializer.materialize(links=True)
+
+        self.assertIs(location.city, kassel)
+        self.assertIs(location.coordinates[0], berlin)
+        self.assertEqual(location.name, (12, 1))
+        self.assertEqual(unresolved, ['#12:7'])
+
+    def test_uuids(self):
+        location = TestLocation()
+        location.setRID(14, 0)
+        location.name = None
+        location.city = (-4962768465676381896, -5478092437153935734)
+        location.coordinates = [(1, 2)]
+
+        materializer = OGraphMaterializer()
+        materializer.add(location)
+
+        self.assertEqual(materializer.materialize(links=True), [])
+        self.assertEqual(location.coordinates, [(1, 2)])
+
+        # links are typed by the codec
+        codec = OCodec()
+        rid, _ = codec.readlink(codec.writelink((12, 0)))
+        self.assertIsInstance(rid, ORid)
+        self.assertEqual(rid, (12, 0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select
+from opy.common.o_db_constants import OOperationType
+from opy.database.o_db_metrics import OHistogram, OMetrics
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def test_histogram(self):
+        histogram = OHistogram((1, 10, 100))
+        for value in (0.5, 1, 5, 50, 500):
+            histogram.observe(value)
+
+        self.assertEqual([(1, 2), (10, 3), (100, 4), (float("inf"), 5)], histogram.cumulative())
+        self.assertEqual(556.5, histogram.sum)
+        self.assertEqual(5, histogram.count)
+
+    def test_aggregation(self):
+        aggregated = OMetrics()
+        first = OMetrics(aggregated)
+        second = OMetrics(aggregated)
+
+        first.increment(OOperationType.REQUEST_COMMAND.value, "requests")
+        second.increment(OOperationType.REQUEST_COMMAND.value, "requests", 2)
+        second.observe(OOperationType.REQUEST_RECORD_LOAD.value, "response", 100)
+
+        self.assertEqual(1, first.snapshot()["REQUEST_COMMAND"]["requests"])
+        self.assertEqual(3, aggregated.snapshot()["REQUEST_COMMAND"]["requests"])
+        self.assertEqual(1, aggregated.snapshot()["REQUEST_RECORD_LOAD"]["response"]["count"])
+
+        text = aggregated.prometheus({"client": "test"})
+        self.assertIn('opy_requests_total{operation="REQUEST_COMMAND",client="test"} 3', text)
+        self.assertIn('opy_response_bytes_bucket{operation="REQUEST_RECORD_LOAD",client="test",le="256"} 1', text)
+        self.assertIn('opy_response_bytes_count{operation="REQUEST_RECORD_LOAD",client="test"} 1', text)
+
+    def test_client(self):
+        with OFakeServer(recordclass="TestCity", resultsize=5) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            client.fetch(Select(TestCity, (), ()))
+
+            command = client.metrics().snapshot()["REQUEST_COMMAND"]
+            # two schema queries and the select
+            self.assertEqual(3, command["requests"])
+            self.assertEqual(3, command["wait"]["count"])
+            self.assertEqual(3, command["decode"]["count"])
+            # the schema and the five cities
+            self.assertEqual(6, command["hydrate"]["count"])
+            self.assertGreater(command["response"]["sum"], 0)
+            self.assertNotIn("errors", command)
+
+            self.assertGreaterEqual(client.metrics(aggregated=True).snapshot()["REQUEST_COMMAND"]["requests"], 3)
+
+if __name__ == "__main__":
+    unittest.main()
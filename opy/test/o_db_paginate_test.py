@@ -0,0 +1,77 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select
+from opy.common.o_db_constants import OOperationType
+from opy.common.o_db_exceptions import OPyClientException
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts, document
+
+
+__author__ = 'daill'
+
+
+class OPaginateTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+        self.server = OFakeServer(recordclass="TestCity")
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        for i in range(7):
+            self.server.create(9, document("TestCity", {"name": "c{}".format(i)}))
+
+        self.client = OClient("test", "root", "root", *self.server.address)
+
+    def tearDown(self):
+        self.client.close()
+        OClient.schema = None
+        OClient.parameterized = True
+
+    def test_paginate(self):
+        command = OOperationType.REQUEST_COMMAND.value
+        before = self.server.requests[command]
+
+        cities = list(self.client.paginate(Select(TestCity, (), ()), pagesize=3))
+
+        self.assertEqual(["c{}".format(i) for i in range(7)], [city.name for city in cities])
+        self.assertEqual([(9, i) for i in range(7)], [(city.clusterid, city.clusterposition) for city in cities])
+        # three pages, the last one isn't full
+        self.assertEqual(3, self.server.requests[command] - before)
+
+    def test_prefetch(self):
+        cities = list(self.client.paginate(Select(TestCity, (), ()), pagesize=2, prefetch=True))
+        self.assertEqual(["c{}".format(i) for i in range(7)], [city.name for city in cities])
+
+    def test_inline(self):
+        # without parameters the rid is written into the query
+        OClient.parameterized = False
+        cities = list(self.client.paginate(Select(TestCity, (), ()), pagesize=4))
+        self.assertEqual(7, len(cities))
+
+    def test_stuck(self):
+        # a server ignoring the rid condition returns the first page again and again
+        self.server.bounds = lambda text, params=None: []
+
+        pages = self.client.paginate(Select(TestCity, (), ()), pagesize=3)
+        with self.assertRaises(OPyClientException):
+            for _ in range(10):
+                next(pages)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+
+from opy.client.o_db_batch import OBatch
+from opy.client.o_db_planner import OGraphPlanner, isnew
+from opy.common.o_db_model import ORid
+from opy.database.o_db_codec import OCodec
+from opy.database.protocol.o_op_record import OOperationRecordCreate, OOperationRecordUpdate
+from opy.test.model.o_db_test_model import TestCity, TestEdgeOne
+
+
+__author__ = 'daill'
+
+
+class CreateClient(object):
+    """
+    Answers every script with one new record per statement
+    """
+    def __init__(self):
+        self.scripts = list()
+        self.position = 0
+
+    def newparams(self):
+        # the values are written into the scripts
+        return None
+
+    def script(self, text:str, params:list=None):
+        self.scripts.append(text)
+        records = list()
+        for line in text.splitlines():
+            if line.startswith("let "):
+                records.append({"cluster-id": 12, "cluster-position": self.position, "record-version": 1,
+                                "record-content": b""})
+                self.position += 1
+        return {"success_status": 0, "result": [{"records": records}]}
+
+
+class OGraphPlannerTests(unittest.TestCase):
+    def createcity(self, name):
+        city = TestCity()
+        city.name = name
+        city.clusterid = None
+        city.clusterposition = None
+        return city
+
+    def connect(self, source, target):
+        edge = TestEdgeOne()
+        edge.clusterid = None
+        edge.clusterposition = None
+        edge.in_vertex = source
+        edge.out_vertex = target
+        for vertex, name in ((source, 'out_edges'), (target, 'in_edges')):
+            edges = getattr(vertex, name, None) or dict()
+            edges.setdefault('TestEdgeOne', list()).append(edge)
+            # don't use the property, it would rewire the edge
+            setattr(vertex, '_BaseVertex__{}'.format(name), edges)
+        return edge
+
+    def test_cycle(self):
+        kassel = self.createcity("Kassel")
+        berlin = self.createcity("Berlin")
+        hamburg = self.createcity("Hamburg")
+
+        edges = [self.connect(kassel, berlin), self.connect(berlin, hamburg), self.connect(hamburg, kassel)]
+
+        planner = OGraphPlanner()
+        planner.add(kassel, berlin)
+
+        # every vertex and edge is planned once, vertices first
+        self.assertEqual(len(planner.vertices), 3)
+        self.assertEqual(len(planner.edges), 3)
+        self.assertEqual({id(edge) for edge in planner.edges}, {id(edge) for edge in edges})
+
+        queries = list(planner.queries())
+        self.assertTrue(all(query.type.__class__.__name__ == "Vertex" for query in queries[:3]))
+        self.assertTrue(all(query.type.__class__.__name__ == "Edge" for query in queries[3:]))
+
+    def test_persisted(self):
+        kassel = self.createcity("Kassel")
+        berlin = self.createcity("Berlin")
+        berlin.setRID(12, 1)
+
+        old = self.connect(berlin, self.createcity("Hamburg"))
+        old.setRID(13, 0)
+        self.connect(kassel, berlin)
+
+        planner = OGraphPlanner()
+        planner.add(kassel)
+
+        # berlin is only used as endpoint and its persisted edge isn't followed
+        self.assertEqual(planner.vertices, [kassel])
+        self.assertEqual(len(planner.edges), 1)
+
+    def test_stubs(self):
+        # berlin has been loaded, the edges of its ridbags only know their rids
+        berlin = self.createcity("Berlin")
+        berlin.setRID(12, 1)
+        stub = TestEdgeOne()
+        stub.clusterid = None
+        stub.clusterposition = None
+        stub.tmp_rid = ORid(13, 0)
+        setattr(berlin, '_BaseVertex__out_edges', {'TestEdgeOne': [stub]})
+        setattr(berlin, '_BaseVertex__in_edges', dict())
+
+        kassel = self.createcity("Kassel")
+        edge = self.connect(kassel, berlin)
+
+        planner = OGraphPlanner()
+        planner.add(berlin, kassel)
+
+        # the stub mustn't be created again
+        self.assertEqual(planner.vertices, [kassel])
+        self.assertEqual(planner.edges, [edge])
+        self.assertFalse(isnew(stub))
+        self.assertFalse(isnew(ORid(12, 1)))
+
+    def test_batches(self):
+        kassel = self.createcity("Kassel")
+        berlin = self.createcity("Berlin")
+        edge = self.connect(kassel, berlin)
+
+        planner = OGraphPlanner()
+        planner.add(kassel)
+
+        client = CreateClient()
+        for queries in planner.batches(2):
+            with OBatch(client, transactional=True) as batch:
+                for query in queries:
+                    batch.add(query)
+
+        self.assertEqual(len(client.scripts), 2)
+        # the edge of the second batch refers to the vertices created by the first one
+        self.assertIn("from #12:0 to #12:1", client.scripts[1])
+        self.assertEqual((edge.clusterid, edge.clusterposition), (12, 2))
+
+    def test_edges(self):
+        kassel = self.createcity("Kassel")
+        berlin = self.createcity("Berlin")
+        edge = self.connect(kassel, berlin)
+
+        planner = OGraphPlanner()
+        planner.add(edge)
+
+        # vertices created by record requests aren't part of the queries
+        kassel.setRID(12, 0)
+        berlin.setRID(12, 1)
+        queries = list(planner.queries(vertices=False))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(queries[0].type.parse(), "create edge TestEdgeOne from #12:0 to #12:1")
+        self.assertEqual({id(vertex) for vertex in planner.endpoints()}, {id(kassel), id(berlin)})
+
+    def test_pipelined(self):
+        # the responses of pipelined record requests arrive as one chunk of bytes
+        codec = OCodec()
+        data = struct.pack(">bihqii", 0, 5, 12, 3, 1, 0) + struct.pack(">bihqii", 0, 5, 12, 4, 1, 0)
+
+        first = OOperationRecordCreate()
+        self.assertEqual(codec.decode(first, data)["cluster-position"], 3)
+        self.assertEqual(codec.decode(OOperationRecordCreate(), first.rest)["cluster-position"], 4)
+
+        data = struct.pack(">biii", 0, 5, 7, 0) + struct.pack(">biii", 0, 5, 9, 0)
+        first = OOperationRecordUpdate()
+        self.assertEqual(codec.decode(first, data)["record-version"], 7)
+        self.assertEqual(codec.decode(OOperationRecordUpdate(), first.rest)["record-version"], 9)
+
+if __name__ == "__main__":
+    unittest.main()
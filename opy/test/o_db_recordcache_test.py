@@ -0,0 +1,76 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_recordcache import ORecordCache
+from opy.common.o_db_constants import OOperationType
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts, document
+
+
+__author__ = 'daill'
+
+
+class ORecordCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+        OClient.cachesize = 10000
+
+    def test_eviction(self):
+        cache = ORecordCache(maxsize=2)
+        cache[(9, 0)] = "a"
+        cache[(9, 1)] = "b"
+        cache.get((9, 0))
+        cache[(9, 2)] = "c"
+
+        # #9:1 has been used least recently
+        self.assertNotIn((9, 1), cache)
+        self.assertEqual(["a", "c"], cache.values())
+
+        cache.update({(9, 3): "d"})
+        self.assertEqual([(9, 2), (9, 3)], list(cache))
+        self.assertEqual("c", cache.pop((9, 2)))
+        self.assertEqual(1, len(cache))
+
+    def test_unbounded(self):
+        cache = ORecordCache(maxsize=None)
+        cache.update({(9, i): i for i in range(100)})
+        self.assertEqual(100, len(cache))
+
+    def test_load(self):
+        OClient.cachesize = 2
+        with OFakeServer(recordclass="TestCity") as server:
+            for name in ["A", "B", "C"]:
+                server.create(9, document("TestCity", {"name": name}))
+
+            client = OClient("test", "root", "root", *server.address)
+
+            # more records than the cache can take are still returned
+            loaded = client.load(["#9:0", "#9:1", "#9:2"])
+            self.assertEqual(["A", "B", "C"], [city.name for city in loaded])
+            self.assertEqual([(9, 1), (9, 2)], list(client.cache))
+
+            # the cached record isn't loaded again
+            loaded = client.load(["#9:2", "#9:0"])
+            self.assertEqual(["C", "A"], [city.name for city in loaded])
+            self.assertEqual(4, server.requests[OOperationType.REQUEST_RECORD_LOAD.value])
+            self.assertEqual([(9, 2), (9, 0)], list(client.cache))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import struct
+import tempfile
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select
+from opy.common.o_db_exceptions import ReplayException
+from opy.database.o_db_recorder import ORecorder, OReplayConnection, ORecordingEntry, readrecording
+from opy.database.protocol.o_op_record import OOperationRecordLoad
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class ORecorderTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+        handle, self.path = tempfile.mkstemp(suffix=".rec")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+        OClient.schema = None
+
+    def test_replay(self):
+        with OFakeServer(recordclass="TestCity", resultsize=5) as server:
+            with ORecorder(self.path) as recorder:
+                OClient.schema = None
+                client = OClient("test", "root", "root", *server.address, recorder=recorder)
+                recorded = client.fetch(Select(TestCity, (), ()))
+
+        entries = list(readrecording(self.path))
+        # handshake, connect, db open, two schema queries and the select
+        self.assertEqual([0, 2, 3, 41, 41, 41], [entry.operation_type for entry in entries])
+        self.assertTrue(all(entry.sent <= entry.received for entry in entries))
+
+        # the replayed session has to send the same requests
+        OClient.schema = None
+        connection = OReplayConnection(self.path, strict=True)
+        client = OClient("test", "root", "root", connection=connection)
+        replayed = client.fetch(Select(TestCity, (), ()))
+
+        self.assertEqual(sorted(recorded), sorted(replayed))
+        self.assertEqual(recorded['#9:4'].name, replayed['#9:4'].name)
+        self.assertEqual(0, connection.remaining())
+
+    def test_mismatch(self):
+        handshake = ORecordingEntry(0, 0.0, 0.0, b'', struct.pack(">h", 28))
+        command = ORecordingEntry(41, 0.0, 0.0, b'\x29\xff\xff\xff\xff', b'')
+
+        connection = OReplayConnection([handshake, command])
+        self.assertEqual(28, connection.protocol_version)
+
+        data = {"cluster-id": 9, "cluster-position": 0, "fetch-plan": "", "ignore-cache": 0, "load-tombstones": 0}
+        with self.assertRaises(ReplayException):
+            connection.exec(OOperationRecordLoad(), data)
+
+        # the recording is exhausted
+        with self.assertRaises(ReplayException):
+            connection.exec(OOperationRecordLoad(), data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_resultcache import OResultCache, normalise, writetargets
+from opy.client.o_db_set import Select
+from opy.common.o_db_constants import OOperationType
+from opy.test.model.o_db_test_model import TestCity, TestLocation
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+        OClient.resultcache = None
+
+    def test_normalise(self):
+        self.assertEqual("select from V where name = 'a  b'", normalise("  select  from\nV where name = 'a  b' "))
+        self.assertEqual(OResultCache.key("select from V", "*:1", [1]), OResultCache.key("select  from V", "*:1", [1]))
+        self.assertNotEqual(OResultCache.key("select from V", "", [1]), OResultCache.key("select from V", "", [2]))
+
+    def test_writetargets(self):
+        self.assertEqual(set(), writetargets("select from TestCity"))
+        self.assertEqual({"TestCity"}, writetargets("update TestCity set name = 'x'"))
+        self.assertEqual({(9, 1)}, writetargets("update #9:1  set name = ?"))
+        self.assertEqual({"TestCity", "TestLocation"},
+                         writetargets("begin\nlet $r0 = create vertex TestCity content {}\n"
+                                      "let $r1 = create vertex TestLocation content {}\ncommit"))
+        self.assertIsNone(writetargets("create edge TestEdgeOne from #9:0 to #9:1"))
+        self.assertIsNone(writetargets("delete vertex from (select from V)"))
+        self.assertIsNone(writetargets("alter class TestCity strictmode true"))
+
+    def test_eviction(self):
+        cache = OResultCache(maxbytes=100)
+        cache.put(("a",), {"a": 1}, 40, "A")
+        cache.put(("b",), {"b": 1}, 40, "B")
+        cache.get(("a",))
+        cache.put(("c",), {"c": 1}, 40, "C")
+
+        # b has been used least recently
+        self.assertIsNone(cache.get(("b",)))
+        self.assertEqual({"a": 1}, cache.get(("a",)))
+        self.assertEqual(80, cache.size)
+
+        cache.put(("d",), {"d": 1}, 101, "D")
+        self.assertIsNone(cache.get(("d",)))
+
+        cache.invalidate({"A"})
+        self.assertIsNone(cache.get(("a",)))
+        self.assertEqual(1, len(cache))
+
+        expired = OResultCache(ttl=0)
+        expired.put(("a",), {"a": 1}, 1)
+        self.assertIsNone(expired.get(("a",)))
+        self.assertEqual(0, expired.size)
+
+    def test_fetch(self):
+        OClient.resultcache = OResultCache()
+
+        with OFakeServer(recordclass="TestCity", resultsize=3) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            OClient.schema.classes = {"V": {"superClass": None, "clusterIds": [9]},
+                                      "TestCity": {"superClass": "V", "clusterIds": [11]},
+                                      "TestLocation": {"superClass": "V", "clusterIds": [12]}}
+
+            def commands():
+                return server.requests[OOperationType.REQUEST_COMMAND.value]
+
+            first = client.fetch(Select(TestCity, (), ()))
+            sent = commands()
+            second = client.fetch(Select(TestCity, (), ()))
+            self.assertEqual(sent, commands())
+            self.assertEqual(sorted(first), sorted(second))
+            # every fetch creates objects of its own
+            self.assertIsNot(first['#9:0'], second['#9:0'])
+
+            client.exec("update TestLocation set name = 'x'", "")
+            client.fetch(Select(TestCity, (), ()))
+            self.assertEqual(sent + 1, commands())
+
+            # the updated record belongs to TestCity
+            client.exec("update #11:1 set name = 'x'", "")
+            client.fetch(Select(TestCity, (), ()))
+            self.assertEqual(sent + 3, commands())
+
+        self.assertEqual(2, OClient.resultcache.hits)
+
+    def test_databases(self):
+        OClient.resultcache = OResultCache()
+
+        with OFakeServer(recordclass="TestCity", resultsize=3) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            other = OClient("other", "root", "root", *server.address)
+
+            client.fetch(Select(TestCity, (), ()))
+            sent = server.requests[OOperationType.REQUEST_COMMAND.value]
+
+            # the same query on another database isn't answered by the shared cache
+            other.fetch(Select(TestCity, (), ()))
+            self.assertEqual(sent + 1, server.requests[OOperationType.REQUEST_COMMAND.value])
+            self.assertEqual(0, OClient.resultcache.hits)
+
+if __name__ == "__main__":
+    unittest.main()
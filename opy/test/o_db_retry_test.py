@@ -0,0 +1,130 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_retry import ORetryPolicy
+from opy.common.o_db_exceptions import ConcurrentModificationException, OPyException
+from opy.database.o_db_codec import OCodec
+from opy.database.protocol.o_op_request import OOperationRequestTXCommit
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+def errorresponse(exception_class:str, message:str):
+    """
+    Creates the bytes of an error response containing a single exception
+    """
+    def string(value):
+        value = value.encode('utf-8')
+        return struct.pack(">i", len(value)) + value
+
+    return struct.pack(">bi", 1, 5) + b'\x01' + string(exception_class) + string(message) + b'\x00' + struct.pack(">i", 0)
+
+def conflict():
+    return ConcurrentModificationException("concurrent modification", {"exception": []})
+
+
+class ORetryPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def test_decode(self):
+        data = errorresponse(ConcurrentModificationException.exception_class,
+                             "Cannot UPDATE the record #12:0 because the version is not the latest. Probably you are "
+                             "updating an old record or it has been modified by another user (db=v7 your=v6)")
+
+        with self.assertRaises(ConcurrentModificationException) as context:
+            OCodec().decode(OOperationRequestTXCommit([]), data)
+
+        self.assertEqual(context.exception.rid, (12, 0))
+        self.assertEqual(context.exception.version, 7)
+
+        # other errors are still generic ones
+        data = errorresponse("com.orientechnologies.orient.core.exception.ODatabaseException", "failed")
+        with self.assertRaises(OPyException) as context:
+            OCodec().decode(OOperationRequestTXCommit([]), data)
+        self.assertNotIsInstance(context.exception, ConcurrentModificationException)
+
+    def test_run(self):
+        calls = list()
+        refreshed = list()
+
+        def operation():
+            calls.append(len(calls))
+            if len(calls) < 3:
+                raise conflict()
+            return "done"
+
+        policy = ORetryPolicy(attempts=3, backoff=0)
+        self.assertEqual(policy.run(operation, refreshed.append), "done")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(refreshed), 2)
+
+    def test_exhausted(self):
+        def operation():
+            raise conflict()
+
+        policy = ORetryPolicy(attempts=2, backoff=0)
+        with self.assertRaises(ConcurrentModificationException):
+            policy.run(operation)
+
+    def test_delay(self):
+        policy = ORetryPolicy(backoff=0.1, maxbackoff=0.3)
+        for attempt in range(1, 6):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(0.3, 0.1 * 2 ** (attempt - 1)))
+
+    def test_save(self):
+        with OFakeServer(recordclass="TestCity") as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            client.retrypolicy = ORetryPolicy(attempts=2, backoff=0)
+
+            rids = list()
+            for name in ("Kassel", "Berlin", "Hamburg"):
+                city = TestCity()
+                city.name = name
+                client.save(city)
+                rids.append((city.clusterid, city.clusterposition))
+
+            cities = client.load(rids, ignorecache=True)
+            for city in cities:
+                city.name = city.name.upper()
+
+            # the update of berlin conflicts within the pipeline, the responses arrive one by one
+            server.update(rids[1][0], rids[1][1], -1)
+            server.latency = 0.1
+            client.save(*cities)
+            server.latency = 0
+
+            # the whole pipeline has been sent again
+            self.assertEqual([city.version for city in cities], [3, 3, 3])
+
+            # the responses behind the conflict have been read, so the connection can still be used
+            loaded = client.load(rids, ignorecache=True)
+            self.assertEqual([city.name for city in loaded], ["KASSEL", "BERLIN", "HAMBURG"])
+            self.assertEqual([city.version for city in loaded], [3, 3, 3])
+
+if __name__ == "__main__":
+    unittest.main()
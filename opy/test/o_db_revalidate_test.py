@@ -0,0 +1,76 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.common.o_db_constants import OOperationType
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class ORevalidateTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def test_revalidate(self):
+        with OFakeServer(recordclass="TestCity") as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+
+            cities = list()
+            for name in ("Kassel", "Berlin", "Hamburg"):
+                city = TestCity()
+                city.name = name
+                client.save(city)
+                cities.append((city.clusterid, city.clusterposition))
+
+            client.load(cities)
+            kassel, berlin, hamburg = cities
+
+            # unchanged records are not loaded again
+            loads = server.requests.get(OOperationType.REQUEST_RECORD_LOAD.value, 0)
+            self.assertEqual({}, client.revalidate())
+            self.assertEqual(loads, server.requests.get(OOperationType.REQUEST_RECORD_LOAD.value, 0))
+
+            server.update(berlin[0], berlin[1], -1)
+            server.delete(hamburg[0], hamburg[1], -1)
+
+            result = client.revalidate([client.cache[rid] for rid in cities])
+
+            self.assertEqual({berlin, hamburg}, set(result))
+            self.assertIsNone(result[hamburg])
+            self.assertEqual(2, result[berlin].version)
+            self.assertIs(result[berlin], client.cache[berlin])
+            self.assertEqual(1, client.cache[kassel].version)
+            self.assertNotIn(hamburg, client.cache)
+            self.assertEqual(loads + 1, server.requests[OOperationType.REQUEST_RECORD_LOAD.value])
+
+            # other errors than missing records don't touch the cache
+            client.close()
+            server.update(kassel[0], kassel[1], -1)
+
+            self.assertIsNone(client.revalidate([client.cache[kassel], client.cache[berlin]]))
+            self.assertEqual(1, client.cache[kassel].version)
+            self.assertEqual(2, client.cache[berlin].version)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_scan import OClusterScanner
+from opy.common.o_db_constants import OOperationType
+from opy.common.o_db_exceptions import NotConnectedException, OPyClientException
+from opy.database.o_db_ops import ODB
+from opy.database.o_db_pool import OConnectionPool
+from opy.test.model.o_db_test_model import TestCity
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts, document
+
+
+__author__ = 'daill'
+
+
+class OClusterScanTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+        self.server = OFakeServer(recordclass="TestCity", classes=[("TestCity", "V", [9, 11]), ("V", None, [10])],
+                                  clusters=[("testcity", 9), ("v", 10), ("testcity_1", 11)])
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        for i in range(7):
+            self.server.create(9, document("TestCity", {"name": "a{}".format(i)}))
+        for i in range(3):
+            self.server.create(11, document("TestCity", {"name": "b{}".format(i)}))
+
+        self.pool = OConnectionPool("test", "root", "root", *self.server.address, size=2)
+        self.addCleanup(self.pool.close)
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def test_datarange(self):
+        with self.pool.connection() as connection:
+            odb = ODB()
+            response = odb.dataclusterdatarange(connection, 9)
+            self.assertEqual((0, 6), (response.get("begin"), response.get("end")))
+
+            # there aren't any records in the cluster
+            response = odb.dataclusterdatarange(connection, 10)
+            self.assertEqual((-1, -1), (response.get("begin"), response.get("end")))
+
+    def test_pool(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(2, len(self.pool))
+
+        # the pool is exhausted
+        self.assertRaises(NotConnectedException, self.pool.acquire, 0.05)
+
+        self.pool.release(first)
+        self.assertIs(first, self.pool.acquire())
+
+        # a discarded connection is replaced by a new one
+        self.pool.discard(second)
+        self.assertEqual(1, len(self.pool))
+        third = self.pool.acquire()
+        self.assertIsNot(second, third)
+        self.assertEqual(2, len(self.pool))
+
+        # a waiting thread gets the released connection
+        acquired = list()
+        waiting = threading.Thread(target=lambda: acquired.append(self.pool.acquire(1.0)))
+        waiting.start()
+        self.pool.release(third)
+        waiting.join()
+        self.assertEqual([third], acquired)
+
+    def test_chunks(self):
+        client = OClient("test", "root", "root", *self.server.address)
+        scanner = OClusterScanner(client, self.pool, chunksize=3, workers=2)
+
+        self.assertEqual([(9, 0, 2), (9, 3, 5), (9, 6, 6), (11, 0, 2)], scanner.chunks([9, 10, 11]))
+
+        # the records of a chunk are ordered by their position
+        chunk = scanner.loadchunk((9, 2, 4))
+        self.assertEqual([(9, 2), (9, 3), (9, 4)], [(obj.clusterid, obj.clusterposition) for obj in chunk])
+        self.assertEqual(["a2", "a3", "a4"], [obj.name for obj in chunk])
+        client.close()
+
+    def test_scan(self):
+        client = OClient("test", "root", "root", *self.server.address)
+        self.assertEqual([9, 11], client.clusters(TestCity))
+        self.assertEqual([10, 9, 11], client.clusters("V"))
+
+        objects = list(client.scan(TestCity, chunksize=2, workers=2))
+
+        # every record is read exactly once
+        rids = [(obj.clusterid, obj.clusterposition) for obj in objects]
+        self.assertEqual(len(set(rids)), len(rids))
+        self.assertEqual(sorted(self.server.records), sorted(rids))
+        self.assertTrue(all(isinstance(obj, TestCity) for obj in objects))
+        client.close()
+
+    def test_failure(self):
+        client = OClient("test", "root", "root", *self.server.address)
+        command = OOperationType.REQUEST_COMMAND.value
+
+        # failed chunks are loaded again
+        self.server.fail(command, 2)
+        scanner = OClusterScanner(client, self.pool, chunksize=4, workers=2, retries=2)
+        self.assertEqual(10, len(list(scanner.scan([9, 11]))))
+        self.assertEqual(0, self.server.failures[command])
+
+        # the scan fails instead of leaving out the records of a chunk
+        self.server.fail(command, 3)
+        scanner = OClusterScanner(client, self.pool, chunksize=10, workers=1, retries=2)
+        with self.assertRaises(OPyClientException):
+            list(scanner.scan([9]))
+
+        self.server.fail(OOperationType.REQUEST_DATACLUSTER_DATARANGE.value)
+        with self.assertRaises(OPyClientException):
+            scanner.chunks([9])
+        client.close()
+
+if __name__ == "__main__":
+    unittest.main()
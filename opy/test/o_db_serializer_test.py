@@ -14,6 +14,8 @@
 
 import unittest
 
+from opy.client.o_db_base import OSchema
+from opy.common.o_db_constants import OBinaryType
 from opy.common.o_db_model import OVarInteger
 from opy.database.o_db_codec import OCodec
 from opy.database.o_db_serializer import OBinarySerializer
@@ -73,6 +75,120 @@ class ODBSerializerTests(unittest.TestCase):
         result = codec.readembeddedmap(bytes)
         self.assertEqual(values, result[0])
 
+    def test_nested_embeddedmap(self):
+        values = {'a': {'b': 1, 'c': {'d': 'e'}}, 'f': 2}
+        bytes = OCodec().writeembeddedmap(values)
+        result = OCodec().readembeddedmap(bytes)
+        self.assertEqual(values, result[0])
+
+    def test_params(self):
+        bytes = OBinarySerializer().encodeparams({'0': 'Kassel', 'limit': 5})
+
+        # header of the document: version, empty class name, field 'params' pointing behind the header
+        self.assertEqual(bytes[:15], b'\x00\x00\x0cparams\x00\x00\x00\x0f\x0c\x00')
+
+        codec = OCodec()
+        codec.position = 15
+        result = codec.readembeddedmap(bytes[15:])
+        self.assertEqual({'0': 'Kassel', 'limit': 5}, result[0])
+
+        # null values are written as entries without data
+        bytes = OBinarySerializer().encodeparams({'0': None, '1': 'Kassel'})
+        codec = OCodec()
+        codec.position = 15
+        self.assertEqual({'0': None, '1': 'Kassel'}, codec.readembeddedmap(bytes[15:])[0])
+
+    def test_params_roundtrip(self):
+        params = {'0': 'Kassel', 'rid': (9, 3), 'nested': {'a': {'b': 1}, 'c': [1, {'d': 'e'}]}}
+        record, class_name, _ = OBinarySerializer().decode(OBinarySerializer().encodeparams(params))
+
+        self.assertIsNone(class_name)
+        self.assertEqual((9, 3), tuple(record['params'].pop('rid')))
+        self.assertEqual({'0': 'Kassel', 'nested': {'a': {'b': 1}, 'c': [1, {'d': 'e'}]}}, record['params'])
+
+    def test_nested_map_roundtrip(self):
+        location = TestLocation()
+        location.name = "Eddies"
+        # the map isn't the first value, so its pointers only fit if they are absolute
+        location.coordinates = {'lat': 51.3, 'address': {'street': 'Main', 'numbers': [1, 2]}}
+
+        record, class_name, _ = OBinarySerializer().decode(OBinarySerializer().encode(location))
+
+        self.assertEqual('TestLocation', class_name)
+        self.assertEqual({'name': 'Eddies', 'coordinates': location.coordinates}, record)
+
+    def createschema(self):
+        schema = OSchema()
+        schema.globalProperties = [{'id': 0, 'name': 'name', 'type': 'STRING'},
+                                   {'id': 1, 'name': 'coordinates', 'type': 'EMBEDDEDLIST'}]
+        schema.classes = {'TestPlace': {'superClass': None, 'properties': {'name': 0}},
+                          'TestLocation': {'superClass': 'TestPlace', 'properties': {'coordinates': 1}}}
+        return schema
+
+    def test_findotype(self):
+        codec = OCodec()
+        self.assertEqual(OBinaryType.INTEGER, codec.findotype(300))
+        self.assertEqual(OBinaryType.INTEGER, codec.findotype(-2147483648))
+        self.assertEqual(OBinaryType.LONG, codec.findotype(2147483648))
+        self.assertEqual(OBinaryType.BOOLEAN, codec.findotype(False))
+
+    def test_global_properties(self):
+        OBinarySerializer.layouts.clear()
+        self.addCleanup(OBinarySerializer.layouts.clear)
+
+        location = TestLocation()
+        location.name = "Kassel"
+        location.coordinates = [51, 9]
+
+        serializer = OBinarySerializer()
+        serializer.schema = self.createschema()
+        bytes = serializer.encode(location)
+
+        # the inherited property 'name' is written as -(0 + 1) without a type
+        self.assertIn(OCodec().writevarint(-1) + b'\x00\x00\x00', bytes)
+        self.assertNotIn(b'coordinates', bytes)
+
+        record, name, rest = serializer.decode(bytes)
+        self.assertEqual('TestLocation', name)
+        self.assertEqual('Kassel', record['name'])
+        self.assertEqual([51, 9], record['coordinates'])
+
+    def test_global_properties_mismatch(self):
+        OBinarySerializer.layouts.clear()
+        self.addCleanup(OBinarySerializer.layouts.clear)
+
+        location = TestLocation()
+        location.name = 7
+
+        serializer = OBinarySerializer()
+        serializer.schema = self.createschema()
+        bytes = serializer.encode(location)
+
+        # a value which doesn't fit the declared type is written with its name
+        self.assertIn(b'\x08name', bytes)
+
+        record, name, rest = serializer.decode(bytes)
+        self.assertEqual(7, record['name'])
+
+    def test_encode_plan(self):
+        OBinarySerializer.layouts.clear()
+        self.addCleanup(OBinarySerializer.layouts.clear)
+
+        serializer = OBinarySerializer()
+        layout = serializer.layout('TestLocation')
+        plan = layout.plan(('name', 'city', 'coordinates'))
+        self.assertIs(plan, layout.plan(('name', 'city', 'coordinates')))
+        self.assertEqual(['name', 'city', 'coordinates'], [entry[0] for entry in plan])
+
+        # the plan is shared by all objects of the class
+        for name, coordinates in (("Kassel", [51, 9]), ("Berlin", [52, 13, False])):
+            location = TestLocation()
+            location.name = name
+            location.coordinates = coordinates
+
+            record, class_name, rest = serializer.decode(serializer.encode(location))
+            self.assertEqual({'name': name, 'coordinates': coordinates}, record)
+
     def test_simple_binary_serialization(self):
 
         city = TestCity()
@@ -0,0 +1,232 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from opy.client.o_db_retry import ORetryPolicy
+from opy.client.o_db_session import OSession
+from opy.common.o_db_exceptions import ConcurrentModificationException
+from opy.common.o_db_model import OTXOperationCreate, OTXOperationUpdate, OTXOperationDelete
+from opy.database.o_db_serializer import OBinarySerializer
+from opy.test.model.o_db_test_model import TestCity, TestEdgeOne, TestLocation
+
+
+__author__ = 'daill'
+
+
+class CommitClient(object):
+    """
+    Remembers the committed entries and answers with the given response
+    """
+    def __init__(self, response:dict):
+        self.response = response
+        self.entries = None
+        self.cache = dict()
+
+    def commit(self, entries:list):
+        self.entries = entries
+        return self.response
+
+
+class ConflictClient(CommitClient):
+    """
+    Fails the first commit with a concurrent modification of the given record
+    """
+    retrypolicy = ORetryPolicy(attempts=2, backoff=0)
+
+    def __init__(self, response:dict, stored):
+        super().__init__(response)
+        self.stored = stored
+        self.commits = 0
+
+    def commit(self, entries:list):
+        self.commits += 1
+        if self.commits == 1:
+            error = ConcurrentModificationException("concurrent modification", {"exception": []})
+            error.rid = (self.stored.clusterid, self.stored.clusterposition)
+            raise error
+        return super().commit(entries)
+
+    def load(self, rids:list, fetchplan:str="", ignorecache:bool=False):
+        self.cache[(self.stored.clusterid, self.stored.clusterposition)] = self.stored
+        return [self.stored]
+
+
+class OSessionTests(unittest.TestCase):
+    def createcity(self, name, clusterid, clusterposition, version=1):
+        city = TestCity()
+        city.name = name
+        city.setRID(clusterid, clusterposition)
+        city.version = version
+        return city
+
+    def test_dirty(self):
+        kassel = self.createcity("Kassel", 12, 0)
+        berlin = self.createcity("Berlin", 12, 1)
+
+        session = OSession(CommitClient(None))
+        session.attach({"#12:0": kassel, "#12:1": berlin, "other": "value"})
+
+        self.assertEqual(session.dirty(), [])
+
+        kassel.name = "Cassel"
+        self.assertEqual(session.changes(kassel), ['name'])
+        self.assertEqual(session.changes(berlin), [])
+        self.assertEqual(len(session.dirty()), 1)
+
+    def test_flush(self):
+        kassel = self.createcity("Kassel", 12, 0, version=3)
+        berlin = self.createcity("Berlin", 12, 1)
+        hamburg = self.createcity("Hamburg", 12, 2)
+        munich = TestCity()
+        munich.name = "Munich"
+
+        client = CommitClient({"record-created": [{"client-specified-cluster-id": -1,
+                                                   "client-specified-cluster-position": -2,
+                                                   "created-cluster-id": 12, "created-cluster-position": 3}],
+                               "record-updated": [{"updated-cluster-id": 12, "updated-cluster-position": 0,
+                                                   "new-record-version": 4},
+                                                  {"updated-cluster-id": 12, "updated-cluster-position": 3,
+                                                   "new-record-version": 1}]})
+
+        session = OSession(client)
+        session.attach(kassel, berlin, hamburg)
+        session.add(munich)
+        session.delete(hamburg)
+        kassel.name = "Cassel"
+
+        session.flush()
+
+        # berlin hasn't been changed so it mustn't be sent
+        self.assertEqual([type(entry) for entry in client.entries], [OTXOperationCreate, OTXOperationUpdate, OTXOperationDelete])
+        self.assertEqual(client.entries[1].getdata()["cluster-position"], 0)
+        self.assertEqual(client.entries[2].getdata()["cluster-position"], 2)
+
+        self.assertEqual((munich.clusterid, munich.clusterposition, munich.version), (12, 3, 1))
+        self.assertEqual(kassel.version, 4)
+        self.assertIs(client.cache[(12, 3)], munich)
+
+        # everything is clean afterwards
+        self.assertEqual(session.dirty(), [])
+        client.entries = None
+        self.assertIsNone(session.flush())
+        self.assertIsNone(client.entries)
+
+    def test_graph(self):
+        kassel = TestCity()
+        kassel.name = "Kassel"
+        berlin = self.createcity("Berlin", 12, 1)
+
+        edge = TestEdgeOne()
+        edge.out_vertex = kassel
+        edge.in_vertex = berlin
+        kassel.out_edges = {"TestEdgeOne": [edge]}
+
+        location = TestLocation()
+        location.name = "Center"
+        location.city = kassel
+
+        client = CommitClient({"record-created": [{"client-specified-cluster-id": -1,
+                                                   "client-specified-cluster-position": -2,
+                                                   "created-cluster-id": 14, "created-cluster-position": 0},
+                                                  {"client-specified-cluster-id": -1,
+                                                   "client-specified-cluster-position": -3,
+                                                   "created-cluster-id": 12, "created-cluster-position": 5},
+                                                  {"client-specified-cluster-id": -1,
+                                                   "client-specified-cluster-position": -4,
+                                                   "created-cluster-id": 13, "created-cluster-position": 0}],
+                               "record-updated": []})
+
+        session = OSession(client)
+        session.add(location)
+
+        # the city and its edge are reachable from the location, berlin is already persisted
+        self.assertEqual((location.clusterid, location.clusterposition), (-1, -2))
+        self.assertEqual((kassel.clusterid, kassel.clusterposition), (-1, -3))
+        self.assertEqual((edge.clusterid, edge.clusterposition), (-1, -4))
+        self.assertEqual((berlin.clusterid, berlin.clusterposition), (12, 1))
+
+        # links between new records use the temporary rids
+        serializer = OBinarySerializer()
+        content, _, _ = serializer.decode(serializer.encode(edge))
+        self.assertEqual(content["out"], (-1, -3))
+        self.assertEqual(content["in"], (12, 1))
+        content, _, _ = serializer.decode(serializer.encode(location))
+        self.assertEqual(content["city"], (-1, -3))
+
+        session.flush()
+
+        self.assertEqual(len(client.entries), 3)
+        self.assertEqual((location.clusterid, location.clusterposition), (14, 0))
+        self.assertEqual((kassel.clusterid, kassel.clusterposition), (12, 5))
+        self.assertEqual((edge.clusterid, edge.clusterposition), (13, 0))
+        self.assertEqual(session.dirty(), [])
+
+    def test_conflict(self):
+        location = TestLocation()
+        location.setRID(14, 0)
+        location.version = 1
+        location.name = "Center"
+        location.city = None
+
+        # someone else has changed the city meanwhile
+        stored = TestLocation()
+        stored.setRID(14, 0)
+        stored.version = 2
+        stored.name = "Center"
+        stored.city = (12, 3)
+
+        client = ConflictClient({"record-updated": [{"updated-cluster-id": 14, "updated-cluster-position": 0,
+                                                     "new-record-version": 3}]}, stored)
+
+        session = OSession(client)
+        session.attach(location)
+        location.name = "Old town"
+        session.flush()
+
+        # the own change is kept, the other one has been merged and the stored version has been sent
+        self.assertEqual(client.commits, 2)
+        self.assertEqual(client.entries[0].getdata()["version"], 2)
+        self.assertEqual(location.name, "Old town")
+        self.assertEqual(location.city, (12, 3))
+        self.assertEqual(location.version, 3)
+        self.assertIs(client.cache[(14, 0)], location)
+
+    def test_unmapped(self):
+        serializer = OBinarySerializer()
+        stored = self.createcity("Kassel", 12, 0)
+        stored.unmappedfields = {"population": 200000, "country": "Germany"}
+
+        # the loaded city knows the fields of the stored record its class doesn't map
+        content, class_name, _ = serializer.decode(serializer.encode(stored))
+        kassel, result = serializer.toobject(class_name, content)
+        kassel.setRID(12, 0)
+        kassel.version = 1
+        self.assertEqual(result, {"population": 200000, "country": "Germany"})
+
+        client = CommitClient({"record-updated": [{"updated-cluster-id": 12, "updated-cluster-position": 0,
+                                                   "new-record-version": 2}]})
+        session = OSession(client)
+        session.attach(kassel)
+        kassel.name = "Cassel"
+        session.flush()
+
+        # the update mustn't drop them
+        content, _, _ = serializer.decode(client.entries[0].getdata()["record-content"])
+        self.assertEqual(content["name"], "Cassel")
+        self.assertEqual(content["population"], 200000)
+        self.assertEqual(content["country"], "Germany")
+
+if __name__ == "__main__":
+    unittest.main()
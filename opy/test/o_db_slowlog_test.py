@@ -0,0 +1,83 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from opy.client.o_db_client import OClient
+from opy.client.o_db_set import Select
+from opy.client.o_db_slowlog import OSlowQueryLog
+from opy.common.o_db_constants import OOperationType
+from opy.test.model.o_db_test_model import TestCity, TestLocation
+from opy.tools.o_db_fake_server import OFakeServer, fasttimeouts
+
+
+__author__ = 'daill'
+
+
+class OSlowQueryLogTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(fasttimeouts())
+
+    def tearDown(self):
+        OClient.schema = None
+
+    def test_slowlog(self):
+        slowlog = OSlowQueryLog(threshold=0, capacity=2, explain="explain")
+
+        with OFakeServer(recordclass="TestCity", resultsize=3) as server:
+            OClient.schema = None
+            client = OClient("test", "root", "root", *server.address)
+            client.slowlog = slowlog
+            commands = server.requests[OOperationType.REQUEST_COMMAND.value]
+
+            client.fetch(Select(TestCity, (), ()))
+            client.fetch(Select(TestCity, (), ()))
+            client.fetch(Select(TestLocation, (), ()))
+
+            # three selects and one explain per query text
+            self.assertEqual(commands + 5, server.requests[OOperationType.REQUEST_COMMAND.value])
+
+        entries = slowlog.entries()
+        self.assertEqual(2, len(entries))
+        self.assertIn("TestLocation", entries[1].sql)
+        self.assertEqual(entries[0].sql, Select(TestCity, (), ()).parse())
+        self.assertGreater(entries[1].size, 0)
+        self.assertGreaterEqual(entries[1].decode, 0)
+        self.assertEqual(3, entries[0].plan["documentReads"])
+
+        handle, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        try:
+            self.assertEqual(2, slowlog.export(path))
+            with open(path) as file:
+                exported = [json.loads(line) for line in file]
+        finally:
+            os.remove(path)
+
+        self.assertEqual(entries[1].sql, exported[1]["sql"])
+        self.assertEqual("collection", exported[1]["plan"]["resultType"])
+
+    def test_explainable(self):
+        slowlog = OSlowQueryLog(explain="profile")
+        self.assertTrue(slowlog.explainable(" SELECT from V"))
+        self.assertTrue(slowlog.explainable("traverse out() from #9:0"))
+        self.assertFalse(slowlog.explainable("delete vertex V"))
+        self.assertFalse(OSlowQueryLog().explainable("select from V"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import json
+import struct
+import sys
+import time
+import tracemalloc
+
+from opy.client.o_db_base import BaseVertex
+from opy.client.o_db_set import Select, Update, Set, Where, And, Condition
+from opy.common.o_db_model import OVarInteger, OSQLCommand
+from opy.database.o_db_codec import OCodec
+from opy.database.o_db_serializer import OBinarySerializer
+from opy.database.protocol.o_op_db import OOperationDBOpen
+from opy.database.protocol.o_op_request import OOperationRequestCommand
+from opy.tools.o_db_fake_server import record, document
+
+__author__ = 'daill'
+
+
+class BenchmarkFlat(BaseVertex):
+    def __init__(self):
+        super().__init__()
+        self.name = "Kassel"
+        self.country = "Germany"
+        self.population = 200000
+        self.area = 106.8
+        self.capital = False
+
+    def persistentattributes(self):
+        return ['name', 'country', 'population', 'area', 'capital']
+
+
+class BenchmarkWide(BaseVertex):
+    fields = ["field{}".format(i) for i in range(100)]
+
+    def __init__(self):
+        super().__init__()
+        for i, field in enumerate(BenchmarkWide.fields):
+            setattr(self, field, "value {}".format(i) if i % 2 else i)
+
+    def persistentattributes(self):
+        return BenchmarkWide.fields
+
+
+class BenchmarkDeep(BaseVertex):
+    def __init__(self, depth:int=8):
+        super().__init__()
+        self.name = "root"
+        self.tree = {"leaf": 1}
+        for i in range(depth):
+            self.tree = {"level": i, "child": self.tree}
+
+    def persistentattributes(self):
+        return ['name', 'tree']
+
+
+class OBenchmark(object):
+    """
+    A named operation. The fixture of the operation is created up front, so only the operation itself is measured.
+    """
+    def __init__(self, name:str, operation, large:bool=False):
+        self.name = name
+        self.operation = operation
+        self.large = large
+
+    def measure(self, mintime:float=0.2, repeat:int=3):
+        """
+        Runs the operation as often as it fits into mintime and takes the best of repeat runs
+
+        :return: operations per second
+        """
+        operation = self.operation
+
+        # find the number of iterations which takes at least mintime
+        iterations = 1
+        while True:
+            elapsed = timeit(operation, iterations)
+            if elapsed >= mintime or iterations >= 1 << 24:
+                break
+            iterations *= 2 if elapsed <= 0 else max(2, min(10, int(mintime / elapsed) + 1))
+
+        best = elapsed
+        for _ in range(repeat - 1):
+            best = min(best, timeit(operation, iterations))
+
+        return iterations / best if best > 0 else float("inf")
+
+    def allocations(self):
+        """
+        :return: (peak of allocated bytes, number of allocated blocks kept) of a single run
+        """
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            result = self.operation()
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno"))
+            del result
+            return peak, blocks
+        finally:
+            tracemalloc.stop()
+
+
+def timeit(operation, iterations:int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return time.perf_counter() - start
+
+def commandresponse(count:int, size:int=100):
+    """
+    :param count: number of records
+    :param size: size of the string field of each record
+    :return: bytes of a synchronous command response with a list of count records
+    """
+    content = document("BenchmarkFlat", {"name": "x" * size})
+    records = b''.join(record(9, position, 1, content) for position in range(count))
+    return struct.pack(">bi", 0, 1) + b'l' + struct.pack(">i", count) + records + b'\x00'
+
+def decodecommand(data:bytes):
+    operation = OOperationRequestCommand(OSQLCommand("select from BenchmarkFlat", -1, "", ""), 28)
+    return OCodec().decode(operation, data)
+
+def benchmarks():
+    """
+    :return: list of all benchmarks
+    """
+    result = list()
+
+    # varints
+    varint = OVarInteger()
+    varint_bytes = varint.encode(300000)
+    result.append(OBenchmark("varint encode", lambda: varint.encode(300000)))
+    result.append(OBenchmark("varint decode", lambda: varint.decode(varint_bytes)))
+
+    # codec
+    codec = OCodec()
+    string_bytes = codec.writevarintstring("Kassel is a city in Germany")
+    int_bytes = codec.writeint(123456)
+    long_bytes = codec.writelong(1234567890123)
+    result.append(OBenchmark("codec writeint", lambda: codec.writeint(123456)))
+    result.append(OBenchmark("codec readint", lambda: codec.readint(int_bytes)))
+    result.append(OBenchmark("codec writelong", lambda: codec.writelong(1234567890123)))
+    result.append(OBenchmark("codec readlong", lambda: codec.readlong(long_bytes)))
+    result.append(OBenchmark("codec writevarintstring", lambda: codec.writevarintstring("Kassel is a city in Germany")))
+    result.append(OBenchmark("codec readvarintstring", lambda: codec.readvarintstring(string_bytes)))
+
+    # binary serializer
+    serializer = OBinarySerializer()
+    for name, obj in (("flat", BenchmarkFlat()), ("wide", BenchmarkWide()), ("deep", BenchmarkDeep())):
+        encoded = serializer.encode(obj)
+        result.append(OBenchmark("serializer encode {}".format(name), lambda obj=obj: serializer.encode(obj)))
+        result.append(OBenchmark("serializer decode {}".format(name), lambda encoded=encoded: serializer.decode(encoded)))
+
+    # ridbags
+    ridbag_bytes = codec.writeridbag([(9, position) for position in range(1000)])
+    result.append(OBenchmark("ridbag decode 1k", lambda: OCodec().readridbag(ridbag_bytes)))
+
+    # profile parser, a new operation parses its profile again
+    result.append(OBenchmark("profile parse db open response", lambda: OOperationDBOpen().getresponseprofile()))
+
+    # command responses
+    small = commandresponse(1000)
+    result.append(OBenchmark("command decode 1k records", lambda: decodecommand(small)))
+    result.append(OBenchmark("command decode 100k records", lambda: decodecommand(commandresponse(100000)), large=True))
+
+    # query builder
+    select = Select(BenchmarkFlat, (), Where(And(Condition("name").iseq("Kassel"), Condition("population").isgt(1000))))
+    update = Update(BenchmarkFlat, Set({'name': 'Kassel', 'population': 200000}), Where(Condition("name").iseq("Cassel")))
+    result.append(OBenchmark("select parse", lambda: select.parse(list())))
+    result.append(OBenchmark("update parse", lambda: update.parse(list())))
+
+    return result
+
+def run(selected:list, mintime:float, allocations:bool, baseline:dict, tolerance:float, output=sys.stdout):
+    """
+    Runs the benchmarks and prints a line per benchmark
+
+    :param selected: list of OBenchmark
+    :param mintime: minimal time per measurement in seconds
+    :param allocations: measure allocations as well
+    :param baseline: dict of benchmark name -> results of a previous run
+    :param tolerance: relative slow down which is reported as regression
+    :return: (dict of benchmark name -> results, list of names of regressed benchmarks)
+    """
+    results = dict()
+    regressions = list()
+
+    output.write("{:<36} {:>14} {:>12} {:>12} {:>10}\n".format("benchmark", "ops/sec", "peak KiB", "blocks", "change"))
+    for benchmark in selected:
+        ops = benchmark.measure(mintime)
+        entry = {"ops": ops}
+        line = "{:<36} {:>14.1f}".format(benchmark.name, ops)
+
+        if allocations:
+            peak, blocks = benchmark.allocations()
+            entry.update({"peak": peak, "blocks": blocks})
+            line += " {:>12.1f} {:>12}".format(peak / 1024, blocks)
+        else:
+            line += " {:>12} {:>12}".format("-", "-")
+
+        previous = baseline.get(benchmark.name) if baseline else None
+        if previous and previous.get("ops"):
+            change = ops / previous["ops"] - 1
+            line += " {:>+9.1%}".format(change)
+            if change < -tolerance:
+                regressions.append(benchmark.name)
+                line += " REGRESSION"
+
+        results[benchmark.name] = entry
+        output.write(line + "\n")
+        output.flush()
+
+    return results, regressions
+
+def main(arguments:list=None):
+    """
+    Micro benchmarks of the hot paths of the driver: varints, codec, binary serializer, ridbags, profile parser,
+    command response decoding and the query builder. All fixtures are synthetic, so no server is needed.
+
+        # run all benchmarks and store the results as baseline
+        python -m opy.tools.o_db_benchmark --save baseline.json
+
+        # compare a later run with the baseline, exits with 1 if a benchmark got slower than the tolerance
+        python -m opy.tools.o_db_benchmark --baseline baseline.json --tolerance 0.2
+
+    :param arguments: command line arguments, sys.argv if None
+    :return: exit code
+    """
+    parser = argparse.ArgumentParser(description="micro benchmarks of the OPy hot paths")
+    parser.add_argument("--filter", default="", help="run only benchmarks containing this text")
+    parser.add_argument("--large", action="store_true", help="include the large benchmarks (i.e. 100k records)")
+    parser.add_argument("--mintime", type=float, default=0.2, help="minimal time per measurement in seconds")
+    parser.add_argument("--no-allocations", dest="allocations", action="store_false", help="skip allocation tracing")
+    parser.add_argument("--save", help="write the results as json to this file")
+    parser.add_argument("--baseline", help="compare with the results stored in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slow down reported as regression")
+    args = parser.parse_args(arguments)
+
+    selected = [benchmark for benchmark in benchmarks()
+                if args.filter in benchmark.name and (args.large or not benchmark.large)]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+    results, regressions = run(selected, args.mintime, args.allocations, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if regressions:
+        sys.stdout.write("{} regression(s): {}\n".format(len(regressions), ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
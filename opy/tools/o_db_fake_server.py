@@ -0,0 +1,803 @@
+# Copyright 2015 Christian Kramer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import itertools
+import logging
+import operator
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from opy.common.o_db_constants import OOperationType, OBinaryType, OTXOperationType
+from opy.database.o_db_codec import OCodec
+from opy.database.o_db_serializer import OBinarySerializer
+from opy.database.o_db_connection import OConnection
+from opy.database.o_db_push import pushrecord
+
+__author__ = 'daill'
+
+
+class OFakeServer(object):
+    """
+    In-process stand-in for an OrientDB server which speaks enough of the binary protocol to run the client stack
+    (OConnection, ODB and OClient) without a database: handshake, connect, db open/close, commands, record
+    load/create/update/delete/metadata, cluster data ranges, transaction commits and live queries.
+
+    Records which have been written are kept in memory, all other records are synthetic documents of the configured
+    class with a string field of recordsize bytes. Selects return resultsize of them, selects of a cluster return its
+    stored records within the given rid range. Every response is delayed by latency seconds to simulate the network
+    and the server, fail lets the next requests of an operation answer with an error.
+
+    Usage:
+
+        with OFakeServer(recordsize=512, latency=0.001) as server:
+            client = OClient("test", "root", "root", *server.address)
+    """
+    protocol_version = 28
+    release = "OrientDB stand-in"
+    token = b'opy-fake-token'
+
+    def __init__(self, host:str='127.0.0.1', port:int=0, recordclass:str="V", recordsize:int=100, resultsize:int=10,
+                 latency:float=0.0, clusters:list=None, classes:list=None):
+        """
+        :param host:
+        :param port: 0 picks a free port, see address
+        :param recordclass: class name of the synthetic records
+        :param recordsize: size of the string field of the synthetic records in bytes
+        :param resultsize: number of records returned by a select
+        :param latency: delay of every response in seconds
+        :param clusters: list of (cluster name, cluster id), the first one stores new records
+        :param classes: list of (class name, super class name, cluster ids) of the schema, by default the record class
+                        stored in the first cluster
+        """
+        self.recordclass = recordclass
+        self.recordsize = recordsize
+        self.resultsize = resultsize
+        self.latency = latency
+        self.clusters = clusters or [("v", 9), ("e", 10)]
+        self.classes = classes if classes is not None else [(recordclass, None, [self.clusters[0][1]])]
+
+        # (cluster-id, cluster-position) -> [version, content]
+        self.records = dict()
+        # (cluster-id, cluster-position) of the deleted records
+        self.deleted = set()
+        # number of handled requests per operation type
+        self.requests = dict()
+        # number of the next requests per operation type which fail
+        self.failures = dict()
+
+        self.__lock = threading.Lock()
+        self.__sessions = itertools.count(1)
+        self.__positions = dict()
+        self.__synthetic = dict()
+        self.__thread = None
+        # token -> (connection, class name) of the live queries
+        self.__subscriptions = dict()
+        # open client connections
+        self.__connections = set()
+        self.__tokens = itertools.count(1)
+
+        server = self
+
+        class RequestHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                connection = OFakeConnection(server, self.request)
+                server.register(connection)
+                try:
+                    connection.serve()
+                finally:
+                    server.unregister(connection)
+
+        self.__server = socketserver.ThreadingTCPServer((host, port), RequestHandler, bind_and_activate=False)
+        self.__server.daemon_threads = True
+        self.__server.allow_reuse_address = True
+
+    @property
+    def address(self):
+        """
+        :return: (host, port) the server is listening on
+        """
+        return self.__server.server_address
+
+    def start(self):
+        self.__server.server_bind()
+        self.__server.server_activate()
+        # a short poll interval lets stop return quickly
+        self.__thread = threading.Thread(target=self.__server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.__thread.start()
+        logging.info("fake server listening on {}:{}".format(*self.address))
+        return self
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__server.shutdown()
+            self.__thread.join()
+            self.__thread = None
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def register(self, connection):
+        with self.__lock:
+            self.__connections.add(connection)
+
+    def unregister(self, connection):
+        with self.__lock:
+            self.__connections.discard(connection)
+
+    def disconnect(self):
+        """
+        Closes all client connections like a server going down
+        """
+        with self.__lock:
+            connections = list(self.__connections)
+        for connection in connections:
+            connection.close()
+
+    def newsession(self):
+        with self.__lock:
+            return next(self.__sessions)
+
+    def count(self, operation:int):
+        with self.__lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def fail(self, operation:int, count:int=1):
+        """
+        Lets the next requests of the given operation type answer with an error
+
+        :param operation: OOperationType value
+        :param count: number of failing requests
+        """
+        with self.__lock:
+            self.failures[operation] = self.failures.get(operation, 0) + count
+
+    def failing(self, operation:int):
+        """
+        :return: True if the current request of the given operation type has to fail
+        """
+        with self.__lock:
+            if self.failures.get(operation, 0) > 0:
+                self.failures[operation] -= 1
+                return True
+        return False
+
+    def synthetic(self, class_name:str=None):
+        """
+        :param class_name:
+        :return: content of a synthetic document of the given class with a name field of recordsize bytes
+        """
+        class_name = class_name or self.recordclass
+        content = self.__synthetic.get(class_name)
+        if content is None:
+            content = document(class_name, {"name": "x" * self.recordsize})
+            self.__synthetic[class_name] = content
+        return content
+
+    def create(self, cluster_id:int, content:bytes):
+        """
+        :param cluster_id: -1 picks the first cluster
+        :param content:
+        :return: (cluster-id, cluster-position, version) of the new record
+        """
+        if cluster_id < 0:
+            cluster_id = self.clusters[0][1]
+
+        with self.__lock:
+            positions = self.__positions.setdefault(cluster_id, itertools.count())
+            rid = (cluster_id, next(positions))
+            self.records[rid] = [1, content]
+        self.push(OTXOperationType.CREATIONS.value, rid[0], rid[1], 1, content)
+        return rid[0], rid[1], 1
+
+    def load(self, cluster_id:int, cluster_position:int):
+        """
+        :return: (version, content) of the stored or a synthetic record
+        """
+        with self.__lock:
+            record = self.records.get((cluster_id, cluster_position))
+            if record is not None:
+                return tuple(record)
+        return 1, self.synthetic()
+
+    def datarange(self, cluster_id:int):
+        """
+        :return: (first, last) position of the stored records of the cluster, (-1, -1) if there are none
+        """
+        with self.__lock:
+            positions = [position for cluster, position in self.records if cluster == cluster_id]
+        if not positions:
+            return -1, -1
+        return min(positions), max(positions)
+
+    def stored(self, text:str, params:dict=None, cluster_id:int=None, class_name:str=None):
+        """
+        Selects stored records, the comparisons of @rid with rids or positional parameters and the limit are applied
+
+        :param text: select
+        :param params: decoded parameters of the select
+        :param cluster_id: cluster of the records
+        :param class_name: class of the records
+        :return: list of (cluster-id, cluster-position, version, content) ordered by rid
+        """
+        with self.__lock:
+            records = sorted((rid, record[0], record[1]) for rid, record in self.records.items()
+                             if (cluster_id is None or rid[0] == cluster_id) and (class_name is None or classof(record[1]) == class_name))
+
+        for op, rid in self.bounds(text, params):
+            records = [entry for entry in records if op(entry[0], rid)]
+
+        limit = re.search(r"\blimit\s+(\d+)", text, re.IGNORECASE)
+        if limit:
+            records = records[:int(limit.group(1))]
+
+        return [(rid[0], rid[1], version, content) for rid, version, content in records]
+
+    def bounds(self, text:str, params:dict=None):
+        """
+        :param text: select
+        :param params: decoded parameters of the select
+        :return: list of (operator, rid tuple) of the comparisons of @rid
+        """
+        compare = {">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt, "=": operator.eq}
+
+        result = list()
+        for match in re.finditer(r"@rid\s*(>=|<=|>|<|=)\s*(?:#(\d+):(\d+)|(\?))", text):
+            if match.group(4):
+                # positional parameters are keyed by the number of placeholders in front of them
+                rid = tuple((params or dict()).get(str(text[:match.start()].count("?"))))
+            else:
+                rid = (int(match.group(2)), int(match.group(3)))
+            result.append((compare[match.group(1)], rid))
+        return result
+
+    def metadata(self, cluster_id:int, cluster_position:int):
+        """
+        :return: version of the stored or a synthetic record
+        :raises: OFakeError if the record has been deleted
+        """
+        with self.__lock:
+            if (cluster_id, cluster_position) in self.deleted:
+                raise OFakeError("com.orientechnologies.orient.core.exception.ORecordNotFoundException",
+                                 "Record #{}:{} was not found".format(cluster_id, cluster_position))
+            record = self.records.get((cluster_id, cluster_position))
+            return record[0] if record is not None else 1
+
+    def update(self, cluster_id:int, cluster_position:int, version:int, content:bytes=None):
+        """
+        Updates a stored record. Versions below zero skip the version check like the server does.
+
+        :return: the new version
+        :raises: OFakeError in case of an outdated version
+        """
+        with self.__lock:
+            record = self.records.setdefault((cluster_id, cluster_position), [1, self.synthetic()])
+            checkversion(cluster_id, cluster_position, record[0], version, "UPDATE")
+            record[0] += 1
+            if content is not None:
+                record[1] = content
+            version, content = record
+        self.push(OTXOperationType.UPDATES.value, cluster_id, cluster_position, version, content)
+        return version
+
+    def delete(self, cluster_id:int, cluster_position:int, version:int):
+        with self.__lock:
+            record = self.records.get((cluster_id, cluster_position))
+            if record is None:
+                return False
+            checkversion(cluster_id, cluster_position, record[0], version, "DELETE")
+            del self.records[(cluster_id, cluster_position)]
+            self.deleted.add((cluster_id, cluster_position))
+        self.push(OTXOperationType.DELETE.value, cluster_id, cluster_position, record[0], record[1])
+        return True
+
+    def subscribe(self, connection, text:str):
+        """
+        Registers a live select, the changes of the records of the selected class are pushed to the connection
+
+        :param connection: OFakeConnection
+        :param text: live select
+        :return: token of the live query
+        """
+        match = re.search(r"\bfrom\s+(\w+)", text, re.IGNORECASE)
+        with self.__lock:
+            token = next(self.__tokens)
+            self.__subscriptions[token] = (connection, match.group(1) if match else None)
+        return token
+
+    def unsubscribe(self, token:int=None, connection=None):
+        """
+        Removes a live query or all live queries of a connection
+        """
+        with self.__lock:
+            for key, (subscriber, _) in list(self.__subscriptions.items()):
+                if key == token or subscriber is connection:
+                    del self.__subscriptions[key]
+
+    def push(self, operation:int, cluster_id:int, cluster_position:int, version:int, content:bytes):
+        """
+        Pushes a record change to the live queries of its class
+        """
+        class_name = classof(content)
+        with self.__lock:
+            subscribers = [(token, connection) for token, (connection, selected) in self.__subscriptions.items()
+                           if selected is None or selected == class_name]
+
+        for token, connection in subscribers:
+            try:
+                connection.send(pushrecord(operation, token, version, cluster_id, cluster_position, content))
+            except OSError as err:
+                logging.debug("live query {} ended: {}".format(token, err))
+                self.unsubscribe(token)
+
+    def query(self, text:str, params:dict=None):
+        """
+        Answers a sql command. The result is a list of (cluster-id, cluster-position, version, content) or None for a
+        null record. Selects of a cluster and selects ordered by @rid like the pages of OClient.paginate return the
+        stored records.
+
+        :param text:
+        :param params: decoded parameters of the command
+        :return: (result type, records)
+        """
+        lowered = text.strip().lower()
+
+        if "metadata:schema" in lowered:
+            if "expand(classes)" in lowered:
+                return 'l', [(-1, -1, 0, document("", schemaclass(*clazz))) for clazz in self.classes]
+            return 'l', [(-2, 0, 1, document("", {"globalProperties": []}))]
+        elif lowered.startswith("explain") or lowered.startswith("profile"):
+            # plan document like the one of the server
+            plan = {"resultType": "collection", "resultSize": self.resultsize, "documentReads": self.resultsize}
+            return 'r', [(-1, -1, 0, document("", plan))]
+        elif re.match(r"select\s+from\s+cluster:\d+", lowered):
+            return 'l', self.stored(text, params, cluster_id=int(re.match(r"select\s+from\s+cluster:(\d+)", lowered).group(1)))
+        elif lowered.startswith("select") or lowered.startswith("traverse"):
+            match = re.search(r"\bfrom\s+(\w+)", text, re.IGNORECASE)
+            class_name = match.group(1) if match else None
+            if re.search(r"order\s+by\s+@rid", lowered):
+                return 'l', self.stored(text, params, class_name=class_name)
+            content = self.synthetic(class_name)
+            cluster_id = self.clusters[0][1]
+            return 'l', [(cluster_id, position, 1, content) for position in range(self.resultsize)]
+        elif lowered.startswith("create vertex") or lowered.startswith("create edge"):
+            class_name = text.split()[2] if len(text.split()) > 2 else None
+            content = self.synthetic(class_name)
+            return 'r', [self.create(-1, content) + (content,)]
+
+        return 'n', []
+
+    def script(self, text:str):
+        """
+        Answers a batch script by creating a record for every created vertex or edge (see OBatch). The other
+        statements return a null record.
+
+        :param text:
+        :return: (result type, records)
+        """
+        created = dict(re.findall(r"let (\$r\d+) = create (?:vertex|edge) (\w+)", text, re.IGNORECASE))
+        match = re.search(r"return \[(.*)\]", text)
+        names = re.findall(r"\$r\d+", match.group(1)) if match else []
+
+        records = list()
+        for name in names:
+            if name in created:
+                content = self.synthetic(created[name])
+                records.append(self.create(-1, content) + (content,))
+            else:
+                records.append(None)
+        return 'l', records
+
+
+class OFakeError(Exception):
+    def __init__(self, exception_class:str, message:str):
+        super().__init__(message)
+        self.exception_class = exception_class
+        self.message = message
+
+
+class OFakeConnection(object):
+    """
+    Reads the requests of a single client connection and writes the responses
+    """
+    def __init__(self, server:OFakeServer, sock):
+        self.__server = server
+        self.__sock = sock
+        self.__reader = OFakeReader(sock.makefile('rb'))
+        self.__codec = OCodec()
+        self.session_id = -1
+        self.token_based = False
+        # responses and pushed messages are written by different threads
+        self.__writelock = threading.Lock()
+
+        self.__handlers = {
+            OOperationType.REQUEST_CONNECT.value: self.connect,
+            OOperationType.REQUEST_DB_OPEN.value: self.dbopen,
+            OOperationType.REQUEST_COMMAND.value: self.command,
+            OOperationType.REQUEST_RECORD_LOAD.value: self.recordload,
+            OOperationType.REQUEST_RECORD_CREATE.value: self.recordcreate,
+            OOperationType.REQUEST_RECORD_UPDATE.value: self.recordupdate,
+            OOperationType.REQUEST_RECORD_DELETE.value: self.recorddelete,
+            OOperationType.REQUEST_RECORD_METADATA.value: self.recordmetadata,
+            OOperationType.REQUEST_DATACLUSTER_DATARANGE.value: self.datarange,
+            OOperationType.REQUEST_TX_COMMIT.value: self.txcommit
+        }
+
+    def serve(self):
+        # handshake
+        self.__sock.sendall(struct.pack(">h", self.__server.protocol_version))
+
+        try:
+            while True:
+                operation = self.__reader.readbyte()
+                session_id = self.__reader.readint()
+
+                if self.token_based and operation not in (OOperationType.REQUEST_CONNECT.value, OOperationType.REQUEST_DB_OPEN.value):
+                    self.__reader.readbytes()
+
+                self.__server.count(operation)
+
+                if operation == OOperationType.REQUEST_DB_CLOSE.value:
+                    break
+
+                # the head of connect and db open is sent without a token
+                tokenless = operation in (OOperationType.REQUEST_CONNECT.value, OOperationType.REQUEST_DB_OPEN.value)
+
+                handler = self.__handlers.get(operation)
+                try:
+                    if handler is None:
+                        raise OFakeError("com.orientechnologies.orient.core.exception.OConfigurationException",
+                                         "operation {} is not supported by the fake server".format(operation))
+                    body = handler()
+                    if self.__server.failing(operation):
+                        raise OFakeError("com.orientechnologies.orient.core.exception.ODatabaseException",
+                                         "operation {} failed on purpose".format(operation))
+                    response = self.head(0, session_id, tokenless) + body
+                except OFakeError as err:
+                    response = self.head(1, session_id, tokenless) + self.error(err)
+
+                if self.__server.latency:
+                    time.sleep(self.__server.latency)
+                self.send(response)
+        except EOFError:
+            pass
+        except OSError as err:
+            logging.debug("connection closed: {}".format(err))
+        finally:
+            self.__server.unsubscribe(connection=self)
+
+    def send(self, data:bytes):
+        with self.__writelock:
+            self.__sock.sendall(data)
+
+    def close(self):
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError as err:
+            logging.debug("connection already closed: {}".format(err))
+
+    def head(self, status:int, session_id:int, tokenless:bool=False):
+        result = struct.pack(">bi", status, session_id)
+        if self.token_based and not tokenless:
+            result += bytesfield(self.__server.token)
+        return result
+
+    def error(self, err:OFakeError):
+        return b'\x01' + bytesfield(err.exception_class) + bytesfield(err.message) + b'\x00' + struct.pack(">i", 0)
+
+    def readcredentials(self, database:bool):
+        reader = self.__reader
+        reader.readstring()     # driver name
+        reader.readstring()     # driver version
+        reader.readshort()      # protocol version
+        reader.readstring()     # client id
+        reader.readstring()     # serialization
+        token_session = reader.readbyte() == 1
+        if database:
+            reader.readstring() # database name
+            reader.readstring() # database type
+        reader.readstring()     # user name
+        reader.readstring()     # user password
+        return token_session
+
+    def connect(self):
+        self.token_based = self.readcredentials(False)
+        return self.opensession()
+
+    def dbopen(self):
+        self.token_based = self.readcredentials(True)
+        result = self.opensession()
+
+        clusters = self.__server.clusters
+        result += struct.pack(">h", len(clusters))
+        for name, cluster_id in clusters:
+            result += bytesfield(name) + struct.pack(">h", cluster_id)
+        # cluster config and release
+        result += struct.pack(">i", 0) + bytesfield(self.__server.release)
+
+        return result
+
+    def opensession(self):
+        self.session_id = self.__server.newsession()
+        return struct.pack(">i", self.session_id) + bytesfield(self.__server.token)
+
+    def command(self):
+        self.__reader.readbyte()    # mode
+        payload = OFakeReader(io.BytesIO(self.__reader.read(self.__reader.readint())))
+
+        class_name = payload.readstring()
+        if class_name == b's':
+            payload.readstring()    # language
+        text = payload.readstring().decode("utf-8")
+        payload.readint()           # non text limit
+        payload.readstring()        # fetch plan
+        serialized = payload.readbytes()
+        params = OBinarySerializer().decode(serialized)[0].get("params") if serialized else None
+
+        lowered = text.strip().lower()
+        if lowered.startswith("live select"):
+            token = self.__server.subscribe(self, text)
+            result_type, records = 'r', [(-1, -1, 0, document("", {"token": token}))]
+        elif lowered.startswith("live unsubscribe"):
+            self.__server.unsubscribe(int(text.split()[-1]))
+            result_type, records = 'n', []
+        elif class_name == b's':
+            result_type, records = self.__server.script(text)
+        else:
+            result_type, records = self.__server.query(text, params)
+
+        result = result_type.encode("utf-8")
+        if result_type == 'l':
+            result += struct.pack(">i", len(records))
+        for entry in records:
+            # null record
+            result += record(*entry) if entry is not None else struct.pack(">h", -2)
+
+        # no pre-fetched records
+        return result + b'\x00'
+
+    def recordload(self):
+        reader = self.__reader
+        cluster_id = reader.readshort()
+        cluster_position = reader.readlong()
+        reader.readstring()     # fetch plan
+        reader.readbyte()       # ignore cache
+        reader.readbyte()       # load tombstones
+
+        version, content = self.__server.load(cluster_id, cluster_position)
+        return b'\x01' + b'd' + struct.pack(">i", version) + bytesfield(content) + b'\x00'
+
+    def datarange(self):
+        cluster_id = self.__reader.readshort()
+        return struct.pack(">qq", *self.__server.datarange(cluster_id))
+
+    def recordmetadata(self):
+        reader = self.__reader
+        cluster_id = reader.readshort()
+        cluster_position = reader.readlong()
+
+        version = self.__server.metadata(cluster_id, cluster_position)
+        return struct.pack(">hqi", cluster_id, cluster_position, version)
+
+    def recordcreate(self):
+        reader = self.__reader
+        cluster_id = reader.readshort()
+        content = reader.readbytes()
+        reader.readbyte()       # record type
+        reader.readbyte()       # mode
+
+        cluster_id, cluster_position, version = self.__server.create(cluster_id, content)
+        return struct.pack(">hqii", cluster_id, cluster_position, version, 0)
+
+    def recordupdate(self):
+        reader = self.__reader
+        cluster_id = reader.readshort()
+        cluster_position = reader.readlong()
+        reader.readbyte()       # update content
+        content = reader.readbytes()
+        version = reader.readint()
+        reader.readbyte()       # record type
+        reader.readbyte()       # mode
+
+        version = self.__server.update(cluster_id, cluster_position, version, content)
+        return struct.pack(">ii", version, 0)
+
+    def recorddelete(self):
+        reader = self.__reader
+        cluster_id = reader.readshort()
+        cluster_position = reader.readlong()
+        version = reader.readint()
+        reader.readbyte()       # mode
+
+        deleted = self.__server.delete(cluster_id, cluster_position, version)
+        return struct.pack(">b", 1 if deleted else 0)
+
+    def txcommit(self):
+        reader = self.__reader
+        reader.readint()        # tx id
+        reader.readbyte()       # using tx log
+
+        entries = list()
+        while reader.readbyte() == 1:
+            operation_type = reader.readbyte()
+            cluster_id = reader.readshort()
+            cluster_position = reader.readlong()
+            reader.readbyte()   # record type
+
+            if operation_type == 3:
+                entries.append((operation_type, cluster_id, cluster_position, None, reader.readbytes()))
+            elif operation_type == 2:
+                entries.append((operation_type, cluster_id, cluster_position, reader.readint(), None))
+            else:
+                version = reader.readint()
+                reader.readbyte()   # content changed
+                entries.append((operation_type, cluster_id, cluster_position, version, reader.readbytes()))
+        reader.readstring()     # remote index length
+
+        created = list()
+        updated = list()
+        for operation_type, cluster_id, cluster_position, version, content in entries:
+            if operation_type == 3:
+                rid = self.__server.create(-1, content)
+                created.append((cluster_id, cluster_position) + rid[:2])
+                # like the server the versions of the created records are part of the updated records
+                updated.append(rid)
+            elif operation_type == 2:
+                self.__server.delete(cluster_id, cluster_position, version)
+            else:
+                updated.append((cluster_id, cluster_position, self.__server.update(cluster_id, cluster_position, version, content)))
+
+        result = struct.pack(">i", len(created))
+        for entry in created:
+            result += struct.pack(">hqhq", *entry)
+        result += struct.pack(">i", len(updated))
+        for entry in updated:
+            result += struct.pack(">hqi", *entry)
+        return result + struct.pack(">i", 0)
+
+
+class OFakeReader(object):
+    """
+    Reads the primitive types of the protocol from a file like object
+    """
+    def __init__(self, file):
+        self.__file = file
+
+    def read(self, length:int):
+        data = self.__file.read(length)
+        if data is None or len(data) < length:
+            raise EOFError("connection closed")
+        return data
+
+    def readbyte(self):
+        return struct.unpack(">b", self.read(1))[0]
+
+    def readshort(self):
+        return struct.unpack(">h", self.read(2))[0]
+
+    def readint(self):
+        return struct.unpack(">i", self.read(4))[0]
+
+    def readlong(self):
+        return struct.unpack(">q", self.read(8))[0]
+
+    def readbytes(self):
+        length = self.readint()
+        if length <= 0:
+            return None
+        return self.read(length)
+
+    def readstring(self):
+        return self.readbytes()
+
+
+def fasttimeouts(initialtimeout:float=0.2, retrydelay:float=0.001):
+    """
+    Shortens the time connections wait for further bytes of a response. The fake server answers at once, so tests
+    don't have to wait as long as for a real server.
+
+        self.addCleanup(fasttimeouts())
+
+    :return: callable restoring the previous timeouts
+    """
+    previous = OConnection.initialtimeout, OConnection.retrydelay
+    OConnection.initialtimeout, OConnection.retrydelay = initialtimeout, retrydelay
+
+    def restore():
+        OConnection.initialtimeout, OConnection.retrydelay = previous
+    return restore
+
+def bytesfield(value):
+    """
+    :param value: string or bytes
+    :return: value prefixed with its length
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return struct.pack(">i", len(value)) + value
+
+def record(cluster_id:int, cluster_position:int, version:int, content:bytes):
+    """
+    :return: a complete document record as it is part of a command response
+    """
+    return struct.pack(">hbhqi", 0, ord('d'), cluster_id, cluster_position, version) + bytesfield(content)
+
+def document(class_name:str, fields:dict):
+    """
+    Serializes a document with string fields, embedded lists and maps in the binary record format
+
+    :param class_name:
+    :param fields: dict of field name -> value
+    :return:
+    """
+    codec = OCodec()
+    head = codec.writebyte(0) + codec.writevarintstring(class_name)
+
+    entries = list()
+    for name, value in fields.items():
+        type = codec.findotype(value)
+        entries.append((codec.writevarintstring(name), type, value))
+
+    position = len(head) + sum(len(name) + 4 + 1 for name, _, _ in entries) + 1
+    values = b''
+    for name, type, value in entries:
+        head += name + codec.writeint(position + len(values)) + codec.writeotype(type)
+        # the pointers of embedded maps are absolute
+        values += codec.writevalue(type, value, position + len(values))
+
+    return head + codec.writevarint(0) + values
+
+def schemaclass(name:str, superclass:str, clusterids:list):
+    """
+    :return: fields of a class as they are selected from the schema
+    """
+    fields = {"name": name, "clusterIds": list(clusterids)}
+    if superclass is not None:
+        fields["superClass"] = superclass
+    return fields
+
+def classof(content:bytes):
+    """
+    :return: class name of a binary record or None
+    """
+    if not content:
+        return None
+    class_name, _ = OCodec().readvarintstring(content[1:])
+    return class_name
+
+def checkversion(cluster_id:int, cluster_position:int, current:int, version:int, operation:str):
+    if 0 <= version != current:
+        raise OFakeError("com.orientechnologies.orient.core.exception.OConcurrentModificationException",
+                         "Cannot {} the record #{}:{} because the version is not the latest. Probably you are "
+                         "updating an old record or it has been modified by another user (db=v{} your=v{})"
+                         .format(operation, cluster_id, cluster_position, current, version))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    with OFakeServer(port=2424) as fake_server:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass